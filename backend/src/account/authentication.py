@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Self
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.cache import get_user_key
+from core.config.env_config import settings
+
+from .models import User
+
+if TYPE_CHECKING:
+    from rest_framework_simplejwt.tokens import Token
+
+# the fields of the user the authentication needs, the rest (password, is_superuser, ...) is
+# never cached, the password only as the revoke claim of its tokens
+CACHED_USER_FIELDS = ('uuid', 'username', 'is_active')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication with the user of the token read from the cache (redis when CACHE_URL is set,
+    the local memory of the process otherwise) instead of a query per request.
+    p.s. the user is dropped from the cache when it is saved or deleted (see User.save),
+    with the local memory cache only in the process saving it, the others wait for USER_CACHE_TIMEOUT.
+    a view only needing the id of the user can skip the cache as well with
+    `authentication_classes = (JWTStatelessUserAuthentication,)`, request.user is then a TokenUser
+    built from the token, and a deactivated user is authenticated until the token expires.
+    the cached user is rebuilt unsaved from CACHED_USER_FIELDS, the other fields keep their defaults
+    """
+
+    def get_user(self: Self, validated_token: Token) -> User:
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = get_user_key(user_id)
+        cached_user = cache.get(key)
+        if cached_user is None:
+            # a missing or inactive user raises and is not cached
+            user = super().get_user(validated_token)
+            cache.set(key, self.dump_user(user), timeout=settings.USER_CACHE_TIMEOUT)
+            return user
+
+        self.check_user(validated_token, cached_user)
+        return User(**{field: cached_user[field] for field in CACHED_USER_FIELDS})
+
+    def dump_user(self: Self, user: User) -> dict:
+        cached_user = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+        cached_user['revoke_claim'] = get_md5_hash_password(user.password)
+        return cached_user
+
+    def check_user(self: Self, validated_token: Token, cached_user: dict) -> None:
+        """
+        the checks of JWTAuthentication.get_user, the revoke claim differs per token
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not cached_user['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if (
+            api_settings.CHECK_REVOKE_TOKEN
+            and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+            != cached_user['revoke_claim']
+        ):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed',
+            )
@@ -0,0 +1,51 @@
+import time
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+from django.utils import timezone
+
+# delete the expired captchas a batch per transaction along the expiration index,
+# the rows locked by a login consuming them are skipped instead of waited for
+PURGE_SQL = """
+    DELETE FROM captcha_captchastore
+    WHERE id IN (
+        SELECT id FROM captcha_captchastore
+        WHERE expiration <= %(now)s
+        ORDER BY expiration
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+DEFAULT_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Delete the expired captchas in batches, off the login request. Run it periodically (e.g. cron), or keep it running with --interval.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--interval',
+            type=int,
+            help='keep sweeping every this many seconds instead of exiting',
+        )
+
+    def purge(self: Self, batch_size: int) -> int:
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(PURGE_SQL, {'now': now, 'batch_size': batch_size})
+                batch_deleted = cursor.rowcount
+            deleted += batch_deleted
+            if batch_deleted < batch_size:
+                return deleted
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        while True:
+            deleted = self.purge(options['batch_size'])
+            self.stdout.write(f'{deleted} expired captchas deleted')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
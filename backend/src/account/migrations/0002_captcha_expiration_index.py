@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # build the index without blocking the captchas created by the login page
+    atomic = False
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('captcha', '0002_alter_captchastore_id'),
+    ]
+
+    operations = [
+        # p.s. the captcha table belongs to django-simple-captcha, its model has no index on expiration,
+        # used by purge_captchas to find the expired rows
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS captcha_expiration_idx ON captcha_captchastore (expiration)',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS captcha_expiration_idx',
+        ),
+    ]
@@ -1,6 +1,9 @@
+from typing import Self
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from core.cache import invalidate_user
 from core.models import BaseModel
 
 
@@ -14,3 +17,15 @@ class User(BaseModel, AbstractUser):
 
     REQUIRED_FIELDS = ('username',)
     USERNAME_FIELD = 'email'  # Use email as the primary identifier for login
+
+    def save(self: Self, *args: tuple, **kwargs: dict) -> None:
+        """
+        p.s. the user is cached by the JWT authentication, every save (e.g. is_active, set_password)
+        drops it, a queryset.update() does not and is only seen after USER_CACHE_TIMEOUT
+        """
+        super().save(*args, **kwargs)
+        invalidate_user(self.pk)
+
+    def delete(self: Self, *args: tuple, **kwargs: dict) -> tuple[int, dict]:
+        invalidate_user(self.pk)
+        return super().delete(*args, **kwargs)
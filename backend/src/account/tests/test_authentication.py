@@ -0,0 +1,88 @@
+from collections.abc import Callable
+
+import pytest
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from account.models import User
+from core.cache import get_user_key
+
+URL = '/pharmacy/inventory/count/'
+
+
+@pytest.fixture
+def token_client(test_user: User) -> APIClient:
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(test_user)}')
+    return client
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication(
+    token_client: APIClient,
+    django_assert_num_queries: Callable,
+) -> None:
+    response = token_client.get(URL)
+    assert response.status_code == status.HTTP_200_OK
+
+    # the cached response and the cached user, no query at all
+    with django_assert_num_queries(0):
+        response = token_client.get(URL)
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication_cached_fields(
+    token_client: APIClient,
+    test_user: User,
+) -> None:
+    token_client.get(URL)
+
+    # only what the authentication needs, no password hash nor permission flags
+    cached_user = cache.get(get_user_key(test_user.uuid))
+    assert set(cached_user) == {'uuid', 'username', 'is_active', 'revoke_claim'}
+    assert cached_user['revoke_claim'] != test_user.password
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication_deactivated(
+    token_client: APIClient,
+    test_user: User,
+    django_capture_on_commit_callbacks: Callable,
+) -> None:
+    assert token_client.get(URL).status_code == status.HTTP_200_OK
+
+    # a write bypassing save is not seen until the cached user expires
+    User.objects.filter(uuid=test_user.uuid).update(is_active=False)
+    assert token_client.get(URL).status_code == status.HTTP_200_OK
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_user.is_active = False
+        test_user.save()
+    assert token_client.get(URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication_password_changed(
+    token_client: APIClient,
+    test_user: User,
+    django_capture_on_commit_callbacks: Callable,
+    django_assert_num_queries: Callable,
+) -> None:
+    token_client.get(URL)
+    old_revoke_claim = cache.get(get_user_key(test_user.uuid))['revoke_claim']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_user.set_password('newpass456')
+        test_user.save()
+    assert cache.get(get_user_key(test_user.uuid)) is None
+
+    # the user is read again, the cached response is still served
+    with django_assert_num_queries(1):
+        token_client.get(URL)
+    revoke_claim = cache.get(get_user_key(test_user.uuid))['revoke_claim']
+    assert revoke_claim == get_md5_hash_password(test_user.password)
+    assert revoke_claim != old_revoke_claim
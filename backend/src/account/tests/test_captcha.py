@@ -0,0 +1,81 @@
+from collections.abc import Callable
+from datetime import timedelta
+
+import pytest
+from captcha.models import CaptchaStore
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from account.validators import CaptchaValidator
+
+
+def create_captcha(response: str, expires_in: timedelta) -> CaptchaStore:
+    return CaptchaStore.objects.create(
+        challenge=response.upper(),
+        response=response,
+        expiration=timezone.now() + expires_in,
+    )
+
+
+@pytest.mark.django_db
+def test_captcha_validator_consumes_captcha(
+    django_assert_num_queries: Callable,
+) -> None:
+    captcha = create_captcha('abcd', timedelta(minutes=5))
+    value = {'captcha': 'ABCD', 'captcha_hash_key': captcha.hashkey}
+
+    # looked up and deleted in one statement, the expired captchas are left alone
+    expired = create_captcha('efgh', timedelta(minutes=-5))
+    with django_assert_num_queries(1):
+        CaptchaValidator()(value)
+    assert not CaptchaStore.objects.filter(id=captcha.id).exists()
+    assert CaptchaStore.objects.filter(id=expired.id).exists()
+
+    # answered at most once
+    with pytest.raises(AuthenticationFailed):
+        CaptchaValidator()(value)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('answer', 'expires_in', 'detail'),
+    [
+        ('wxyz', timedelta(minutes=5), 'Invalid Captcha: wxyz'),
+        ('abcd', timedelta(minutes=-5), 'Invalid Captcha Hash Key'),
+    ],
+)
+def test_captcha_validator_invalid(
+    answer: str,
+    expires_in: timedelta,
+    detail: str,
+) -> None:
+    captcha = create_captcha('abcd', expires_in)
+    with pytest.raises(AuthenticationFailed, match=detail):
+        CaptchaValidator()({'captcha': answer, 'captcha_hash_key': captcha.hashkey})
+
+    # a failed answer does not consume the captcha, the expired ones are left to purge_captchas
+    assert CaptchaStore.objects.filter(id=captcha.id).exists()
+
+
+@pytest.mark.django_db
+def test_captcha_validator_retry() -> None:
+    captcha = create_captcha('abcd', timedelta(minutes=5))
+    with pytest.raises(AuthenticationFailed):
+        CaptchaValidator()({'captcha': 'abce', 'captcha_hash_key': captcha.hashkey})
+
+    # a mistyped answer can be retried on the same challenge
+    CaptchaValidator()({'captcha': 'abcd', 'captcha_hash_key': captcha.hashkey})
+    assert not CaptchaStore.objects.filter(id=captcha.id).exists()
+
+
+@pytest.mark.django_db
+def test_purge_captchas() -> None:
+    expired = [create_captcha(f'old{i}', timedelta(minutes=-5)) for i in range(5)]
+    outstanding = create_captcha('new', timedelta(minutes=5))
+
+    call_command('purge_captchas', batch_size=2)
+
+    remaining = set(CaptchaStore.objects.values_list('id', flat=True))
+    assert remaining == {outstanding.id}
+    assert not remaining & {captcha.id for captcha in expired}
@@ -3,30 +3,45 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Self
 
 from captcha.models import CaptchaStore
+from django.db import connection
 from django.utils import timezone
 from rest_framework.exceptions import AuthenticationFailed
 
 if TYPE_CHECKING:
     from collections import OrderedDict
 
+# consume the captcha in the statement looking it up (by its unique hashkey) when the answer matches,
+# a captcha is answered at most once, a wrong answer can be retried until it expires
+# p.s. the expired ones are left to `purge_captchas`, not deleted on the login request
+CAPTCHA_CONSUME_SQL = """
+    DELETE FROM captcha_captchastore
+    WHERE hashkey = %(hashkey)s AND response = %(response)s AND expiration >= %(now)s
+    RETURNING id
+"""
+
 
 class CaptchaValidator:
     def __call__(self: Self, value: OrderedDict) -> None:
         captcha = value['captcha']
         captcha_hash_key = value['captcha_hash_key']
 
-        try:
-            captcha_store = CaptchaStore.objects.get(hashkey=captcha_hash_key)
-        except CaptchaStore.DoesNotExist as exc:
-            msg = {'detail': f'Invalid Captcha Hash Key: {captcha_hash_key}'}
-            raise AuthenticationFailed(msg) from exc
-
-        if captcha_store.expiration < timezone.localtime():
+        now = timezone.localtime()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CAPTCHA_CONSUME_SQL,
+                {'hashkey': captcha_hash_key, 'response': captcha.lower(), 'now': now},
+            )
+            consumed = cursor.fetchone() is not None
+        if consumed:
+            return
+
+        # p.s. only the failed validation pays for the second query
+        if not CaptchaStore.objects.filter(
+            hashkey=captcha_hash_key,
+            expiration__gte=now,
+        ).exists():
             msg = {'detail': f'Invalid Captcha Hash Key: {captcha_hash_key}'}
             raise AuthenticationFailed(msg)
 
-        if captcha.lower() != captcha_store.response:
-            msg = {'detail': f'Invalid Captcha: {captcha}'}
-            raise AuthenticationFailed(msg)
-
-        CaptchaStore.remove_expired()
+        msg = {'detail': f'Invalid Captcha: {captcha}'}
+        raise AuthenticationFailed(msg)
@@ -2,4 +2,11 @@ uv run python manage.py collectstatic --noinput
 uv run python manage.py migrate --noinput
 uv run python manage.py load_pharmacies
 uv run python manage.py load_members
-uv run gunicorn core.wsgi:application --bind 0.0.0.0:8000
+uv run python manage.py manage_partitions
+
+# SERVER=asgi serves the read-only lists with their async views (core/asgi.py sets ASYNC_VIEWS)
+if [ "${SERVER:-wsgi}" = "asgi" ]; then
+    uv run uvicorn core.asgi:application --host 0.0.0.0 --port 8000
+else
+    uv run gunicorn core.wsgi:application --bind 0.0.0.0:8000
+fi
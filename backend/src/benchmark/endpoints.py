@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from member.models import MemberDailySpend, PurchaseHistory
+from member.views import PurchaseRankingListView
+from pharmacy.models import Inventory, OpeningHour, Pharmacy
+from pharmacy.views import (
+    InventoryCountView,
+    InventoryListView,
+    InventoryPerPharmacyListView,
+    PharmacyListView,
+)
+
+if TYPE_CHECKING:
+    from django.db.models import Model
+    from django.db.models.query import QuerySet
+    from rest_framework.generics import GenericAPIView
+
+
+class Endpoint(NamedTuple):
+    name: str
+    path: str
+    view_class: type[GenericAPIView]
+    params: dict[str, str]
+    # the table the filters apply to, it must be read through an index
+    # p.s. the joined tables are fetched whole and a sequential scan is the right plan for them
+    filtered_model: type[Model]
+    # the url kwargs needs a pharmacy uuid
+    per_pharmacy: bool = False
+
+
+# the canonical request of each list endpoint, the parameters are the snake case filter names
+ENDPOINTS = (
+    Endpoint(
+        'pharmacy-list',
+        '/pharmacy/',
+        PharmacyListView,
+        {'weekday': 'Mon', 'start_time__gte': '08:00', 'end_time__lte': '18:00'},
+        OpeningHour,
+    ),
+    # an overlap on the minutes of week, through the GiST index
+    Endpoint(
+        'pharmacy-open-at',
+        '/pharmacy/',
+        PharmacyListView,
+        {'open_at': 'Tue 23:30'},
+        OpeningHour,
+    ),
+    Endpoint(
+        'pharmacy-inventory',
+        '/pharmacy/<uuid>/inventory/',
+        InventoryPerPharmacyListView,
+        {'price__gte': '10', 'price__lte': '30', 'ordering': 'price'},
+        Inventory,
+        per_pharmacy=True,
+    ),
+    Endpoint(
+        'inventory-count',
+        '/pharmacy/inventory/count/',
+        InventoryCountView,
+        {'price__gte': '10', 'price__lte': '30'},
+        Inventory,
+    ),
+    # the count thresholds, a HAVING clause
+    Endpoint(
+        'inventory-count-threshold',
+        '/pharmacy/inventory/count/',
+        InventoryCountView,
+        {
+            'price__gte': '10',
+            'price__lte': '30',
+            'count_by': 'products',
+            'count_gt': '8',
+        },
+        Inventory,
+    ),
+    Endpoint(
+        'inventory-search',
+        '/pharmacy/inventory/',
+        InventoryListView,
+        {'search': 'Masquerade'},
+        Inventory,
+    ),
+    Endpoint(
+        'purchase-ranking',
+        '/member/purchase-ranking/',
+        PurchaseRankingListView,
+        {
+            'purchase_date__gte': '2025-01-01T00:00:00',
+            'purchase_date__lt': '2025-02-01T00:00:00',
+            'top': '10',
+        },
+        MemberDailySpend,
+    ),
+    # not aligned to whole days, summed from the purchase histories
+    Endpoint(
+        'purchase-ranking-partial-day',
+        '/member/purchase-ranking/',
+        PurchaseRankingListView,
+        {
+            'purchase_date__gte': '2025-01-01T12:00:00',
+            'purchase_date__lte': '2025-02-01T12:00:00',
+            'top': '10',
+        },
+        PurchaseHistory,
+    ),
+)
+
+
+def build_queryset(endpoint: Endpoint) -> QuerySet:
+    """
+    build the filtered queryset of the endpoint the same way the view does for a request
+    """
+    kwargs = {}
+    if endpoint.per_pharmacy:
+        kwargs['uuid'] = Pharmacy.objects.values_list('uuid', flat=True).first()
+
+    request = Request(APIRequestFactory().get(endpoint.path, endpoint.params))
+    view = endpoint.view_class(
+        request=request,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+    )
+    return view.filter_queryset(view.get_queryset())
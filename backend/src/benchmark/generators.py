@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import itertools
+from datetime import time, timedelta
+from random import Random
+from typing import TYPE_CHECKING, Self
+
+from core.config.env_config import settings
+from etl.utils import copy_objects
+from member.models import Member, PurchaseHistory
+from pharmacy.enums import WeekDay
+from pharmacy.models import Inventory, InventorySnapshot, OpeningHour, Pharmacy
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from datetime import datetime
+
+# vocabulary taken from data/pharmacies.json, so the synthetic rows look like the real ones
+MASK_BRANDS = ('Cotton Kiss', 'MaskT', 'Masquerade', 'Second Smile', 'True Barrier')
+MASK_COLORS = ('black', 'blue', 'green')
+MASK_COUNT_PER_PACK = (3, 6, 10)
+PHARMACY_PREFIXES = (
+    'Acculife',
+    'Blink',
+    'Carepoint',
+    'Centrico',
+    'DFW',
+    'First Care',
+    'Foundation',
+    'Health Element',
+    'Keystone',
+    'Medlife',
+    'PharmaMed',
+    'Welltrack',
+)
+PHARMACY_SUFFIXES = ('Pharmacy', 'Drug Stores', 'Rx', 'Wellness', 'Health Mart')
+
+MASK_VARIANTS = tuple(
+    itertools.product(MASK_BRANDS, MASK_COLORS, MASK_COUNT_PER_PACK),
+)
+
+
+class SyntheticDataGenerator:
+    """
+    generate pharmacies and inventories shaped like data/pharmacies.json, seeded for repeatable runs
+    """
+
+    def __init__(self: Self, seed: int = 0, batch_size: int | None = None) -> None:
+        self.random = Random(seed)  # noqa: S311
+        self.batch_size = batch_size or settings.ETL_BATCH_SIZE
+
+    def pharmacy_name(self: Self, index: int) -> str:
+        prefix = self.random.choice(PHARMACY_PREFIXES)
+        suffix = self.random.choice(PHARMACY_SUFFIXES)
+        return f'{prefix} {suffix} {index}'
+
+    def build_opening_hours(self: Self, pharmacy: Pharmacy) -> list[OpeningHour]:
+        """
+        a shift on a few weekdays, like the openingHours of data/pharmacies.json
+        """
+        opening_hours = []
+        for weekday in self.random.sample(WeekDay.values, self.random.randint(2, 7)):
+            start_hour = self.random.randint(0, 14)
+            opening_hours.append(
+                OpeningHour(
+                    pharmacy=pharmacy,
+                    weekday=weekday,
+                    start_time=time(start_hour),
+                    end_time=time(start_hour + self.random.randint(2, 9)),
+                ),
+            )
+        return opening_hours
+
+    def create_inventories(
+        self: Self,
+        pharmacy_count: int,
+        masks_per_pharmacy: int,
+        *,
+        opening_hours: bool = False,
+    ) -> int:
+        """
+        p.s. masks_per_pharmacy is capped by the number of unique mask variants
+        """
+        masks_per_pharmacy = min(masks_per_pharmacy, len(MASK_VARIANTS))
+
+        created = 0
+        for start in range(0, pharmacy_count, self.batch_size):
+            pharmacies = Pharmacy.objects.bulk_create(
+                Pharmacy(
+                    name=self.pharmacy_name(index),
+                    cash_balance=round(self.random.uniform(100, 1000), 2),
+                )
+                for index in range(start, min(start + self.batch_size, pharmacy_count))
+            )
+
+            inventories = [
+                Inventory(
+                    pharmacy=pharmacy,
+                    name=name,
+                    color=color,
+                    count_per_pack=count_per_pack,
+                    price=round(self.random.uniform(1, 50), 2),
+                    stock_quantity=self.random.randint(0, 20),
+                    search_vector=Inventory.build_search_vector(name, pharmacy.name),
+                )
+                for pharmacy in pharmacies
+                for name, color, count_per_pack in self.random.sample(
+                    MASK_VARIANTS,
+                    masks_per_pharmacy,
+                )
+            ]
+            Inventory.objects.bulk_create(inventories, batch_size=self.batch_size)
+            created += len(inventories)
+
+            if opening_hours:
+                OpeningHour.objects.bulk_create(
+                    itertools.chain.from_iterable(
+                        self.build_opening_hours(pharmacy) for pharmacy in pharmacies
+                    ),
+                    batch_size=self.batch_size,
+                )
+
+        return created
+
+    def create_purchase_histories(
+        self: Self,
+        member_count: int,
+        purchase_count: int,
+        end: datetime,
+        days: int,
+        inventories: list[Inventory] | None = None,
+    ) -> int:
+        """
+        spread purchase_count purchases of member_count new members over the days before end,
+        of the given inventories (with their pharmacy loaded) or of standalone snapshots
+        p.s. written with COPY, the daily spend rollup is not maintained, rebuild it afterwards
+        """
+        if inventories:
+            snapshots = [inventory.build_snapshot() for inventory in inventories]
+        else:
+            snapshots = [
+                InventorySnapshot(
+                    pharmacy_name=self.pharmacy_name(index),
+                    inventory_name=name,
+                    color=color,
+                    count_per_pack=count_per_pack,
+                    price=round(self.random.uniform(1, 50), 2),
+                )
+                for index, (name, color, count_per_pack) in enumerate(MASK_VARIANTS)
+            ]
+        InventorySnapshot.bulk_get_or_create(snapshots)
+        members = Member.objects.bulk_create(
+            (
+                Member(
+                    name=f'Member {index}',
+                    cash_balance=round(self.random.uniform(100, 1000), 2),
+                )
+                for index in range(member_count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+        def iter_purchase_histories() -> Iterator[PurchaseHistory]:
+            seconds = days * 24 * 60 * 60
+            for _ in range(purchase_count):
+                snapshot = self.random.choice(snapshots)
+                quantity = self.random.randint(1, 5)
+                yield PurchaseHistory(
+                    member=self.random.choice(members),
+                    inventory=snapshot,
+                    amount=round(snapshot.price * quantity, 2),
+                    quantity=quantity,
+                    purchase_date=end
+                    - timedelta(seconds=self.random.randrange(seconds)),
+                )
+
+        copy_objects(PurchaseHistory, iter_purchase_histories())
+        return purchase_count
@@ -0,0 +1,312 @@
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Self
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connections
+from django.test import RequestFactory, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.models import User
+from benchmark.utils import NO_CACHE, summarize
+from core.config.env_config import settings
+
+BENCHMARK_USERNAME = 'benchmark-asgi'
+
+# sends one request and waits for the whole response
+Sender = Callable[[], Awaitable[None]]
+
+# p.s. Linux only, the resident set size is read from there
+STATM_PATH = Path('/proc/self/statm')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+MEMORY_SAMPLE_INTERVAL = 0.01
+POOL_TIMEOUT = 3600
+
+
+def get_rss() -> int | None:
+    if not STATM_PATH.exists():
+        return None
+    return int(STATM_PATH.read_text().split()[1]) * PAGE_SIZE
+
+
+class ResourceSampler:
+    """
+    sample the resident set size and the number of threads while the requests run
+    """
+
+    def __init__(self: Self) -> None:
+        self.baseline = get_rss()
+        self.peak_rss = self.baseline
+        self.peak_threads = threading.active_count()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self: Self) -> None:
+        while not self.stopped.wait(MEMORY_SAMPLE_INTERVAL):
+            rss = get_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+            # the sampler itself is not counted
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+
+    def __enter__(self: Self) -> Self:
+        self.thread.start()
+        return self
+
+    def __exit__(self: Self, *exc_info: object) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+class Command(BaseCommand):
+    help = 'Compare the requests/sec and the memory per concurrent connection of a list endpoint served by the WSGI handler (a gunicorn gthread worker) and by the ASGI handler with the async views (uvicorn), each in a process of its own.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--path', default='/pharmacy/')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='request the whole list as ndjson (stream=ndjson) instead of a page',
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=[1, 16, 64],
+            help='concurrent clients, one run each',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='threads of the WSGI worker and database connections of both (persistent / pool)',
+        )
+        parser.add_argument(
+            '--server',
+            choices=('wsgi', 'asgi'),
+            help='run a single server in this process, by default both are run in a subprocess each',
+        )
+
+    def get_server_env(self: Self, server: str, threads: int) -> dict:
+        env = {**os.environ, 'ASYNC_VIEWS': str(server == 'asgi')}
+        # p.s. ASGI has no persistent connection, the pool is used when it is installed
+        if server == 'asgi' and importlib.util.find_spec('psycopg_pool') is not None:
+            # the requests wait for a connection as long as they wait for a thread of the WSGI worker
+            env.update(
+                DB_POOL='True',
+                DB_POOL_MIN_SIZE=str(threads),
+                DB_POOL_MAX_SIZE=str(threads),
+                DB_POOL_TIMEOUT=str(POOL_TIMEOUT),
+            )
+        return env
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        if options['server']:
+            self.run_server(options)
+            return
+
+        User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        try:
+            for server in ('wsgi', 'asgi'):
+                command = [
+                    sys.executable,
+                    sys.argv[0],
+                    'benchmark_asgi',
+                    '--server',
+                    server,
+                    '--path',
+                    options['path'],
+                    '--page-size',
+                    str(options['page_size']),
+                    *(['--stream'] if options['stream'] else []),
+                    '--requests',
+                    str(options['requests']),
+                    '--warmup',
+                    str(options['warmup']),
+                    '--threads',
+                    str(options['threads']),
+                    '--concurrency',
+                    *map(str, options['concurrency']),
+                ]
+                subprocess.run(  # noqa: S603
+                    command,
+                    env=self.get_server_env(server, options['threads']),
+                    check=True,
+                )
+        finally:
+            User.objects.filter(username=BENCHMARK_USERNAME).delete()
+
+    def run_server(self: Self, options: dict) -> None:
+        server = options['server']
+        is_asgi = server == 'asgi'
+        if settings.ASYNC_VIEWS is not is_asgi:
+            msg = f'ASYNC_VIEWS has to be set for {server}, run it without --server'
+            raise CommandError(msg)
+
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        token = str(AccessToken.for_user(user))
+        query = urlencode(
+            (
+                {'stream': 'ndjson'}
+                if options['stream']
+                else {'page_size': options['page_size']}
+            ),
+        )
+        connections.close_all()
+
+        with override_settings(CACHES=NO_CACHE):
+            send_request = (
+                self.get_asgi_sender(options['path'], query, token)
+                if is_asgi
+                else self.get_wsgi_sender(
+                    options['path'],
+                    query,
+                    token,
+                    options['threads'],
+                )
+            )
+            asyncio.run(self.run_clients(send_request, 1, options['warmup']))
+
+            for concurrency in options['concurrency']:
+                with ResourceSampler() as sampler:
+                    start = time.perf_counter()
+                    samples = asyncio.run(
+                        self.run_clients(
+                            send_request,
+                            concurrency,
+                            options['requests'],
+                        ),
+                    )
+                    elapsed = time.perf_counter() - start
+
+                result = summarize(samples)
+                memory = (
+                    f'rss/connection={(sampler.peak_rss - sampler.baseline) / concurrency / 1024:.0f}KiB'
+                    if sampler.baseline is not None
+                    else 'rss/connection=n/a'
+                )
+                self.stdout.write(
+                    f'{server:>5} concurrency={concurrency:<4} '
+                    f'req/s={len(samples) / elapsed:<6.0f} '
+                    f'p50={result["p50"]:.2f}ms p95={result["p95"]:.2f}ms '
+                    f'threads={sampler.peak_threads} {memory}',
+                )
+
+    async def run_clients(
+        self: Self,
+        send_request: Sender,
+        concurrency: int,
+        requests: int,
+    ) -> list[float]:
+        async def client(count: int) -> list[float]:
+            samples = []
+            for _ in range(count):
+                start = time.perf_counter()
+                await send_request()
+                samples.append((time.perf_counter() - start) * 1000)
+            return samples
+
+        results = await asyncio.gather(
+            *(client(requests // concurrency) for _ in range(concurrency)),
+        )
+        return [sample for samples in results for sample in samples]
+
+    def get_wsgi_sender(
+        self: Self,
+        path: str,
+        query: str,
+        token: str,
+        threads: int,
+    ) -> Sender:
+        """
+        a gthread worker, the requests wait for one of its threads
+        """
+        handler = WSGIHandler()
+        environ = (
+            RequestFactory()
+            .get(
+                f'{path}?{query}',
+                HTTP_AUTHORIZATION=f'Bearer {token}',
+            )
+            .environ
+        )
+        executor = ThreadPoolExecutor(max_workers=threads)
+
+        def start_response(status: str, _headers: list) -> None:
+            if not status.startswith('200'):
+                msg = f'{path} returned {status}'
+                raise CommandError(msg)
+
+        def handle_request() -> None:
+            # p.s. closing the response sends request_finished, which keeps the persistent connection
+            response = handler(dict(environ), start_response)
+            b''.join(response)
+            response.close()
+
+        async def send_request() -> None:
+            await asyncio.get_running_loop().run_in_executor(executor, handle_request)
+
+        return send_request
+
+    def get_asgi_sender(self: Self, path: str, query: str, token: str) -> Sender:
+        """
+        an uvicorn worker, every request is a task on the event loop
+        """
+        handler = ASGIHandler()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Bearer {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+
+        async def send_request() -> None:
+            disconnected = asyncio.Event()
+            body_sent = False
+
+            async def receive() -> dict:
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # the client stays connected until the response is sent
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message: dict) -> None:
+                if (
+                    message['type'] == 'http.response.start'
+                    and message['status'] != HTTPStatus.OK
+                ):
+                    msg = f'{path} returned {message["status"]}'
+                    raise CommandError(msg)
+
+            await handler(dict(scope), receive, send)
+            disconnected.set()
+
+        return send_request
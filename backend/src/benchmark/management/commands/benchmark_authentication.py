@@ -0,0 +1,102 @@
+from collections.abc import Callable
+from typing import Self
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.authentication import CachedJWTAuthentication
+from account.models import User
+from benchmark.utils import measure
+
+BENCHMARK_USERNAME = 'benchmark-authentication'
+
+
+class Command(BaseCommand):
+    help = 'Compare the queries and the latency per request of the JWT authentication looking up the user, reading it from the cache and building it from the token.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def get_cases(self: Self) -> list[tuple[str, str]]:
+        """
+        a list served from the response cache, and one computing its response on every request
+        """
+        return [
+            ('cached response', '/pharmacy/'),
+            ('computed response', '/pharmacy/inventory/'),
+        ]
+
+    def get_authentications(self: Self) -> list[tuple[str, type[JWTAuthentication]]]:
+        return [
+            ('query', JWTAuthentication),
+            ('cache', CachedJWTAuthentication),
+            ('stateless', JWTStatelessUserAuthentication),
+        ]
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        # p.s. committed, the handler authenticates the token against the table
+        user, created = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        authorization = f'Bearer {AccessToken.for_user(user)}'
+        handler = WSGIHandler()
+
+        def start_response(status: str, _headers: list) -> None:
+            if not status.startswith('200'):
+                msg = f'returned {status}'
+                raise CommandError(msg)
+
+        def send_request(environ: dict) -> None:
+            response = handler(dict(environ), start_response)
+            b''.join(response)
+            response.close()
+
+        queries = []
+
+        # p.s. not CaptureQueriesContext, request_started resets the queries log
+        def count_query(execute: Callable, sql: str, *args: tuple) -> object:
+            queries.append(sql)
+            return execute(sql, *args)
+
+        try:
+            for case, path in self.get_cases():
+                environ = (
+                    RequestFactory()
+                    .get(
+                        path,
+                        {'pageSize': options['page_size']},
+                        HTTP_AUTHORIZATION=authorization,
+                    )
+                    .environ
+                )
+                for label, authentication in self.get_authentications():
+                    cache.clear()
+                    # the default authentication of every view, swapped for the one compared
+                    with mock.patch.object(
+                        CachedJWTAuthentication,
+                        'get_user',
+                        authentication.get_user,
+                    ):
+                        send_request(environ)
+                        queries.clear()
+                        with connection.execute_wrapper(count_query):
+                            send_request(environ)
+                        result = measure(
+                            lambda environ=environ: send_request(environ),
+                            repeat=options['repeat'],
+                        )
+                    self.stdout.write(
+                        f'{case:>17} {label:>9}: queries/request={len(queries)} '
+                        f'p50={result["p50"]:.2f}ms p95={result["p95"]:.2f}ms',
+                    )
+        finally:
+            if created:
+                user.delete()
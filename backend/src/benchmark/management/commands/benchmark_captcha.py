@@ -0,0 +1,77 @@
+from collections.abc import Callable
+from datetime import timedelta
+from typing import Self
+
+from captcha.models import CaptchaStore
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.utils import timezone
+
+from account.validators import CaptchaValidator
+from benchmark.utils import analyze, measure
+
+CAPTCHA_RESPONSE = 'abcd'
+
+
+class Command(BaseCommand):
+    help = 'Compare the latency of the login captcha validation purging the expired captchas on every login with consuming the captcha alone, as the outstanding captchas grow.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--outstanding',
+            type=int,
+            nargs='+',
+            default=[1_000, 10_000, 100_000],
+            help='captchas generated but not answered yet, one run each',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def create_captchas(self: Self, count: int) -> list[str]:
+        expiration = timezone.now() + timedelta(minutes=5)
+        captchas = CaptchaStore.objects.bulk_create(
+            CaptchaStore(
+                challenge=CAPTCHA_RESPONSE.upper(),
+                response=CAPTCHA_RESPONSE,
+                hashkey=f'benchmark-{timezone.now().timestamp()}-{index}',
+                expiration=expiration,
+            )
+            for index in range(count)
+        )
+        return [captcha.hashkey for captcha in captchas]
+
+    def validate_and_purge(self: Self, hashkey: str) -> None:
+        """
+        the validation before, the expired captchas were deleted on every login
+        """
+        CaptchaStore.objects.get(hashkey=hashkey, response=CAPTCHA_RESPONSE)
+        CaptchaStore.remove_expired()
+
+    def consume(self: Self, hashkey: str) -> None:
+        CaptchaValidator()({'captcha': CAPTCHA_RESPONSE, 'captcha_hash_key': hashkey})
+
+    def run(self: Self, validate: Callable[[str], None], repeat: int) -> dict:
+        hashkeys = iter(self.create_captchas(repeat + 1))
+        return measure(lambda: validate(next(hashkeys)), repeat=repeat)
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        for outstanding in options['outstanding']:
+            # p.s. the captchas are only read, they are always rolled back
+            with transaction.atomic():
+                self.create_captchas(outstanding)
+                analyze((CaptchaStore,))
+
+                result = self.run(self.consume, options['repeat'])
+                self.stdout.write(
+                    f'{outstanding:>8} outstanding, consume: '
+                    f'p50={result["p50"]:.2f}ms p95={result["p95"]:.2f}ms',
+                )
+
+                # before the expiration index as well
+                with connection.cursor() as cursor:
+                    cursor.execute('DROP INDEX IF EXISTS captcha_expiration_idx')
+                result = self.run(self.validate_and_purge, options['repeat'])
+                self.stdout.write(
+                    f'{outstanding:>8} outstanding,   purge: '
+                    f'p50={result["p50"]:.2f}ms p95={result["p95"]:.2f}ms',
+                )
+                transaction.set_rollback(True)
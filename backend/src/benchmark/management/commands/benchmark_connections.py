@@ -0,0 +1,127 @@
+import importlib.util
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Self
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.models import User
+from benchmark.utils import NO_CACHE, summarize
+
+BENCHMARK_USERNAME = 'benchmark-connections'
+
+
+class Command(BaseCommand):
+    help = 'Compare the requests/sec of PharmacyListView through the WSGI handler with a new connection per request, a persistent connection and a psycopg pool.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='threads sending the requests, like the threads of a gunicorn gthread worker',
+        )
+
+    def get_modes(self: Self, concurrency: int) -> list[tuple[str, dict]]:
+        """
+        the connection settings compared, the pool is left out when psycopg_pool is not installed
+        """
+        modes = [
+            ('new connection', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+            ('persistent', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}),
+        ]
+        if importlib.util.find_spec('psycopg_pool') is not None:
+            modes.append(
+                (
+                    'pool',
+                    {
+                        'CONN_MAX_AGE': 0,
+                        'CONN_HEALTH_CHECKS': False,
+                        'OPTIONS': {
+                            'pool': {'min_size': concurrency, 'max_size': concurrency},
+                        },
+                    },
+                ),
+            )
+        return modes
+
+    def configure(self: Self, settings_dict: dict) -> None:
+        # p.s. the threads create their connection from the same settings dict
+        connection.close()
+        connection.close_pool()
+        connection.settings_dict.update(settings_dict)
+
+    def run(self: Self, handler: WSGIHandler, environ: dict, options: dict) -> dict:
+        def start_response(status: str, _headers: list) -> None:
+            if not status.startswith('200'):
+                msg = f'{environ["PATH_INFO"]} returned {status}'
+                raise CommandError(msg)
+
+        def send_request() -> float:
+            start = time.perf_counter()
+            # p.s. closing the response sends request_finished, which closes or keeps the connection
+            response = handler(dict(environ), start_response)
+            b''.join(response)
+            response.close()
+            return (time.perf_counter() - start) * 1000
+
+        def worker(count: int) -> list[float]:
+            try:
+                return [send_request() for _ in range(count)]
+            finally:
+                connection.close()
+
+        concurrency = options['concurrency']
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, [options['warmup']] * concurrency))
+            start = time.perf_counter()
+            samples = [
+                sample
+                for samples in executor.map(
+                    worker,
+                    [options['requests'] // concurrency] * concurrency,
+                )
+                for sample in samples
+            ]
+            elapsed = time.perf_counter() - start
+
+        return {**summarize(samples), 'requests_per_sec': len(samples) / elapsed}
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        # p.s. committed, every request authenticates on its own connection
+        user, created = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        environ = (
+            RequestFactory()
+            .get(
+                '/pharmacy/',
+                {'pageSize': options['page_size']},
+                HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+            )
+            .environ
+        )
+
+        handler = WSGIHandler()
+        original_settings = {
+            key: connection.settings_dict[key]
+            for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')
+        }
+        try:
+            with override_settings(CACHES=NO_CACHE):
+                for label, settings_dict in self.get_modes(options['concurrency']):
+                    self.configure(settings_dict)
+                    result = self.run(handler, environ, options)
+                    self.stdout.write(
+                        f'{label:>16}: p50={result["p50"]:.2f}ms p95={result["p95"]:.2f}ms '
+                        f'req/s={result["requests_per_sec"]:.0f}',
+                    )
+        finally:
+            self.configure(original_settings)
+            if created:
+                user.delete()
@@ -0,0 +1,278 @@
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.runner import compare, run_concurrent, run_sequential
+from benchmark.scenarios import SCENARIOS, BenchmarkContext, get_uncovered_views
+from benchmark.utils import NO_CACHE, analyze
+from etl.utils import deferred_indexes
+from member.models import Member, MemberDailySpend, PurchaseHistory
+from pharmacy.models import Inventory, OpeningHour, Pharmacy
+
+# large enough for every write request of a run
+CONTEXT_BALANCE = 1_000_000_000
+CONTEXT_STOCK = 1_000_000
+
+# the options describing the dataset and the run, only runs with the same ones are comparable
+RUN_OPTIONS = (
+    'pharmacies',
+    'masks_per_pharmacy',
+    'members',
+    'purchases',
+    'end',
+    'days',
+    'seed',
+    'no_seed',
+    'repeat',
+    'cart_size',
+    'concurrency',
+    'cache',
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every pharmacy and member url through the DRF test client: latency percentiles, queries per request and rows/sec, optionally against a saved baseline.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        # the dataset, shaped like data/pharmacies.json and data/users.json
+        parser.add_argument('--pharmacies', type=int, default=1_000)
+        parser.add_argument('--masks-per-pharmacy', type=int, default=20)
+        parser.add_argument('--members', type=int, default=1_000)
+        parser.add_argument('--purchases', type=int, default=100_000)
+        parser.add_argument(
+            '--end',
+            type=datetime.fromisoformat,
+            default=datetime(2025, 7, 1),  # noqa: DTZ001
+            help='the purchases are spread over the days before it, the ranking endpoints read 2025-01',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='benchmark the rows already in the database',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='commit the synthetic rows and the writes instead of rolling them back',
+        )
+
+        # the run
+        parser.add_argument(
+            '--scenario',
+            nargs='+',
+            choices=[scenario.name for scenario in SCENARIOS],
+            help='only run these scenarios',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--cart-size',
+            type=int,
+            default=10,
+            help='number of items in a write request',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='concurrent clients, more than one runs the read only scenarios on committed rows',
+        )
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='serve the cached responses, by default the cache is disabled to measure the queries',
+        )
+
+        # the results
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='save the results to this JSON file',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=Path,
+            help='compare with the results saved by an earlier run',
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=0.2,
+            help='fail when a p95 grows by more than this ratio over the baseline, or a scenario runs more queries',
+        )
+
+    def seed(self: Self, options: dict) -> None:
+        generator = SyntheticDataGenerator(seed=options['seed'])
+        created = generator.create_inventories(
+            options['pharmacies'],
+            options['masks_per_pharmacy'],
+            opening_hours=True,
+        )
+        # p.s. the purchases are of the inventories just created
+        inventories = list(
+            Inventory.objects.select_related('pharmacy').order_by('-created_at')[
+                :created
+            ],
+        )
+        end = timezone.make_aware(options['end'])
+        with deferred_indexes(PurchaseHistory):
+            generator.create_purchase_histories(
+                options['members'],
+                options['purchases'],
+                end,
+                options['days'],
+                inventories,
+            )
+        MemberDailySpend.rebuild(
+            since=timezone.localdate(end) - timedelta(days=options['days']),
+        )
+        analyze(
+            (
+                Pharmacy,
+                OpeningHour,
+                Inventory,
+                Member,
+                PurchaseHistory,
+                MemberDailySpend,
+            ),
+        )
+        self.stdout.write(
+            f'seeded {options["pharmacies"]} pharmacies, {created} inventories, '
+            f'{options["members"]} members and {options["purchases"]} purchases',
+        )
+
+    def get_context(self: Self, options: dict) -> BenchmarkContext:
+        """
+        the pharmacy, inventories and member the requests are sent for
+        p.s. in a sequential run the balances and stocks are raised, so every write succeeds
+        """
+        pharmacy = Pharmacy.objects.filter(inventory__isnull=False).first()
+        member = Member.objects.first()
+        if pharmacy is None or member is None:
+            msg = 'no pharmacy with inventories or no member to benchmark, seed the database first'
+            raise CommandError(msg)
+
+        inventory_qs = Inventory.objects.filter(pharmacy=pharmacy).order_by('uuid')[
+            : options['cart_size']
+        ]
+        if options['concurrency'] == 1:
+            Pharmacy.objects.filter(uuid=pharmacy.uuid).update(
+                cash_balance=CONTEXT_BALANCE,
+            )
+            Member.objects.filter(uuid=member.uuid).update(cash_balance=CONTEXT_BALANCE)
+            Inventory.objects.filter(uuid__in=inventory_qs.values('uuid')).update(
+                stock_quantity=CONTEXT_STOCK,
+            )
+
+        inventories = [
+            {**inventory, 'uuid': str(inventory['uuid'])}
+            for inventory in inventory_qs.values(
+                'uuid',
+                'name',
+                'color',
+                'count_per_pack',
+                'price',
+                'stock_quantity',
+            )
+        ]
+        return BenchmarkContext(pharmacy.uuid, inventories, member.uuid)
+
+    def run(self: Self, options: dict) -> dict[str, dict]:
+        scenarios = [
+            scenario
+            for scenario in SCENARIOS
+            if not options['scenario'] or scenario.name in options['scenario']
+        ]
+        concurrency = options['concurrency']
+        if concurrency > 1:
+            scenarios = [scenario for scenario in scenarios if scenario.read_only]
+
+        context = self.get_context(options)
+        results = {}
+        for scenario in scenarios:
+            if concurrency > 1:
+                result = run_concurrent(
+                    scenario,
+                    context,
+                    options['repeat'],
+                    concurrency,
+                )
+            else:
+                result = run_sequential(
+                    scenario,
+                    context,
+                    options['repeat'],
+                    options['warmup'],
+                )
+            results[scenario.name] = result
+            self.stdout.write(
+                f'{scenario.name:>32}: p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms '
+                f'p99={result["p99"]:.1f}ms queries={result["queries"]:.1f} '
+                f'rows={result["rows"]:.0f} req/s={result["requests_per_sec"]:.1f} '
+                f'rows/s={result["rows_per_sec"]:.0f}',
+            )
+        return results
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        uncovered = get_uncovered_views()
+        if uncovered:
+            msg = f'urls without a benchmark scenario: {", ".join(uncovered)}'
+            raise CommandError(msg)
+        if options['concurrency'] > 1 and not options['no_seed']:
+            msg = 'the concurrent clients only see committed rows, seed them with --keep first and pass --no-seed'
+            raise CommandError(msg)
+
+        with (
+            transaction.atomic(),
+            override_settings(**({} if options['cache'] else {'CACHES': NO_CACHE})),
+        ):
+            if not options['no_seed']:
+                self.seed(options)
+            results = self.run(options)
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        run_options = {
+            key: str(options[key]) if key == 'end' else options[key]
+            for key in RUN_OPTIONS
+        }
+        if options['output']:
+            options['output'].write_text(
+                json.dumps(
+                    {
+                        'created_at': timezone.now().isoformat(),
+                        'options': run_options,
+                        'results': results,
+                    },
+                    indent=2,
+                ),
+            )
+            self.stdout.write(f'saved the results to {options["output"]}')
+
+        if options['baseline']:
+            baseline = json.loads(options['baseline'].read_text())
+            if baseline['options'] != run_options:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'the baseline was run with other options: {baseline["options"]}',
+                    ),
+                )
+            regressions = compare(
+                results,
+                baseline['results'],
+                options['max_regression'],
+            )
+            if regressions:
+                msg = 'regressions over the baseline:\n' + '\n'.join(regressions)
+                raise CommandError(msg)
+            self.stdout.write(self.style.SUCCESS('no regression over the baseline'))
@@ -0,0 +1,82 @@
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from account.models import User
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.utils import NO_CACHE, analyze, measure
+from pharmacy.models import Inventory, Pharmacy
+from pharmacy.views import InventoryCountView
+
+PRICE_RANGE = {'price__gte': '10', 'price__lte': '30'}
+
+
+class Command(BaseCommand):
+    help = 'Compare the response size and latency of InventoryCountView listing every pharmacy with the count thresholds applied in SQL.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--pharmacies', type=int, default=100_000)
+        parser.add_argument('--masks-per-pharmacy', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='commit the synthetic rows instead of rolling them back',
+        )
+
+    def get_cases(self: Self) -> list[tuple[str, dict]]:
+        """
+        before the thresholds, the client fetched every pharmacy of the price range and filtered on its side
+        """
+        return [
+            ('every pharmacy', PRICE_RANGE),
+            ('stock count_gt', {**PRICE_RANGE, 'count_gt': '80'}),
+            ('stock count_between', {**PRICE_RANGE, 'count_between': '40,50'}),
+            (
+                'products count_gt',
+                {**PRICE_RANGE, 'count_by': 'products', 'count_gt': '6'},
+            ),
+            (
+                'products count_lt',
+                {**PRICE_RANGE, 'count_by': 'products', 'count_lt': '2'},
+            ),
+        ]
+
+    def request(self: Self, user: User, params: dict) -> Response:
+        request = APIRequestFactory().get('/pharmacy/inventory/count/', params)
+        force_authenticate(request, user=user)
+        response = InventoryCountView.as_view()(request)
+        return response.render()
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        # p.s. force_authenticate skips the lookup, the user is never saved
+        user = User(username='benchmark-inventory-count')
+
+        with transaction.atomic(), override_settings(CACHES=NO_CACHE):
+            generator = SyntheticDataGenerator(seed=options['seed'])
+            created = generator.create_inventories(
+                options['pharmacies'],
+                options['masks_per_pharmacy'],
+            )
+            analyze((Pharmacy, Inventory))
+            self.stdout.write(f'seeded {created} inventories')
+
+            for label, params in self.get_cases():
+                response = self.request(user, params)
+                result = measure(
+                    lambda params=params: self.request(user, params),
+                    repeat=options['repeat'],
+                )
+                self.stdout.write(
+                    f'{label:>20}: rows={len(response.data)} '
+                    f'size={len(response.content) / 1024:.0f}KiB '
+                    f'p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms',
+                )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,115 @@
+from datetime import datetime, time, timedelta
+from functools import partial
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from benchmark.endpoints import Endpoint, build_queryset
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.utils import analyze, measure
+from etl.utils import deferred_indexes
+from member.models import Member, MemberDailySpend, PurchaseHistory
+from member.views import PurchaseRankingListView
+
+
+class Command(BaseCommand):
+    help = 'Compare PurchaseRankingListView latency summed from the purchase histories and from the daily spend rollup.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--members', type=int, default=10_000)
+        parser.add_argument('--purchases', type=int, default=10_000_000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--ranges',
+            type=int,
+            nargs='+',
+            default=[365, 30, 7, 1],
+            help='length of the ranked purchase_date ranges in days, ending today',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--tops', type=int, nargs='+', default=[10, 100])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='commit the synthetic rows instead of rolling them back',
+        )
+
+    def legacy_ranking(self: Self, start: datetime, end: datetime, top: int) -> list:
+        """
+        the query built by PurchaseRankingListView before the daily spend rollup
+        """
+        queryset = (
+            PurchaseHistory.objects.filter(
+                purchase_date__gte=start,
+                purchase_date__lt=end,
+            )
+            .values('member__uuid', 'member__name')
+            .annotate(
+                accumulated_amount=Sum('amount'),
+                cash_balance=F('member__cash_balance'),
+            )
+            .order_by('-accumulated_amount')
+        )
+        return list(queryset[:top])
+
+    def current_ranking(self: Self, start: datetime, end: datetime, top: int) -> list:
+        endpoint = Endpoint(
+            'purchase-ranking',
+            '/member/purchase-ranking/',
+            PurchaseRankingListView,
+            {
+                'purchase_date__gte': start.isoformat(),
+                'purchase_date__lt': end.isoformat(),
+                'top': str(top),
+            },
+            MemberDailySpend,
+        )
+        return PurchaseRankingListView.attach_members(list(build_queryset(endpoint)))
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        # whole days in TIME_ZONE, the ranges the rollup can answer
+        end = datetime.combine(
+            timezone.localdate(),
+            time.min,
+            tzinfo=timezone.get_current_timezone(),
+        )
+
+        with transaction.atomic():
+            generator = SyntheticDataGenerator(seed=options['seed'])
+            with deferred_indexes(PurchaseHistory):
+                created = generator.create_purchase_histories(
+                    options['members'],
+                    options['purchases'],
+                    end,
+                    options['days'],
+                )
+            rows = MemberDailySpend.rebuild()
+            analyze((Member, PurchaseHistory, MemberDailySpend))
+            self.stdout.write(
+                f'seeded {created} purchases, {PurchaseHistory.objects.count()} in total, '
+                f'rolled up into {rows} daily spend rows',
+            )
+
+            for days in options['ranges']:
+                start = end - timedelta(days=days)
+                for top in options['tops']:
+                    for label, ranking in (
+                        ('before', self.legacy_ranking),
+                        ('after', self.current_ranking),
+                    ):
+                        result = measure(
+                            partial(ranking, start, end, top),
+                            repeat=options['repeat'],
+                        )
+                        self.stdout.write(
+                            f'{days:>4} days top {top:>3} {label:>6}: '
+                            f'p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms '
+                            f'p99={result["p99"]:.1f}ms',
+                        )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+import io
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from djangorestframework_camel_case.parser import (
+    CamelCaseJSONParser as LibraryCamelCaseJSONParser,
+)
+from djangorestframework_camel_case.render import (
+    CamelCaseJSONRenderer as LibraryCamelCaseJSONRenderer,
+)
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.utils import measure
+from core import camel_case
+from core.camel_case import CamelCaseJSONParser, CamelCaseJSONRenderer
+from core.config.env_config import settings
+from pharmacy.views import InventoryListView
+
+
+class Command(BaseCommand):
+    help = 'Compare the camel case renderer and parser of djangorestframework_camel_case with core.camel_case on an InventoryListView payload.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--pharmacies', type=int, default=2_500)
+        parser.add_argument('--masks-per-pharmacy', type=int, default=20)
+        parser.add_argument('--rows', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def get_payload(self: Self, rows: int) -> list:
+        request = Request(APIRequestFactory().get('/'))
+        view = InventoryListView(request=request, format_kwarg=None, kwargs={})
+        queryset = view.filter_queryset(view.get_queryset())[:rows]
+        return view.get_serializer(queryset, many=True).data
+
+    def write_result(self: Self, label: str, result: dict, rows: int) -> None:
+        self.stdout.write(
+            f'{label:>24}: p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms '
+            f'rows/s={rows / result["p50"] * 1000:.0f}',
+        )
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        # p.s. the synthetic rows are only read, they are always rolled back
+        with transaction.atomic():
+            SyntheticDataGenerator(seed=options['seed']).create_inventories(
+                options['pharmacies'],
+                options['masks_per_pharmacy'],
+            )
+            payload = self.get_payload(options['rows'])
+            transaction.set_rollback(True)
+
+        rows = len(payload)
+        content = LibraryCamelCaseJSONRenderer().render(payload)
+        self.stdout.write(f'{rows} rows, {len(content) / 1024 / 1024:.1f} MiB')
+
+        renderers = [('library render', LibraryCamelCaseJSONRenderer(), False)]
+        parsers = [('library parse', LibraryCamelCaseJSONParser(), False)]
+        backends = [False, True] if camel_case.orjson is not None else [False]
+        for orjson in backends:
+            backend = 'orjson' if orjson else 'json'
+            renderers.append(
+                (f'core render ({backend})', CamelCaseJSONRenderer(), orjson),
+            )
+            parsers.append((f'core parse ({backend})', CamelCaseJSONParser(), orjson))
+
+        use_orjson = settings.ORJSON
+        try:
+            for label, renderer, orjson in renderers:
+                settings.ORJSON = orjson
+                result = measure(
+                    lambda renderer=renderer: renderer.render(payload),
+                    repeat=options['repeat'],
+                )
+                self.write_result(label, result, rows)
+            for label, parser, orjson in parsers:
+                settings.ORJSON = orjson
+                result = measure(
+                    lambda parser=parser: parser.parse(io.BytesIO(content)),
+                    repeat=options['repeat'],
+                )
+                self.write_result(label, result, rows)
+        finally:
+            settings.ORJSON = use_orjson
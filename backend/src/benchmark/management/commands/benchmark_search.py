@@ -0,0 +1,92 @@
+from typing import Self
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models.query import QuerySet
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.utils import analyze, measure
+from core.filters import FullTextSearchFilter
+from pharmacy.models import Inventory, Pharmacy
+from pharmacy.views import InventoryListView
+
+
+class Command(BaseCommand):
+    help = 'Compare InventoryListView search latency with the on-the-fly and the stored search vector.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--pharmacies', type=int, default=22_223)
+        parser.add_argument('--masks-per-pharmacy', type=int, default=45)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--terms',
+            nargs='+',
+            default=['Masquerade', 'Keystone', 'Cotton Kiss'],
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='commit the synthetic rows instead of rolling them back',
+        )
+
+    def legacy_queryset(self: Self, term: str) -> QuerySet:
+        """
+        the query built by FullTextSearchFilter before the stored search vector
+        """
+        return (
+            Inventory.objects.select_related('pharmacy')
+            .annotate(
+                rank=SearchRank(
+                    SearchVector('name', 'pharmacy__name'),
+                    SearchQuery('') | SearchQuery(term),
+                ),
+            )
+            .order_by('-rank')
+        )
+
+    def current_queryset(self: Self, term: str) -> QuerySet:
+        request = Request(APIRequestFactory().get('/', {'search': term}))
+        view = InventoryListView(request=request, format_kwarg=None)
+        return FullTextSearchFilter().filter_queryset(
+            request,
+            view.get_queryset(),
+            view,
+        )
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        with transaction.atomic():
+            generator = SyntheticDataGenerator(seed=options['seed'])
+            created = generator.create_inventories(
+                options['pharmacies'],
+                options['masks_per_pharmacy'],
+            )
+            analyze((Pharmacy, Inventory))
+            self.stdout.write(
+                f'seeded {created} inventories, {Inventory.objects.count()} in total',
+            )
+
+            limit = options['limit']
+            for term in options['terms']:
+                matched = self.current_queryset(term).count()
+                for label, build_queryset in (
+                    ('before', self.legacy_queryset),
+                    ('after', self.current_queryset),
+                ):
+                    queryset = build_queryset(term)
+                    result = measure(
+                        lambda queryset=queryset: list(queryset[:limit]),
+                        repeat=options['repeat'],
+                    )
+                    self.stdout.write(
+                        f'{term!r:>16} {label:>6}: matched={matched} '
+                        f'p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms '
+                        f'p99={result["p99"]:.1f}ms',
+                    )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
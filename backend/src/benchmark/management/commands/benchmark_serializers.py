@@ -0,0 +1,73 @@
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from benchmark.generators import SyntheticDataGenerator
+from benchmark.utils import analyze, measure
+from core.config.env_config import settings
+from pharmacy.models import Inventory, OpeningHour, Pharmacy
+from pharmacy.views import InventoryListView, PharmacyListView
+
+
+class Command(BaseCommand):
+    help = 'Compare the rows/sec of the model serializers with the compiled .values() ones on the list views.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument('--pharmacies', type=int, default=1_000)
+        parser.add_argument('--masks-per-pharmacy', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='commit the synthetic rows instead of rolling them back',
+        )
+
+    def get_view(self: Self, view_class: type[APIView]) -> APIView:
+        request = Request(APIRequestFactory().get('/'))
+        return view_class(request=request, format_kwarg=None, kwargs={})
+
+    def serialize(self: Self, view: APIView, limit: int) -> list:
+        """
+        the queryset and serializer of the view, without the pagination and the renderer
+        """
+        queryset = view.filter_queryset(view.get_queryset())[:limit]
+        return view.get_serializer(queryset, many=True).data
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        with transaction.atomic():
+            generator = SyntheticDataGenerator(seed=options['seed'])
+            created = generator.create_inventories(
+                options['pharmacies'],
+                options['masks_per_pharmacy'],
+                opening_hours=True,
+            )
+            analyze((Pharmacy, OpeningHour, Inventory))
+            self.stdout.write(f'seeded {created} inventories')
+
+            fast_serializers = settings.FAST_SERIALIZERS
+            try:
+                for view_class in (PharmacyListView, InventoryListView):
+                    view = self.get_view(view_class)
+                    for label, enabled in (('instances', False), ('values', True)):
+                        settings.FAST_SERIALIZERS = enabled
+                        rows = len(self.serialize(view, options['limit']))
+                        result = measure(
+                            lambda view=view: self.serialize(view, options['limit']),
+                            repeat=options['repeat'],
+                        )
+                        self.stdout.write(
+                            f'{view_class.__name__:>20} {label:>9}: rows={rows} '
+                            f'p50={result["p50"]:.1f}ms p95={result["p95"]:.1f}ms '
+                            f'rows/s={rows / result["p50"] * 1000:.0f}',
+                        )
+            finally:
+                settings.FAST_SERIALIZERS = fast_serializers
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,72 @@
+import argparse
+import re
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+
+from benchmark.endpoints import ENDPOINTS, build_queryset
+
+SEQ_SCAN_PATTERN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN (ANALYZE) on each endpoint's canonical query and report the sequential scans on its filtered table."
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--endpoint',
+            nargs='+',
+            choices=[endpoint.name for endpoint in ENDPOINTS],
+            help='only explain these endpoints',
+        )
+        parser.add_argument(
+            '--analyze',
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help='execute the queries to report the actual rows and timing',
+        )
+        parser.add_argument(
+            '--disable-seqscan',
+            action='store_true',
+            help='discourage sequential scans, on a small (CI) dataset it tells whether an index can serve the query at all',
+        )
+        parser.add_argument(
+            '--fail-on-seqscan',
+            action='store_true',
+            help='exit with an error when a filtered table is still read by a sequential scan',
+        )
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        endpoints = [
+            endpoint
+            for endpoint in ENDPOINTS
+            if not options['endpoint'] or endpoint.name in options['endpoint']
+        ]
+
+        seq_scans = {}
+        with transaction.atomic():
+            if options['disable_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for endpoint in endpoints:
+                plan = build_queryset(endpoint).explain(analyze=options['analyze'])
+                self.stdout.write(self.style.MIGRATE_HEADING(endpoint.name))
+                self.stdout.write(plan)
+
+                # p.s. partitions are reported under their own name, reading a partition
+                # whole is the expected plan once the others are pruned
+                table = endpoint.filtered_model._meta.db_table  # noqa: SLF001
+                if table in SEQ_SCAN_PATTERN.findall(plan):
+                    seq_scans[endpoint.name] = table
+                    self.stdout.write(self.style.WARNING(f'sequential scan on {table}'))
+                self.stdout.write('')
+
+            # EXPLAIN ANALYZE runs the queries, never keep anything they might touch
+            transaction.set_rollback(True)
+
+        if seq_scans and options['fail_on_seqscan']:
+            found = ', '.join(f'{name} ({table})' for name, table in seq_scans.items())
+            msg = f'sequential scans found: {found}'
+            raise CommandError(msg)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from django.core.management.base import CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from account.models import User
+from benchmark.utils import summarize
+from core.profiling import QueryProfile
+
+if TYPE_CHECKING:
+    from benchmark.scenarios import BenchmarkContext, Scenario
+
+
+def get_client() -> APIClient:
+    # p.s. the user is never saved, the permission only checks it is authenticated
+    client = APIClient()
+    client.force_authenticate(user=User(username='benchmark'))
+    return client
+
+
+def count_rows(data: object) -> int:
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    return 1
+
+
+def send_request(
+    client: APIClient,
+    scenario: Scenario,
+    context: BenchmarkContext,
+    iteration: int,
+) -> tuple[float, int, int]:
+    """
+    send one request of the scenario, return the latency in milliseconds, the queries and the rows
+    """
+    path, data = scenario.build_request(context, iteration)
+    profile = QueryProfile()
+    with connection.execute_wrapper(profile.record_query):
+        start = time.perf_counter()
+        if scenario.read_only:
+            response = client.get(path, data)
+        else:
+            response = getattr(client, scenario.method.lower())(
+                path,
+                data,
+                format='json',
+            )
+        latency = (time.perf_counter() - start) * 1000
+
+    if response.status_code >= 400:  # noqa: PLR2004
+        msg = f'{scenario.name}: {scenario.method} {path} returned {response.status_code} {response.data}'
+        raise CommandError(msg)
+    return latency, profile.query_count, count_rows(response.data)
+
+
+def summarize_requests(
+    samples: list[tuple[float, int, int]],
+    elapsed: float,
+) -> dict[str, float]:
+    """
+    the latency distribution, the queries and rows per request and the throughput over elapsed seconds
+    """
+    latencies, queries, rows = zip(*samples, strict=True)
+    return {
+        **summarize(list(latencies)),
+        'queries': statistics.fmean(queries),
+        'rows': statistics.fmean(rows),
+        'requests_per_sec': len(samples) / elapsed,
+        'rows_per_sec': sum(rows) / elapsed,
+    }
+
+
+def run_sequential(
+    scenario: Scenario,
+    context: BenchmarkContext,
+    repeat: int,
+    warmup: int,
+) -> dict[str, float]:
+    """
+    p.s. the elapsed time is the sum of the latencies
+    """
+    client = get_client()
+    samples = []
+    for iteration in range(warmup + repeat):
+        sample = send_request(client, scenario, context, iteration)
+        if iteration >= warmup:
+            samples.append(sample)
+
+    return summarize_requests(samples, sum(sample[0] for sample in samples) / 1000)
+
+
+def run_concurrent(
+    scenario: Scenario,
+    context: BenchmarkContext,
+    repeat: int,
+    concurrency: int,
+) -> dict[str, float]:
+    """
+    `concurrency` clients sending `repeat` requests each, the throughput is over the wall clock time
+    p.s. every thread has its own connection, it only sees committed rows
+    """
+
+    def worker(index: int) -> list[tuple[float, int, int]]:
+        client = get_client()
+        try:
+            return [
+                send_request(client, scenario, context, index * repeat + iteration)
+                for iteration in range(repeat)
+            ]
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = [
+            sample
+            for samples in executor.map(worker, range(concurrency))
+            for sample in samples
+        ]
+    return summarize_requests(samples, time.perf_counter() - start)
+
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    max_regression: float,
+) -> list[str]:
+    """
+    the scenarios whose p95 grew by more than max_regression (a ratio) or which run more queries
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['p95'] > previous['p95'] * (1 + max_regression):
+            regressions.append(
+                f'{name}: p95 {previous["p95"]:.1f}ms -> {result["p95"]:.1f}ms',
+            )
+        if result['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: queries {previous["queries"]:.1f} -> {result["queries"]:.1f}',
+            )
+    return regressions
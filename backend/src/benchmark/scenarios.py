@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from functools import partial
+from typing import TYPE_CHECKING, NamedTuple
+
+from django.urls import URLPattern
+
+from benchmark.endpoints import ENDPOINTS, Endpoint
+from member import urls as member_urls
+from member.views import PurchaseHistoryBulkCreateView, PurchaseHistoryCreateView
+from pharmacy import urls as pharmacy_urls
+from pharmacy.views import (
+    InventoryBulkCreateView,
+    InventoryBulkQuantityUpdateView,
+    InventoryBulkUpdateView,
+    InventoryQuantityUpdateView,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from uuid import UUID
+
+    from rest_framework.views import APIView
+
+BENCHMARKED_URLCONFS = (pharmacy_urls, member_urls)
+
+
+class BenchmarkContext(NamedTuple):
+    pharmacy_uuid: UUID
+    # the inventories of the pharmacy written by the requests, as the fields of the bulk update
+    inventories: list[dict]
+    member_uuid: UUID
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    view_class: type[APIView]
+    # (context, iteration) -> (path, query parameters or request body)
+    build_request: Callable[[BenchmarkContext, int], tuple[str, dict | list]]
+
+    @property
+    def read_only(self: Scenario) -> bool:
+        return self.method == 'GET'
+
+
+def build_list_request(
+    endpoint: Endpoint,
+    context: BenchmarkContext,
+    _iteration: int,
+) -> tuple[str, dict]:
+    path = endpoint.path.replace('<uuid>', str(context.pharmacy_uuid))
+    return path, endpoint.params
+
+
+def build_bulk_create_request(
+    context: BenchmarkContext,
+    iteration: int,
+) -> tuple[str, list]:
+    # p.s. a new name per iteration, an inventory is unique by name, color and count per pack
+    return f'/pharmacy/{context.pharmacy_uuid}/inventory/bulk-create/', [
+        {
+            'name': f'Benchmark Mask {iteration}',
+            'color': 'white',
+            'count_per_pack': index + 1,
+            'price': 1,
+            'stock_quantity': 10,
+        }
+        for index in range(len(context.inventories))
+    ]
+
+
+def build_bulk_update_request(
+    context: BenchmarkContext,
+    iteration: int,
+) -> tuple[str, list]:
+    return f'/pharmacy/{context.pharmacy_uuid}/inventory/bulk-update/', [
+        {**inventory, 'stock_quantity': inventory['stock_quantity'] + iteration}
+        for inventory in context.inventories
+    ]
+
+
+def build_bulk_quantity_update_request(
+    context: BenchmarkContext,
+    _iteration: int,
+) -> tuple[str, list]:
+    return '/pharmacy/inventory/update-quantity/', [
+        {'uuid': inventory['uuid'], 'delta': 1} for inventory in context.inventories
+    ]
+
+
+def build_quantity_update_request(
+    context: BenchmarkContext,
+    iteration: int,
+) -> tuple[str, dict]:
+    inventory = context.inventories[iteration % len(context.inventories)]
+    return f'/pharmacy/inventory/{inventory["uuid"]}/update-quantity/', {'delta': 1}
+
+
+def build_purchase_request(
+    context: BenchmarkContext,
+    _iteration: int,
+) -> tuple[str, list]:
+    return f'/member/{context.member_uuid}/create-purchase-history/', [
+        {'inventory_uuid': inventory['uuid'], 'quantity': 1}
+        for inventory in context.inventories
+    ]
+
+
+def build_bulk_purchase_request(
+    context: BenchmarkContext,
+    _iteration: int,
+) -> tuple[str, list]:
+    # p.s. one cart per item, the carts of a POS batch are small
+    return '/member/bulk-create-purchase-history/', [
+        {
+            'member_uuid': str(context.member_uuid),
+            'items': [{'inventory_uuid': inventory['uuid'], 'quantity': 1}],
+        }
+        for inventory in context.inventories
+    ]
+
+
+SCENARIOS = (
+    *(
+        Scenario(
+            endpoint.name,
+            'GET',
+            endpoint.view_class,
+            partial(build_list_request, endpoint),
+        )
+        for endpoint in ENDPOINTS
+    ),
+    Scenario(
+        'inventory-bulk-create',
+        'POST',
+        InventoryBulkCreateView,
+        build_bulk_create_request,
+    ),
+    Scenario(
+        'inventory-bulk-update',
+        'PUT',
+        InventoryBulkUpdateView,
+        build_bulk_update_request,
+    ),
+    Scenario(
+        'inventory-bulk-quantity-update',
+        'PUT',
+        InventoryBulkQuantityUpdateView,
+        build_bulk_quantity_update_request,
+    ),
+    Scenario(
+        'inventory-quantity-update',
+        'PUT',
+        InventoryQuantityUpdateView,
+        build_quantity_update_request,
+    ),
+    Scenario(
+        'purchase',
+        'POST',
+        PurchaseHistoryCreateView,
+        build_purchase_request,
+    ),
+    Scenario(
+        'bulk-purchase',
+        'POST',
+        PurchaseHistoryBulkCreateView,
+        build_bulk_purchase_request,
+    ),
+)
+
+
+def get_uncovered_views() -> list[str]:
+    """
+    the views of the benchmarked urls without a scenario, a new url has to come with one
+    """
+    covered = {scenario.view_class for scenario in SCENARIOS}
+    return [
+        str(pattern.pattern)
+        for urlconf in BENCHMARKED_URLCONFS
+        for pattern in urlconf.urlpatterns
+        if isinstance(pattern, URLPattern)
+        and pattern.callback.view_class not in covered
+    ]
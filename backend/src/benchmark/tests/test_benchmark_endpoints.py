@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from benchmark.scenarios import SCENARIOS, get_uncovered_views
+
+
+def test_every_url_has_a_scenario() -> None:
+    assert get_uncovered_views() == []
+
+
+@pytest.mark.django_db
+def test_benchmark_endpoints(tmp_path: Path) -> None:
+    output = tmp_path / 'baseline.json'
+    options = {
+        'pharmacies': 3,
+        'masks_per_pharmacy': 5,
+        'members': 3,
+        'purchases': 30,
+        'repeat': 2,
+        'warmup': 0,
+        'cart_size': 2,
+    }
+    call_command('benchmark_endpoints', output=output, **options)
+
+    baseline = json.loads(output.read_text())
+    assert set(baseline['results']) == {scenario.name for scenario in SCENARIOS}
+    assert baseline['results']['purchase']['rows'] == options['cart_size']
+
+    # a scenario running more queries than the baseline is a regression
+    baseline['results']['pharmacy-list']['queries'] = 0
+    output.write_text(json.dumps(baseline))
+    with pytest.raises(CommandError, match='pharmacy-list: queries'):
+        call_command('benchmark_endpoints', baseline=output, **options)
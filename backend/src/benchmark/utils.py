@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import statistics
+import time
+from typing import TYPE_CHECKING
+
+from django.db import connection
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from django.db.models import Model
+
+# measure the queries instead of the cached responses
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def measure(
+    func: Callable[[], object],
+    repeat: int,
+    warmup: int = 1,
+) -> dict[str, float]:
+    """
+    run `func` repeatedly and return the latency distribution in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return summarize(samples)
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    if len(samples) == 1:
+        return dict.fromkeys(('p50', 'p95', 'p99', 'mean'), samples[0])
+
+    # 99 cut points, the n-th one is the n-th percentile
+    cut_points = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'p50': cut_points[49],
+        'p95': cut_points[94],
+        'p99': cut_points[98],
+        'mean': statistics.fmean(samples),
+    }
+
+
+def analyze(models: Iterable[type[Model]]) -> None:
+    """
+    refresh the planner statistics after seeding, otherwise the plans are not representative
+    """
+    with connection.cursor() as cursor:
+        for model in models:
+            table = connection.ops.quote_name(model._meta.db_table)  # noqa: SLF001
+            cursor.execute(f'ANALYZE {table}')
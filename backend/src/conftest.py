@@ -1,7 +1,18 @@
+from collections.abc import Callable
+
 import pytest
-from rest_framework.test import APIClient
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.http import HttpResponse
+from pytest_django.fixtures import Settings
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
 
 from account.models import User
+from core.config.env_config import settings as env_settings
+from pharmacy.models import Inventory, OpeningHour, Pharmacy
+
+QUERY_PROFILER_MIDDLEWARE = 'core.profiling.QueryProfilerMiddleware'
 
 
 @pytest.fixture
@@ -20,3 +31,85 @@ def authenticated_client(test_user: User) -> APIClient:
     client = APIClient()
     client.force_authenticate(user=test_user)
     return client
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    # the local memory cache outlives the test database rows
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def query_budget(settings: Settings, monkeypatch: pytest.MonkeyPatch) -> None:
+    # profile every request, a view going over its query_budget fails the test
+    if QUERY_PROFILER_MIDDLEWARE not in settings.MIDDLEWARE:
+        settings.MIDDLEWARE = [QUERY_PROFILER_MIDDLEWARE, *settings.MIDDLEWARE]
+    monkeypatch.setattr(env_settings, 'QUERY_BUDGET_RAISE', True)
+
+
+@pytest.fixture
+def get_view_content(
+    test_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Callable[..., tuple[int, bytes]]:
+    """
+    call a list view directly as its sync or async (ASYNC_VIEWS) implementation,
+    return the status code and the rendered (or streamed) content
+    p.s. not through the ASGI handler, the async ORM runs its queries on the connection of the test
+    """
+
+    async def read_async(response: HttpResponse) -> bytes:
+        if response.streaming:
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return response.render().content
+
+    def get_view_content(
+        view_class: type[APIView],
+        params: dict,
+        *,
+        is_async: bool,
+        **kwargs: dict,
+    ) -> tuple[int, bytes]:
+        monkeypatch.setattr(env_settings, 'ASYNC_VIEWS', is_async)
+        # the cached responses of the other implementation are not served
+        cache.clear()
+
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=test_user)
+        view = view_class.as_view()
+        if is_async:
+            response = async_to_sync(view)(request, **kwargs)
+            return response.status_code, async_to_sync(read_async)(response)
+
+        response = view(request, **kwargs)
+        if response.streaming:
+            return response.status_code, b''.join(response.streaming_content)
+        return response.status_code, response.render().content
+
+    return get_view_content
+
+
+@pytest.fixture
+def listed_pharmacy(inventory: Inventory) -> Pharmacy:
+    """
+    the pharmacy of `inventory` with a second inventory (out of stock) and opening hours on two days,
+    so every list view has more than one row to compare its implementations on
+    p.s. `inventory` comes from the conftest of the app requesting it
+    """
+    pharmacy = inventory.pharmacy
+    Inventory.objects.create(
+        pharmacy=pharmacy,
+        name='Mask B',
+        color='blue',
+        count_per_pack=10,
+        price=12.35,
+        stock_quantity=0,
+    )
+    for weekday, start_time in (('Mon', '08:00'), ('Tue', '13:30')):
+        OpeningHour.objects.create(
+            pharmacy=pharmacy,
+            weekday=weekday,
+            start_time=start_time,
+            end_time='18:00',
+        )
+    return pharmacy
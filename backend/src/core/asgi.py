@@ -11,5 +11,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.config.base')
+# the read-only lists are served by their async implementation
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Self
+
+from asgiref.sync import sync_to_async
+from django.utils.functional import classproperty
+from rest_framework.response import Response
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from django.db.models.query import QuerySet
+    from django.http import HttpRequest, HttpResponse
+    from rest_framework.request import Request
+
+
+class AsyncListMixin:
+    """
+    serve the list with the async ORM when ASYNC_VIEWS is set (by the ASGI entry point),
+    GET runs `alist` on the event loop instead of `list` in a worker thread.
+    the authentication and the permissions are sync (e.g. the user lookup of the JWT),
+    they run in one sync_to_async call before the list.
+    p.s. decided when the url patterns call as_view(), the WSGI entry point keeps the sync views
+    """
+
+    @classproperty
+    def view_is_async(cls: type[Self]) -> bool:  # noqa: N805
+        return settings.ASYNC_VIEWS
+
+    def dispatch(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        if not self.view_is_async:
+            return super().dispatch(request, *args, **kwargs)
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        """
+        APIView.dispatch with the GET / HEAD handler awaited
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            method = request.method.lower()
+            if method in ('get', 'head'):
+                response = await self.alist(request, *args, **kwargs)
+            else:
+                handler = getattr(self, method, self.http_method_not_allowed)
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:  # noqa: BLE001
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def alist(
+        self: Self,
+        request: Request,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        """
+        ListModelMixin.list, the rows are fetched by async iteration before they are serialized
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        rows = [row async for row in queryset]
+        serializer = self.get_serializer(rows, many=True)
+        return Response(serializer.data)
+
+    async def apaginate_queryset(self: Self, queryset: QuerySet) -> list | None:
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset,
+            self.request,
+            view=self,
+        )
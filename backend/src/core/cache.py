@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from typing import TYPE_CHECKING, Any, Self
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from django.http import HttpResponse
+    from rest_framework.request import Request
+
+# the data a cached response depends on, bumped by the write paths of the models
+PHARMACY_NAMESPACE = 'pharmacy'
+OPENING_HOUR_NAMESPACE = 'opening_hour'
+INVENTORY_NAMESPACE = 'inventory'
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_version_key(namespace: str) -> str:
+    return f'cache-version:{namespace}'
+
+
+def get_namespace_version(namespace: str) -> int:
+    """
+    p.s. a missing version starts from the current time, so an evicted version never
+    collides with a number used before and old entries are never served again
+    """
+    key = get_version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_namespace_version(namespace: str) -> int:
+    key = get_version_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_namespace_version(*namespaces: str) -> None:
+    """
+    invalidate every cached response depending on the namespaces once the transaction commits,
+    so a response cached before the commit can not keep the old data
+    """
+
+    def bump() -> None:
+        for namespace in namespaces:
+            try:
+                cache.incr(get_version_key(namespace))
+            except ValueError:
+                cache.add(get_version_key(namespace), time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def get_user_key(user_id: object) -> str:
+    return f'user:{user_id}'
+
+
+def invalidate_user(user_id: object) -> None:
+    """
+    drop the cached user of the JWT authentication once the transaction commits,
+    so a deactivated user or a changed password is never read from the cache
+    """
+    transaction.on_commit(lambda: cache.delete(get_user_key(user_id)))
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], Any],
+    timeout: int = settings.CACHE_TIMEOUT,
+) -> Any:  # noqa: ANN401
+    """
+    read-through cache with a stampede guard, a cold key is computed by one caller
+    while the others wait for the value instead of running the same query
+    p.s. None is never cached, return it from compute to skip caching the result
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=settings.CACHE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    # p.s. compute it anyway if the holder of the lock is gone or too slow
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        values = cache.get_many((key, lock_key))
+        if values.get(key) is not None:
+            return values[key]
+        # released without a value (compute returned None), nothing to wait for
+        if lock_key not in values:
+            break
+    return compute()
+
+
+async def aget_or_compute(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    # p.s. the expiry of the cached value, not a timeout of the call
+    timeout: int = settings.CACHE_TIMEOUT,  # noqa: ASYNC109
+) -> Any:  # noqa: ANN401
+    """
+    get_or_compute for the async views, the waiters sleep without holding a thread
+    """
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=settings.CACHE_LOCK_TIMEOUT):
+        try:
+            value = await compute()
+            if value is not None:
+                await cache.aset(key, value, timeout=timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        values = await cache.aget_many((key, lock_key))
+        if values.get(key) is not None:
+            return values[key]
+        if lock_key not in values:
+            break
+    return await compute()
+
+
+class CachedListMixin:
+    """
+    cache the list response, keyed by the path and the normalized query parameters
+    together with the versions of `cache_namespaces`, a write bumping a version invalidates it.
+    only successful non-streaming responses are cached, a streamed list skips the cache and its lock.
+    """
+
+    cache_namespaces: tuple[str, ...] = ()
+    cache_timeout = settings.CACHE_TIMEOUT
+
+    def build_cache_key(self: Self, request: Request, versions: list[int]) -> str:
+        # the order of the parameters and of repeated values does not change the result
+        params = urlencode(
+            sorted(
+                (key, value)
+                for key, values in request.query_params.lists()
+                for value in values
+            ),
+        )
+        digest = hashlib.sha256(
+            f'{request.get_host()}{request.path}?{params}'.encode(),
+        ).hexdigest()
+        return f'response:{self.__class__.__name__}:{":".join(map(str, versions))}:{digest}'
+
+    def get_cache_key(self: Self, request: Request) -> str:
+        versions = [
+            get_namespace_version(namespace) for namespace in self.cache_namespaces
+        ]
+        return self.build_cache_key(request, versions)
+
+    async def aget_cache_key(self: Self, request: Request) -> str:
+        versions = [
+            await aget_namespace_version(namespace)
+            for namespace in self.cache_namespaces
+        ]
+        return self.build_cache_key(request, versions)
+
+    def list(
+        self: Self,
+        request: Request,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        if not self.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        responses = []
+
+        def compute() -> Any:  # noqa: ANN401
+            response = super(CachedListMixin, self).list(request, *args, **kwargs)
+            responses.append(response)
+            return self.get_cacheable_data(response)
+
+        data = get_or_compute(self.get_cache_key(request), compute, self.cache_timeout)
+        # not cacheable (e.g. streaming), return the response computed by this request as is
+        if data is None:
+            return responses[0]
+        return Response(data)
+
+    async def alist(
+        self: Self,
+        request: Request,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        if not self.is_cacheable(request):
+            return await super().alist(request, *args, **kwargs)
+
+        responses = []
+
+        async def compute() -> Any:  # noqa: ANN401
+            response = await super(CachedListMixin, self).alist(
+                request,
+                *args,
+                **kwargs,
+            )
+            responses.append(response)
+            return self.get_cacheable_data(response)
+
+        data = await aget_or_compute(
+            await self.aget_cache_key(request),
+            compute,
+            self.cache_timeout,
+        )
+        if data is None:
+            return responses[0]
+        return Response(data)
+
+    def is_cacheable(self: Self, request: Request) -> bool:
+        # p.s. the stream format of StreamingListMixin, an invalid one raises like the list does
+        get_stream_format = getattr(self, 'get_stream_format', None)
+        return get_stream_format is None or get_stream_format(request) is None
+
+    def get_cacheable_data(self: Self, response: HttpResponse) -> Any:  # noqa: ANN401
+        if (
+            isinstance(response, Response)
+            and response.status_code == status.HTTP_200_OK
+        ):
+            return response.data
+        return None
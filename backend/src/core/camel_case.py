@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Self
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings as django_settings
+from django.http import QueryDict
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from djangorestframework_camel_case.util import (
+    camel_to_underscore,
+    camelize_re,
+    is_iterable,
+    underscore_to_camel,
+)
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.config.env_config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from typing import IO
+
+    from django.http import HttpRequest, HttpResponse
+
+# the converted keys (and key tuples of the rows) are cached, bounded since the parsed keys come from the client
+KEY_CACHE_SIZE = 4096
+
+# the values kept as they are, checked by the exact type, a subclass e.g. ErrorDetail goes through camelize
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+ORJSON_OPTIONS = (
+    (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+    if orjson
+    else 0
+)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def camelize_key(key: Any) -> Any:  # noqa: ANN401
+    if isinstance(key, Promise):
+        key = force_str(key)
+    if isinstance(key, str) and '_' in key:
+        return camelize_re.sub(underscore_to_camel, key)
+    return key
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def camelize_keys(keys: tuple) -> tuple:
+    return tuple(camelize_key(key) for key in keys)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def underscoreize_key(key: Any) -> Any:  # noqa: ANN401
+    return camel_to_underscore(key) if isinstance(key, str) else key
+
+
+def camelize(data: Any) -> Any:  # noqa: ANN401
+    """
+    the same output as djangorestframework_camel_case's camelize, without its per key regex and OrderedDict,
+    the keys of a dict are converted at once by their tuple, the rows of a list share the same one.
+    """
+    if isinstance(data, dict):
+        return dict(
+            zip(
+                camelize_keys(tuple(data)),
+                [
+                    value if type(value) in SCALAR_TYPES else camelize(value)
+                    for value in data.values()
+                ],
+                strict=True,
+            ),
+        )
+    if isinstance(data, list | tuple):
+        return [item if type(item) in SCALAR_TYPES else camelize(item) for item in data]
+    if isinstance(data, str):
+        return data
+    if isinstance(data, Promise):
+        return force_str(data)
+    if is_iterable(data):
+        return [camelize(item) for item in data]
+    return data
+
+
+def underscoreize(data: Any) -> Any:  # noqa: ANN401
+    """
+    the reverse of camelize for a parsed JSON body, only dicts and lists are walked
+    """
+    if isinstance(data, dict):
+        return {
+            underscoreize_key(key): (
+                value if type(value) in SCALAR_TYPES else underscoreize(value)
+            )
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [
+            item if type(item) in SCALAR_TYPES else underscoreize(item) for item in data
+        ]
+    return data
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    camelize the keys with the cached conversions, then encode with orjson when it is installed
+    (and ORJSON is set), the stdlib encoder is kept for the indented responses.
+    p.s. with orjson the JSON is the same, but floats in exponent form are written differently (1e16, not 1e+16)
+    """
+
+    default = JSONEncoder().default
+
+    def render(
+        self: Self,
+        data: Any,  # noqa: ANN401
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        if data is None:
+            return b''
+
+        data = camelize(data)
+        if (
+            orjson is not None
+            and settings.ORJSON
+            and self.compact
+            and self.get_indent(accepted_media_type, renderer_context or {}) is None
+        ):
+            try:
+                content = orjson.dumps(
+                    data,
+                    default=self.default,
+                    option=ORJSON_OPTIONS,
+                )
+            except orjson.JSONEncodeError:
+                # e.g. an integer over 64 bits, the stdlib encoder handles it
+                pass
+            else:
+                # the same escape as JSONRenderer, so the JSON is a strict javascript subset
+                return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                    b'\xe2\x80\xa9',
+                    b'\\u2029',
+                )
+
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class CamelCaseJSONParser(JSONParser):
+    """
+    parse with orjson when it is installed (and ORJSON is set), then convert the keys with the cached conversions
+    """
+
+    def parse(
+        self: Self,
+        stream: IO,
+        media_type: str | None = None,
+        parser_context: dict | None = None,
+    ) -> Any:  # noqa: ANN401
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', django_settings.DEFAULT_CHARSET)
+
+        try:
+            content = stream.read()
+            if orjson is not None and settings.ORJSON:
+                # p.s. orjson only reads utf-8
+                data = orjson.loads(
+                    (
+                        content
+                        if encoding.lower() in ('utf-8', 'utf8')
+                        else content.decode(encoding)
+                    ),
+                )
+            else:
+                data = json.loads(content.decode(encoding))
+        except ValueError as exc:
+            msg = f'JSON parse error - {exc}'
+            raise ParseError(msg) from exc
+        return underscoreize(data)
+
+
+class CamelCaseQueryMiddleware:
+    """
+    convert the query parameter names to snake case with the cached conversions
+    p.s. sync and async capable, it does not put the async views back on a thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self: Self,
+        get_response: Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]],
+    ) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self: Self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.underscoreize_query(request)
+        return self.get_response(request)
+
+    async def __acall__(self: Self, request: HttpRequest) -> HttpResponse:
+        self.underscoreize_query(request)
+        return await self.get_response(request)
+
+    def underscoreize_query(self: Self, request: HttpRequest) -> None:
+        query = QueryDict(mutable=True)
+        for key, values in request.GET.lists():
+            query.setlist(underscoreize_key(key), values)
+        request.GET = query
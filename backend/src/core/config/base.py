@@ -35,6 +35,7 @@ CUSTOM_APPS = [
     'pharmacy',
     'member',
     'etl',
+    'benchmark',
 ]
 
 INSTALLED_APPS = [
@@ -63,9 +64,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'djangorestframework_camel_case.middleware.CamelCaseMiddleWare',
+    'core.camel_case.CamelCaseQueryMiddleware',
     'csp.middleware.CSPMiddleware',
 ]
+# outermost, so the queries of the other middlewares are counted as well
+if settings.QUERY_PROFILER:
+    MIDDLEWARE.insert(0, 'core.profiling.QueryProfilerMiddleware')
 
 ROOT_URLCONF = 'core.urls'
 
@@ -89,14 +93,10 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Django Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    ),
-    'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
-    ),
-    'DEFAULT_PARSER_CLASSES': (
-        'djangorestframework_camel_case.parser.CamelCaseJSONParser',
+        'account.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': ('core.camel_case.CamelCaseJSONRenderer',),
+    'DEFAULT_PARSER_CLASSES': ('core.camel_case.CamelCaseJSONParser',),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
@@ -136,9 +136,42 @@ DATABASES = {
         'PASSWORD': settings.DB_PASSWORD,
         'HOST': settings.DB_HOST,
         'PORT': settings.DB_PORT,
+        # p.s. a pooled connection goes back to the pool after every request, it can not persist as well.
+        # under ASGI the queries of each request run in a thread of its own, a persistent connection would be left behind
+        'CONN_MAX_AGE': (
+            0 if settings.DB_POOL or settings.ASYNC_VIEWS else settings.DB_CONN_MAX_AGE
+        ),
+        'CONN_HEALTH_CHECKS': settings.DB_CONN_HEALTH_CHECKS,
+        'OPTIONS': (
+            {
+                'pool': {
+                    'min_size': settings.DB_POOL_MIN_SIZE,
+                    'max_size': settings.DB_POOL_MAX_SIZE,
+                    'timeout': settings.DB_POOL_TIMEOUT,
+                },
+            }
+            if settings.DB_POOL
+            else {}
+        ),
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': settings.CACHE_URL,
+        }
+        if settings.CACHE_URL
+        else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    ),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -178,5 +211,26 @@ STATIC_ROOT = Path(BASE_DIR) / 'static'
 STATIC_URL = '/static/'
 
 
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # default User model
 AUTH_USER_MODEL = 'account.User'
@@ -13,6 +13,17 @@ class DatabaseSettings(BaseSettings):
     DB_PORT: int = 5432
     DB_NAME: str = 'phantom_mask_db'
 
+    # keep the connection of a worker open for this many seconds between requests (None: unlimited, 0: close
+    # after every request), with the health check a connection dropped by the server is replaced before use
+    DB_CONN_MAX_AGE: int | None = 60
+    DB_CONN_HEALTH_CHECKS: bool = True
+    # a psycopg pool per worker process instead of the persistent connection, needs psycopg_pool (psycopg[pool])
+    # p.s. DB_POOL_MAX_SIZE * gunicorn workers has to stay below the max_connections of the server
+    DB_POOL: bool = False
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 4
+    DB_POOL_TIMEOUT: float = 10.0
+
 
 class SystemSettings(BaseSettings):
     SECRET_KEY: str | None = None
@@ -24,6 +35,40 @@ class SystemSettings(BaseSettings):
     USE_TZ: bool = True
 
     BATCH_SIZE: int = 100
+    ETL_BATCH_SIZE: int = 5000
+
+    LOCK_RETRY_ATTEMPTS: int = 3
+    LOCK_RETRY_BACKOFF: float = 0.05
+
+    PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+    STREAM_CHUNK_SIZE: int = 2000
+    MAX_RANKING_TOP: int = 100
+    # line items of all the carts of a bulk purchase
+    MAX_BULK_PURCHASE_ITEMS: int = 10000
+    # read the lists with .values() mapped by the compiled serializers instead of model instances
+    FAST_SERIALIZERS: bool = True
+    # render and parse the JSON with orjson when it is installed, the stdlib json otherwise
+    ORJSON: bool = True
+    # serve the read-only lists with the async ORM, set by the ASGI entry point (core/asgi.py)
+    ASYNC_VIEWS: bool = False
+
+    # monthly partitions of the purchase histories created ahead of time,
+    # and the months kept attached, older ones are detached (keep all when not set)
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETAIN_MONTHS: int | None = None
+
+    # e.g. redis://redis:6379/0, use the local memory cache when not set
+    CACHE_URL: str | None = None
+    CACHE_TIMEOUT: int = 300
+    CACHE_LOCK_TIMEOUT: int = 10
+    # seconds the user of a JWT is cached, bounds how long a user updated without save() stays stale
+    USER_CACHE_TIMEOUT: int = 60
+
+    # profile the queries of every request (Server-Timing header and the core.profiling log),
+    # a view over its query_budget raises instead of logging a warning when QUERY_BUDGET_RAISE is set
+    QUERY_PROFILER: bool = False
+    QUERY_BUDGET_RAISE: bool = False
 
 
 class Settings(SystemSettings, DatabaseSettings):
@@ -1,6 +1,10 @@
+import operator
+from functools import reduce
 from typing import Self
 
 from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
 from rest_framework.filters import SearchFilter
@@ -11,6 +15,9 @@ class FullTextSearchFilter(SearchFilter):
     """
     implement full text search by using SearchVector and SearchQuery
     p.s. reference from https://docs.djangoproject.com/en/5.2/ref/contrib/postgres/search/#the-search-lookup
+
+    set `search_vector_field` on the view to use a precomputed (GIN indexed) SearchVectorField,
+    otherwise the vector is built from `search_fields` on the fly
     """
 
     def filter_queryset(
@@ -20,16 +27,32 @@ class FullTextSearchFilter(SearchFilter):
         view: APIView,
     ) -> QuerySet:
 
-        search_fields = self.get_search_fields(view, request)
         search_terms = self.get_search_terms(request)
-
-        search_query = SearchQuery('')
-        for term in search_terms:
-            search_query |= SearchQuery(term)
-
-        search_vector = SearchVector(*search_fields)
-
+        if not search_terms:
+            return queryset
+
+        search_query = reduce(
+            operator.or_,
+            (SearchQuery(term) for term in search_terms),
+        )
+
+        search_vector_field = getattr(view, 'search_vector_field', None)
+        if search_vector_field is None:
+            search_vector_field = 'search'
+            queryset = queryset.annotate(
+                search=SearchVector(*self.get_search_fields(view, request)),
+            )
+
+        # only rank the rows matching the search query (`@@`)
+        # p.s. cast the real returned by ts_rank to double precision, so the rank survives a cursor round trip
         # descending to show the most relevant to the search_terms
-        return queryset.annotate(
-            rank=SearchRank(search_vector, search_query),
-        ).order_by('-rank')
+        return (
+            queryset.filter(**{search_vector_field: search_query})
+            .annotate(
+                rank=Cast(
+                    SearchRank(F(search_vector_field), search_query),
+                    FloatField(),
+                ),
+            )
+            .order_by('-rank')
+        )
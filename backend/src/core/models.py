@@ -1,17 +1,53 @@
 from __future__ import annotations
 
+import random
+import time
 import uuid
 from contextlib import contextmanager
-from typing import TYPE_CHECKING
+from functools import wraps
+from typing import TYPE_CHECKING, Any
 from uuid import UUID
 
-from django.db import models, transaction
+from django.db import OperationalError, connection, models, transaction
+
+from core.config.env_config import settings
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Callable, Generator
 
     from django.db.models.query import QuerySet
 
+# sqlstate of serialization failure, deadlock detected and lock not available by NOWAIT
+RETRYABLE_SQLSTATES = frozenset(('40001', '40P01', '55P03'))
+
+
+def retry_on_conflict(func: Callable) -> Callable:
+    """
+    retry the whole transaction when it is rolled back by a lock conflict,
+    with a jittered exponential backoff between the attempts
+    p.s. only retries as the outermost transaction, an enclosing transaction is already aborted
+    """
+
+    @wraps(func)
+    def wrapper(*args: tuple, **kwargs: dict) -> Any:  # noqa: ANN401
+        for attempt in range(settings.LOCK_RETRY_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                sqlstate = getattr(e.__cause__, 'sqlstate', None)
+                if (
+                    sqlstate not in RETRYABLE_SQLSTATES
+                    or connection.in_atomic_block
+                    or attempt + 1 == settings.LOCK_RETRY_ATTEMPTS
+                ):
+                    raise
+
+            backoff = settings.LOCK_RETRY_BACKOFF * 2**attempt
+            time.sleep(random.uniform(0, backoff))  # noqa: S311
+        return None
+
+    return wrapper
+
 
 class BaseModel(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -29,13 +65,28 @@ class BaseModel(models.Model):
     def lock_query(
         cls: type[BaseModel],
         uuid_list: list[UUID],
+        *,
+        nowait: bool = False,
+        skip_locked: bool = False,
         **kwargs: dict,  # for extra custom filters
     ) -> Generator[QuerySet[BaseModel], None, None]:
+        """
+        lock the rows in uuid order, so transactions locking overlapping rows never deadlock
+        p.s. the queryset is lazy, evaluate it before locking the next model to keep the order
+        nowait raises on a locked row, skip_locked leaves the locked rows out
+        """
         try:
             with transaction.atomic():
-                queryset = cls.objects.select_for_update().filter(
-                    uuid__in=uuid_list,
-                    **kwargs,
+                queryset = (
+                    cls.objects.select_for_update(
+                        nowait=nowait,
+                        skip_locked=skip_locked,
+                    )
+                    .filter(
+                        uuid__in=uuid_list,
+                        **kwargs,
+                    )
+                    .order_by('uuid')
                 )
                 yield queryset
         except Exception as e:  # noqa: TRY203
@@ -46,10 +97,12 @@ class BaseModel(models.Model):
     def lock_instance(
         cls: type[BaseModel],
         uuid: UUID,
+        *,
+        nowait: bool = False,
     ) -> Generator[QuerySet[BaseModel], None, None]:
         try:
             with transaction.atomic():
-                queryset = cls.objects.select_for_update().get(uuid=uuid)
+                queryset = cls.objects.select_for_update(nowait=nowait).get(uuid=uuid)
                 yield queryset
         except Exception as e:  # noqa: TRY203
             raise e  # noqa: TRY201
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, time
+from typing import TYPE_CHECKING, Any, Self
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from django.db.models.query import QuerySet
+    from rest_framework.request import Request
+    from rest_framework.views import APIView
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder keeping the microseconds of datetimes and times, the keyset filter
+    compares against the exact value (the lookups parse the iso format back)
+    """
+
+    def default(self: Self, o: object) -> Any:  # noqa: ANN401
+        if isinstance(o, datetime | time):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer(signing.JSONSerializer):
+    """
+    the positions hold dates, decimals and uuids
+    """
+
+    def dumps(self: Self, obj: dict) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), cls=CursorJSONEncoder).encode()
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    opt-in keyset pagination, the list is only paginated when `cursor` or `page_size` is requested.
+
+    the position is the row's (ordering fields..., unique field) so rows sharing a sort key are
+    neither skipped nor repeated. the ordering comes from the filtered queryset (OrderingFilter,
+    full text search rank or the view's own order_by), and the unique field from the view's
+    `cursor_unique_field` (default `uuid`), aggregate views point it at their group key.
+    views bounding the whole list (e.g. top N) return the bound from `get_max_results`,
+    the cursor counts the returned rows and the walk stops there, it is signed so the count can
+    not be reset by the client.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+    unique_field = 'uuid'
+
+    def is_requested(self: Self, request: Request) -> bool:
+        return (
+            self.cursor_query_param in request.query_params
+            or self.page_size_query_param in request.query_params
+        )
+
+    def get_ordering(
+        self: Self,
+        request: Request,
+        queryset: QuerySet,
+        view: APIView | None,
+    ) -> tuple[str, ...]:
+        unique_field = getattr(view, 'cursor_unique_field', self.unique_field)
+
+        ordering = []
+        for field in queryset.query.order_by:
+            if not isinstance(field, str) or field == '?':
+                msg = f'Keyset pagination only supports ordering by field names, got {field!r}.'
+                raise ImproperlyConfigured(msg)
+            if field.lstrip('-') != unique_field:
+                ordering.append(field)
+
+        return (*ordering, unique_field)
+
+    def is_nullable(self: Self, queryset: QuerySet, name: str) -> bool:
+        """
+        p.s. an annotation, an unknown field or a path through a nullable relation may be null
+        """
+        if name in queryset.query.annotations:
+            return True
+
+        model = queryset.model
+        for attribute in name.split('__'):
+            try:
+                field = model._meta.get_field(attribute)  # noqa: SLF001
+            except FieldDoesNotExist:
+                return True
+            if field.null:
+                return True
+            model = field.related_model
+        return False
+
+    def get_max_results(self: Self, view: APIView | None) -> int | None:
+        get_max_results = getattr(view, 'get_max_results', None)
+        return get_max_results() if get_max_results else None
+
+    def get_page_queryset(
+        self: Self,
+        queryset: QuerySet,
+        request: Request,
+        view: APIView | None = None,
+    ) -> QuerySet | None:
+        """
+        the queryset of the requested page and one more row telling if there is a next page,
+        None when the list is not paginated
+        """
+        # sliced querysets are already bounded and can not be filtered any further
+        if not self.is_requested(request) or queryset.query.is_sliced:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.nullable_fields = {
+            field
+            for field in self.ordering
+            if self.is_nullable(queryset, field.lstrip('-'))
+        }
+        max_results = self.get_max_results(view)
+
+        position, self.returned = self.decode_position(request)
+        if position is not None:
+            queryset = queryset.filter(self.build_keyset_filter(position))
+
+        # p.s. never read past the bound, the last page only fetches what is left of it
+        self.fetch_size = self.page_size
+        self.has_more_results = True
+        if max_results is not None:
+            self.fetch_size = max(min(self.page_size, max_results - self.returned), 0)
+            self.has_more_results = self.returned + self.fetch_size < max_results
+
+        return queryset.order_by(*self.ordering)[: self.fetch_size + 1]
+
+    def set_page(self: Self, rows: list) -> list:
+        self.page = rows[: self.fetch_size]
+        self.returned += len(self.page)
+        self.has_next = len(rows) > self.fetch_size and self.has_more_results
+        return self.page
+
+    def paginate_queryset(
+        self: Self,
+        queryset: QuerySet,
+        request: Request,
+        view: APIView | None = None,
+    ) -> list | None:
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(
+        self: Self,
+        queryset: QuerySet,
+        request: Request,
+        view: APIView | None = None,
+    ) -> list | None:
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def build_keyset_filter(self: Self, position: list) -> Q:
+        """
+        expand (f1, f2, ...) > (v1, v2, ...) into
+        f1 > v1 OR (f1 = v1 AND f2 > v2) OR ..., flipping the comparison for descending fields
+        p.s. postgres sorts the nulls last ascending and first descending, so after a null
+        come the other nulls (descending: every value), and after a value the nulls (ascending)
+        """
+        keyset_filter = Q()
+        equal_filter = {}
+        for field, value in zip(self.ordering, position, strict=True):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if value is None:
+                if descending:
+                    keyset_filter |= Q(**equal_filter, **{f'{name}__isnull': False})
+                equal_filter[f'{name}__isnull'] = True
+                continue
+
+            after_filter = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if not descending and field in self.nullable_fields:
+                after_filter |= Q(**{f'{name}__isnull': True})
+            keyset_filter |= Q(**equal_filter) & after_filter
+            equal_filter[name] = value
+        return keyset_filter
+
+    def get_position_value(
+        self: Self,
+        row: Model | dict,
+        field: str,
+    ) -> Any:  # noqa: ANN401
+        name = field.lstrip('-')
+        if isinstance(row, dict):
+            return row[name]
+
+        value = row
+        for attribute in name.split('__'):
+            value = getattr(value, attribute)
+        return value.pk if isinstance(value, Model) else value
+
+    def encode_position(self: Self, position: list) -> str:
+        # p.s. not signing.dumps, without a timestamp the same page always links the same cursor
+        return signing.Signer(salt=CURSOR_SALT).sign_object(
+            {
+                'ordering': self.ordering,
+                'position': position,
+                'returned': self.returned,
+            },
+            serializer=CursorSerializer,
+        )
+
+    def decode_position(self: Self, request: Request) -> tuple[list | None, int]:
+        """
+        return the position of the last returned row and the number of rows returned so far
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, 0
+
+        try:
+            payload = signing.Signer(salt=CURSOR_SALT).unsign_object(
+                encoded,
+                serializer=CursorSerializer,
+            )
+            ordering, position = payload['ordering'], payload['position']
+            returned = int(payload['returned'])
+        except (signing.BadSignature, TypeError, ValueError, KeyError) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+
+        # the cursor was issued for another ordering
+        if (
+            tuple(ordering) != self.ordering
+            or len(position) != len(self.ordering)
+            or returned < 0
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, returned
+
+    def get_next_link(self: Self) -> str | None:
+        if not self.has_next:
+            return None
+
+        last_row = self.page[-1]
+        position = [self.get_position_value(last_row, field) for field in self.ordering]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_position(position),
+        )
+
+    def get_previous_link(self: Self) -> None:
+        # keyset pagination only walks forward
+        return None
+
+    def get_paginated_response(self: Self, data: list) -> Response:
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self: Self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': f'http://api.example.org/pharmacy/?{self.cursor_query_param}=eyJvcmRlcmluZyI6W119:Atkp_bXIdV-ndvzoDfmrJDcXiRNFYufPeY1i9ljG35g',
+                },
+                'results': schema,
+            },
+        }
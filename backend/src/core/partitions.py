@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import gzip
+import re
+from datetime import date, datetime, time
+from typing import TYPE_CHECKING, Self
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# e.g. member_purchasehistory_p2025_01
+PARTITION_MONTH_PATTERN = re.compile(r'_p(\d{4})_(\d{2})$')
+MONTHS_PER_YEAR = 12
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    p.s. always returns the first day of the month
+    """
+    index = month.year * MONTHS_PER_YEAR + month.month - 1 + months
+    return date(index // MONTHS_PER_YEAR, index % MONTHS_PER_YEAR + 1, 1)
+
+
+def local_midnight(day: date) -> datetime:
+    # the month boundaries follow TIME_ZONE, like the daily spend rollup
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+class MonthlyPartitions:
+    """
+    manage the monthly range partitions of a table partitioned by `column`,
+    rows outside of every month land in the `<table>_default` partition
+    """
+
+    def __init__(self: Self, table: str, column: str) -> None:
+        self.table = table
+        self.column = column
+        self.default_partition = f'{table}_default'
+
+    def get_partition_name(self: Self, month: date) -> str:
+        return f'{self.table}_p{month:%Y_%m}'
+
+    def get_partitions(self: Self) -> dict[date, str]:
+        """
+        the attached monthly partitions by their first day
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [self.table],
+            )
+            names = [name for (name,) in cursor.fetchall()]
+
+        partitions = {}
+        for name in names:
+            match = PARTITION_MONTH_PATTERN.search(name)
+            if match:
+                partitions[date(int(match[1]), int(match[2]), 1)] = name
+        return partitions
+
+    def create(self: Self, month: date) -> bool:
+        """
+        create the partition of the month, return False when it already exists.
+        the rows of the month already in the default partition are moved into it
+        p.s. the partition is filled before it is attached, attaching a new partition
+        fails while the default partition still holds rows of its range
+        """
+        month = month.replace(day=1)
+        if month in self.get_partitions():
+            return False
+
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.table)
+        partition = quote_name(self.get_partition_name(month))
+        column = quote_name(self.column)
+        bounds = {
+            'start': local_midnight(month),
+            'end': local_midnight(add_months(month, 1)),
+        }
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            )
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {quote_name(self.default_partition)}
+                    WHERE {column} >= %(start)s AND {column} < %(end)s
+                    RETURNING *
+                )
+                INSERT INTO {partition} SELECT * FROM moved
+                """,  # noqa: S608
+                bounds,
+            )
+            cursor.execute(
+                f'ALTER TABLE {table} ATTACH PARTITION {partition} '
+                'FOR VALUES FROM (%(start)s) TO (%(end)s)',
+                bounds,
+            )
+        return True
+
+    def create_range(self: Self, first_month: date, last_month: date) -> list[str]:
+        """
+        create the missing partitions from first_month to last_month, both included
+        """
+        created = []
+        month = first_month.replace(day=1)
+        while month <= last_month:
+            if self.create(month):
+                created.append(self.get_partition_name(month))
+            month = add_months(month, 1)
+        return created
+
+    def split_default(self: Self) -> list[str]:
+        """
+        create the partitions of the months found in the default partition,
+        e.g. after loading purchases older than the existing partitions
+        """
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT DISTINCT date_trunc('month', {quote_name(self.column)} AT TIME ZONE %s)::date
+                FROM {quote_name(self.default_partition)}
+                """,  # noqa: S608
+                [timezone.get_current_timezone_name()],
+            )
+            months = sorted(month for (month,) in cursor.fetchall())
+
+        return [
+            self.get_partition_name(month) for month in months if self.create(month)
+        ]
+
+    def detach(self: Self, name: str) -> None:
+        """
+        p.s. the detached table is kept with its rows, it is no longer read by the queries
+        """
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE {quote_name(self.table)} DETACH PARTITION {quote_name(name)}',
+            )
+
+    def archive(self: Self, name: str, directory: Path) -> Path:
+        """
+        dump a detached partition into `<directory>/<name>.csv.gz` and drop it
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{name}.csv.gz'
+        table = connection.ops.quote_name(name)
+
+        with (
+            transaction.atomic(),
+            connection.cursor() as cursor,
+            gzip.open(path, 'wb') as file,
+        ):
+            with cursor.copy(
+                f'COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)',
+            ) as copy:
+                for chunk in copy:
+                    file.write(chunk)
+            cursor.execute(f'DROP TABLE {table}')
+        return path
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Self
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.http import HttpRequest, HttpResponse
+    from django.template.response import SimpleTemplateResponse
+
+logger = logging.getLogger(__name__)
+
+# the profile of the request being handled by the current thread / task
+current_profile: ContextVar[QueryProfile | None] = ContextVar(
+    'current_profile',
+    default=None,
+)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# IN (%s, %s, ...) and VALUES (...), (...) differ only by the size of the batch
+PLACEHOLDER_LIST_PATTERN = re.compile(r'%s(?:, %s)+')
+VALUES_LIST_PATTERN = re.compile(r'VALUES (\([^()]*\))(?:, \1)*')
+# the number of duplicated fingerprints written to the log line
+LOGGED_DUPLICATES = 3
+
+
+class QueryBudgetExceededError(AssertionError):
+    pass
+
+
+def get_fingerprint(sql: str) -> str:
+    """
+    the sql without the parameters, queries differing only by the parameter values share it
+    """
+    sql = WHITESPACE_PATTERN.sub(' ', sql).strip()
+    sql = PLACEHOLDER_LIST_PATTERN.sub('%s, ...', sql)
+    return VALUES_LIST_PATTERN.sub(r'VALUES \1, ...', sql)
+
+
+class QueryProfile:
+    def __init__(self: Self) -> None:
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.fingerprints = Counter()
+        self.view_name = None
+        self.query_budget = None
+
+    def record_query(
+        self: Self,
+        execute: Callable,
+        sql: str,
+        params: Any,  # noqa: ANN401
+        many: bool,  # noqa: FBT001
+        context: dict,
+    ) -> Any:  # noqa: ANN401
+        """
+        execute wrapper of the database connections
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.fingerprints[get_fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self: Self) -> list[tuple[str, int]]:
+        """
+        fingerprints executed more than once, usually an N+1
+        """
+        return [
+            (fingerprint, count)
+            for fingerprint, count in self.fingerprints.most_common()
+            if count > 1
+        ]
+
+    @property
+    def duplicate_count(self: Self) -> int:
+        return sum(count - 1 for _, count in self.duplicates)
+
+    def get_server_timing(self: Self) -> str:
+        # p.s. the durations are in milliseconds
+        return ', '.join(
+            (
+                f'total;dur={self.duration * 1000:.2f}',
+                f'db;dur={self.db_time * 1000:.2f};desc="queries={self.query_count} duplicated={self.duplicate_count}"',
+                f'render;dur={self.render_time * 1000:.2f}',
+            ),
+        )
+
+    def as_dict(self: Self) -> dict:
+        return {
+            'view': self.view_name,
+            'duration_ms': round(self.duration * 1000, 2),
+            'query_count': self.query_count,
+            'query_budget': self.query_budget,
+            'db_ms': round(self.db_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'duplicate_count': self.duplicate_count,
+            'duplicates': self.duplicates[:LOGGED_DUPLICATES],
+        }
+
+
+class QueryProfilerMiddleware:
+    """
+    record the query count, the db time, the duplicated queries and the render time of each request,
+    sent back in the Server-Timing header and written to the `core.profiling` log.
+    a view can set `query_budget`, going over it logs a warning, or raises when QUERY_BUDGET_RAISE is set (tests).
+    the budget counts the user lookup of the JWT authentication, the tests authenticate without it.
+    p.s. the rows of a streaming response are fetched after the middleware returns and are not counted
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self: Self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def install_wrappers(self: Self, profile: QueryProfile) -> ExitStack:
+        """
+        p.s. the connections are per thread, async requests install them in the thread running
+        their queries (one per request under the ASGI handler)
+        """
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(profile.record_query),
+            )
+        return stack
+
+    def __call__(self: Self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        try:
+            with self.install_wrappers(profile):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self: Self, request: HttpRequest) -> HttpResponse:
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        try:
+            stack = await sync_to_async(self.install_wrappers)(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(
+        self: Self,
+        request: HttpRequest,
+        response: HttpResponse,
+        profile: QueryProfile,
+    ) -> HttpResponse:
+        profile.duration = time.perf_counter() - profile.start
+
+        response['Server-Timing'] = profile.get_server_timing()
+        logger.info(
+            '%s %s %s queries=%d db_ms=%.2f render_ms=%.2f duplicates=%d',
+            request.method,
+            request.path,
+            response.status_code,
+            profile.query_count,
+            profile.db_time * 1000,
+            profile.render_time * 1000,
+            profile.duplicate_count,
+            extra={'profile': profile.as_dict()},
+        )
+        self.check_budget(request, profile)
+        return response
+
+    def process_view(
+        self: Self,
+        request: HttpRequest,
+        view_func: Callable,
+        view_args: tuple,
+        view_kwargs: dict,
+    ) -> None:
+        # p.s. as_view() keeps the class of a class based view on the function
+        view_class = getattr(view_func, 'view_class', None)
+        profile = current_profile.get()
+        if profile is None or view_class is None:
+            return
+        profile.view_name = view_class.__name__
+        profile.query_budget = getattr(view_class, 'query_budget', None)
+
+    def process_template_response(
+        self: Self,
+        request: HttpRequest,
+        response: SimpleTemplateResponse,
+    ) -> SimpleTemplateResponse:
+        """
+        time the rendering of the response (e.g. the JSON renderer of a DRF response),
+        the handler renders it right after the template response middlewares
+        """
+        profile = current_profile.get()
+        if profile is None:
+            return response
+
+        start = time.perf_counter()
+
+        def record_render(_: SimpleTemplateResponse) -> None:
+            profile.render_time += time.perf_counter() - start
+
+        response.add_post_render_callback(record_render)
+        return response
+
+    def check_budget(self: Self, request: HttpRequest, profile: QueryProfile) -> None:
+        if profile.query_budget is None or profile.query_count <= profile.query_budget:
+            return
+
+        msg = (
+            f'{profile.view_name} ran {profile.query_count} queries for {request.method} {request.path}, '
+            f'the budget is {profile.query_budget}, duplicated: {profile.duplicates[:LOGGED_DUPLICATES]}'
+        )
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceededError(msg)
+        logger.warning(msg)
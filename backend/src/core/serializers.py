@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Self
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.db.models.query import QuerySet
+
+# the fields whose to_representation is a plain conversion, the others keep their own
+# p.s. exact classes, a subclass may format the value differently
+FIELD_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+}
+
+
+def get_converter(field: serializers.Field) -> Callable[[Any], Any]:
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+    return FIELD_CONVERTERS.get(type(field), field.to_representation)
+
+
+class CompiledListSerializer(serializers.ListSerializer):
+    """
+    map the rows of a `.values()` queryset to the output of the child serializer,
+    the fields are compiled once into (name, values path, converter) instead of being walked per row.
+    model instances still go through the child serializer.
+    p.s. only for fields reading a column (or a column through foreign keys), e.g. no SerializerMethodField
+    """
+
+    @property
+    def compiled_fields(self: Self) -> list[tuple[str, str, Callable]]:
+        if not hasattr(self, '_compiled_fields'):
+            compiled_fields = []
+            for field in self.child._readable_fields:  # noqa: SLF001
+                if field.source == '*' or isinstance(
+                    field,
+                    serializers.SerializerMethodField | serializers.BaseSerializer,
+                ):
+                    msg = f'{type(self.child).__name__}.{field.field_name} can not be read from .values()'
+                    raise ImproperlyConfigured(msg)
+                compiled_fields.append(
+                    (
+                        field.field_name,
+                        '__'.join(field.source_attrs),
+                        get_converter(field),
+                    ),
+                )
+            self._compiled_fields = compiled_fields
+        return self._compiled_fields
+
+    @property
+    def values_paths(self: Self) -> list[str]:
+        return [path for _, path, _ in self.compiled_fields]
+
+    def to_representation(self: Self, data: Any) -> list:  # noqa: ANN401
+        rows = data if isinstance(data, list) else list(data)
+        if not rows or not isinstance(rows[0], dict):
+            return super().to_representation(rows)
+
+        # p.s. a null value is not converted, the same as Serializer.to_representation
+        compiled_fields = self.compiled_fields
+        return [
+            {
+                name: None if row[path] is None else convert(row[path])
+                for name, path, convert in compiled_fields
+            }
+            for row in rows
+        ]
+
+
+class ValuesListMixin:
+    """
+    read the list with `.values()` of the columns the serializer outputs (and the ordering ones
+    the keyset cursor needs), no model instance is built and the rows are mapped by the
+    serializer's CompiledListSerializer. the response is identical to the regular one.
+    p.s. turned off by FAST_SERIALIZERS, the serializer falls back to the instances then
+    """
+
+    def filter_queryset(self: Self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        if not settings.FAST_SERIALIZERS:
+            return queryset
+
+        serializer = self.get_serializer(many=True)
+        if not isinstance(serializer, CompiledListSerializer):
+            msg = f'{type(serializer.child).__name__} needs Meta.list_serializer_class = CompiledListSerializer'
+            raise ImproperlyConfigured(msg)
+
+        ordering_paths = [
+            field.lstrip('-')
+            for field in queryset.query.order_by
+            if isinstance(field, str) and field != '?'
+        ]
+        unique_field = getattr(self, 'cursor_unique_field', 'uuid')
+        paths = dict.fromkeys((*serializer.values_paths, *ordering_paths, unique_field))
+        return queryset.values(*paths)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, Self
+
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+from core.config.env_config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+
+    from django.db.models.query import QuerySet
+    from django.http import HttpResponse
+    from rest_framework.renderers import BaseRenderer
+    from rest_framework.request import Request
+
+STREAM_FORMATS = {
+    '1': 'json',
+    'true': 'json',
+    'json': 'json',
+    'ndjson': 'ndjson',
+}
+STREAM_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+STREAM_PARAMETER = OpenApiParameter(
+    name='stream',
+    type=str,
+    location=OpenApiParameter.QUERY,
+    enum=tuple(STREAM_FORMATS),
+    description='Stream the whole list as a JSON array (`1`) or as newline delimited JSON (`ndjson`), pagination is ignored',
+    required=False,
+)
+
+
+class StreamingListMixin:
+    """
+    stream the list with a server-side cursor when `?stream=` is requested,
+    so the first byte is written before the whole queryset is fetched and serialized.
+    rows are rendered with the view's renderer, so the key style matches the regular response.
+    """
+
+    stream_query_param = 'stream'
+    stream_chunk_size = settings.STREAM_CHUNK_SIZE
+
+    def get_stream_format(self: Self, request: Request) -> str | None:
+        value = request.query_params.get(self.stream_query_param)
+        if value is None or value.lower() in ('', '0', 'false'):
+            return None
+
+        stream_format = STREAM_FORMATS.get(value.lower())
+        if stream_format is None:
+            msg = {
+                self.stream_query_param: f'Invalid stream format: {value}, expected one of {", ".join(STREAM_FORMATS)}.',
+            }
+            raise ValidationError(msg)
+        return stream_format
+
+    def list(
+        self: Self,
+        request: Request,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        stream_format = self.get_stream_format(request)
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            self.stream_rows(queryset, stream_format),
+            content_type=STREAM_CONTENT_TYPES[stream_format],
+        )
+
+    async def alist(
+        self: Self,
+        request: Request,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        stream_format = self.get_stream_format(request)
+        if stream_format is None:
+            return await super().alist(request, *args, **kwargs)
+
+        # p.s. served by the ASGI handler, the rows are fetched with aiterator while the response is sent
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            self.astream_rows(queryset, stream_format),
+            content_type=STREAM_CONTENT_TYPES[stream_format],
+        )
+
+    def stream_chunks(self: Self, queryset: QuerySet) -> Iterator[list]:
+        """
+        serialize the rows chunk by chunk while they are fetched from the server-side cursor
+        """
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while chunk := list(islice(rows, self.stream_chunk_size)):
+            yield self.get_serializer(chunk, many=True).data
+
+    async def astream_chunks(self: Self, queryset: QuerySet) -> AsyncIterator[list]:
+        chunk = []
+        async for row in queryset.aiterator(chunk_size=self.stream_chunk_size):
+            chunk.append(row)
+            if len(chunk) == self.stream_chunk_size:
+                yield self.get_serializer(chunk, many=True).data
+                chunk = []
+        if chunk:
+            yield self.get_serializer(chunk, many=True).data
+
+    def render_chunk(
+        self: Self,
+        renderer: BaseRenderer,
+        data: list,
+        stream_format: str,
+        *,
+        first: bool,
+    ) -> bytes:
+        if stream_format == 'ndjson':
+            return b''.join(renderer.render(row) + b'\n' for row in data)
+
+        # render each chunk as an array and strip its brackets to join them into one array
+        return (b'' if first else b',') + renderer.render(data)[1:-1]
+
+    def stream_rows(
+        self: Self,
+        queryset: QuerySet,
+        stream_format: str,
+    ) -> Iterator[bytes]:
+        renderer = self.renderer_classes[0]()
+
+        if stream_format == 'json':
+            yield b'['
+        for index, data in enumerate(self.stream_chunks(queryset)):
+            yield self.render_chunk(renderer, data, stream_format, first=index == 0)
+        if stream_format == 'json':
+            yield b']'
+
+    async def astream_rows(
+        self: Self,
+        queryset: QuerySet,
+        stream_format: str,
+    ) -> AsyncIterator[bytes]:
+        renderer = self.renderer_classes[0]()
+
+        if stream_format == 'json':
+            yield b'['
+        first = True
+        async for data in self.astream_chunks(queryset):
+            yield self.render_chunk(renderer, data, stream_format, first=first)
+            first = False
+        if stream_format == 'json':
+            yield b']'
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from core.cache import get_or_compute
+from core.config.env_config import settings
+
+
+def test_get_or_compute_stampede_guard() -> None:
+    callers = 16
+    barrier = Barrier(callers)
+    computed = []
+
+    def compute() -> list:
+        computed.append(1)
+        return ['result']
+
+    def read(_: int) -> list:
+        barrier.wait()
+        return get_or_compute('test-stampede', compute)
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        results = list(executor.map(read, range(callers)))
+
+    # the cold key is computed once, the other callers wait for the cached value
+    assert results == [['result']] * callers
+    assert len(computed) == 1
+
+
+def test_get_or_compute_uncacheable() -> None:
+    callers = 2
+    barrier = Barrier(callers)
+    computed = []
+
+    def compute() -> None:
+        computed.append(1)
+        time.sleep(0.2)
+
+    def read(_: int) -> None:
+        barrier.wait()
+        return get_or_compute('test-uncacheable', compute)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        results = list(executor.map(read, range(callers)))
+
+    # nothing is cached, the waiter computes once the lock is released instead of until its timeout
+    assert results == [None] * callers
+    assert len(computed) == callers
+    assert time.monotonic() - start < settings.CACHE_LOCK_TIMEOUT / 2
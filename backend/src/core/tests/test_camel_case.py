@@ -0,0 +1,100 @@
+import io
+import json
+from datetime import UTC, datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory
+from django.utils.translation import gettext_lazy
+from djangorestframework_camel_case.parser import (
+    CamelCaseJSONParser as LibraryCamelCaseJSONParser,
+)
+from djangorestframework_camel_case.render import (
+    CamelCaseJSONRenderer as LibraryCamelCaseJSONRenderer,
+)
+from rest_framework.exceptions import ErrorDetail, ParseError
+
+from core.camel_case import (
+    CamelCaseJSONParser,
+    CamelCaseJSONRenderer,
+    CamelCaseQueryMiddleware,
+)
+from core.config.env_config import settings
+
+DATA = {
+    'next': None,
+    'results': [
+        {
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'pharmacy_name': 'Pharmacy\u2028Mask',
+            'count_per_pack': 10,
+            'price': Decimal('12.35'),
+            'created_at': datetime(2025, 1, 1, 8, 30, 0, 123456, tzinfo=UTC),
+            'opening_hours': (
+                {'weekday': 'Mon', 'start_time': '08:00', 'is_open': True},
+            ),
+        },
+        {'stock_quantity': 1.5, 7: 'seven'},
+    ],
+    'errors': {'non_field_errors': [ErrorDetail('Invalid.', code='invalid')]},
+    gettext_lazy('lazy_key'): gettext_lazy('lazy value'),
+}
+
+
+@pytest.mark.parametrize('orjson', [False, True])
+def test_render_same_as_library(
+    monkeypatch: pytest.MonkeyPatch,
+    orjson: bool,  # noqa: FBT001
+) -> None:
+    monkeypatch.setattr(settings, 'ORJSON', orjson)
+    content = CamelCaseJSONRenderer().render(DATA)
+    expected = LibraryCamelCaseJSONRenderer().render(DATA)
+
+    # p.s. orjson and the stdlib encoder write the same JSON, the bytes of the floats may differ
+    assert json.loads(content) == json.loads(expected)
+    if not orjson:
+        assert content == expected
+
+    # orjson only encodes 64 bits integers, the stdlib encoder takes over
+    assert CamelCaseJSONRenderer().render({'big_number': 2**70}) == (
+        LibraryCamelCaseJSONRenderer().render({'big_number': 2**70})
+    )
+
+    indented = CamelCaseJSONRenderer().render(DATA, 'application/json; indent=4')
+    assert indented == LibraryCamelCaseJSONRenderer().render(
+        DATA,
+        'application/json; indent=4',
+    )
+
+
+@pytest.mark.parametrize('orjson', [False, True])
+def test_parse_same_as_library(
+    monkeypatch: pytest.MonkeyPatch,
+    orjson: bool,  # noqa: FBT001
+) -> None:
+    monkeypatch.setattr(settings, 'ORJSON', orjson)
+    content = json.dumps(
+        [{'inventoryUuid': 'a', 'quantity': 2, 'items': [{'countPerPack': 10}]}],
+    ).encode()
+
+    assert CamelCaseJSONParser().parse(io.BytesIO(content)) == (
+        LibraryCamelCaseJSONParser().parse(io.BytesIO(content))
+    )
+    with pytest.raises(ParseError):
+        CamelCaseJSONParser().parse(io.BytesIO(b'{"quantity": '))
+
+
+def test_query_middleware_async() -> None:
+    async def get_response(request: HttpRequest) -> HttpResponse:
+        return HttpResponse(request.GET.urlencode())
+
+    # the async views behind it are not put back on a thread
+    middleware = CamelCaseQueryMiddleware(get_response)
+    assert iscoroutinefunction(middleware)
+
+    request = RequestFactory().get('/', {'pageSize': 1, 'purchaseDate__gte': 'x'})
+    response = async_to_sync(middleware)(request)
+    assert response.content == b'page_size=1&purchase_date__gte=x'
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.pagination import KeysetCursorPagination
+from pharmacy.models import Inventory, InventorySnapshot, Pharmacy
+
+
+def walk_pages(queryset: QuerySet, page_size: int) -> list:
+    """
+    the uuids of the rows of every page, following the next cursor
+    p.s. bounded, a cursor repeating rows would walk forever
+    """
+    uuids = []
+    params = {'page_size': page_size}
+    while len(uuids) <= queryset.count():
+        paginator = KeysetCursorPagination()
+        request = Request(APIRequestFactory().get('/', params))
+        uuids += [row.uuid for row in paginator.paginate_queryset(queryset, request)]
+        next_link = paginator.get_next_link()
+        if next_link is None:
+            return uuids
+        params['cursor'] = parse_qs(urlparse(next_link).query)['cursor'][0]
+    return uuids
+
+
+@pytest.fixture
+def pharmacy() -> Pharmacy:
+    return Pharmacy.objects.create(name='Test Pharmacy', cash_balance=0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering', ['created_at', '-created_at'])
+def test_keyset_pagination_datetime_microseconds(
+    pharmacy: Pharmacy,
+    ordering: str,
+) -> None:
+    # created within the same millisecond, a position rounded to it skips or repeats rows
+    now = timezone.now().replace(microsecond=0)
+    for index in range(6):
+        inventory = Inventory.objects.create(
+            pharmacy=pharmacy,
+            name=f'Mask {index}',
+            color='red',
+            count_per_pack=1,
+            price=1,
+            stock_quantity=1,
+        )
+        Inventory.objects.filter(uuid=inventory.uuid).update(
+            created_at=now + timedelta(microseconds=100 * (index // 2)),
+        )
+
+    queryset = Inventory.objects.order_by(ordering)
+    expected = list(queryset.order_by(ordering, 'uuid').values_list('uuid', flat=True))
+    assert walk_pages(queryset, page_size=2) == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering', ['inventory', '-inventory'])
+def test_keyset_pagination_nullable_field(pharmacy: Pharmacy, ordering: str) -> None:
+    inventory = Inventory.objects.create(
+        pharmacy=pharmacy,
+        name='Mask',
+        color='red',
+        count_per_pack=1,
+        price=1,
+        stock_quantity=1,
+    )
+    # the snapshots of a deleted inventory have no inventory
+    for index in range(5):
+        InventorySnapshot.objects.create(
+            pharmacy=pharmacy,
+            inventory=inventory if index % 2 else None,
+            pharmacy_name=pharmacy.name,
+            inventory_name=inventory.name,
+            color=inventory.color,
+            count_per_pack=inventory.count_per_pack,
+            price=index,
+        )
+
+    queryset = InventorySnapshot.objects.order_by(ordering)
+    expected = list(queryset.order_by(ordering, 'uuid').values_list('uuid', flat=True))
+    assert walk_pages(queryset, page_size=2) == expected
@@ -0,0 +1,96 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from account.models import User
+from core.config.env_config import settings
+from core.profiling import (
+    QueryBudgetExceededError,
+    QueryProfile,
+    QueryProfilerMiddleware,
+    get_fingerprint,
+)
+from pharmacy.models import Pharmacy
+from pharmacy.views import PharmacyListView
+
+
+def test_get_fingerprint() -> None:
+    # the size of an IN list or of a VALUES batch does not change the fingerprint
+    assert get_fingerprint('SELECT * FROM t WHERE id IN (%s, %s)') == get_fingerprint(
+        'SELECT *\n  FROM t WHERE id IN (%s, %s, %s)',
+    )
+    assert get_fingerprint(
+        'INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)',
+    ) == get_fingerprint('INSERT INTO t (a, b) VALUES (%s, %s)')
+
+
+@pytest.mark.django_db
+def test_query_profile_duplicates() -> None:
+    profile = QueryProfile()
+    with connection.execute_wrapper(profile.record_query):
+        Pharmacy.objects.filter(name='A').first()
+        Pharmacy.objects.filter(name='B').first()
+        Pharmacy.objects.count()
+
+    assert profile.query_count == 3
+    assert profile.duplicate_count == 1
+    assert len(profile.duplicates) == 1
+
+
+@pytest.mark.django_db
+def test_query_profiler_server_timing(
+    authenticated_client: APIClient,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with caplog.at_level(logging.INFO, logger='core.profiling'):
+        response = authenticated_client.get('/pharmacy/')
+
+    assert response.status_code == status.HTTP_200_OK
+    metrics = [item.split(';')[0] for item in response['Server-Timing'].split(', ')]
+    assert metrics == ['total', 'db', 'render']
+
+    profile = caplog.records[-1].profile
+    assert profile['view'] == 'PharmacyListView'
+    assert profile['query_count'] == 1
+    assert profile['duplicate_count'] == 0
+    # the JSON rendering of the response is timed
+    assert profile['render_ms'] > 0
+
+
+@pytest.mark.django_db
+def test_query_profiler_budget_exceeded(
+    authenticated_client: APIClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(PharmacyListView, 'query_budget', 0)
+
+    with pytest.raises(
+        QueryBudgetExceededError,
+        match='PharmacyListView ran 1 queries',
+    ):
+        authenticated_client.get('/pharmacy/')
+
+
+@pytest.mark.django_db
+def test_query_profiler_async(
+    test_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr(settings, 'ASYNC_VIEWS', True)
+    middleware = QueryProfilerMiddleware(PharmacyListView.as_view())
+    request = APIRequestFactory().get('/pharmacy/')
+    force_authenticate(request, user=test_user)
+
+    # an async view stays async, the queries of the async ORM are counted
+    assert iscoroutinefunction(middleware)
+    with caplog.at_level(logging.INFO, logger='core.profiling'):
+        response = async_to_sync(middleware)(request)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert 'Server-Timing' in response
+    assert caplog.records[-1].profile['query_count'] == 1
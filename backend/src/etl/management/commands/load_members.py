@@ -1,69 +1,202 @@
-import json
-import re
 from datetime import datetime
+from pathlib import Path
 from typing import Self
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
 from django.utils import timezone
 
-from core.config.env_config import BASE_DIR
-from member.models import Member, PurchaseHistory
-from pharmacy.models import Inventory, Pharmacy
+from core.cache import INVENTORY_NAMESPACE, bump_namespace_version
+from core.config.env_config import BASE_DIR, settings
+from etl.utils import (
+    ThroughputReporter,
+    copy_objects,
+    deferred_indexes,
+    iter_json_array,
+    parse_mask_name,
+)
+from member.models import Member, MemberDailySpend, PurchaseHistory
+from pharmacy.models import (
+    SNAPSHOT_CONTENT_FIELDS,
+    Inventory,
+    InventorySnapshot,
+    Pharmacy,
+)
 
 
 class Command(BaseCommand):
+    help = 'Load members and purchase histories from a users.json file.'
 
-    def prefetch_pharmacies(self: Self) -> dict[str, Pharmacy]:
-        pharmacies = Pharmacy.objects.all()
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--file',
+            type=Path,
+            default=BASE_DIR / 'data' / 'users.json',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ETL_BATCH_SIZE,
+            help='number of pending rows written at once',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='write the rows with PostgreSQL COPY instead of bulk INSERT',
+        )
 
-        return {pharmacy.name: pharmacy for pharmacy in pharmacies}
+    def prefetch(self: Self) -> None:
+        """
+        resolve every pharmacy and inventory once, so a purchase is matched in memory
+        """
+        self.pharmacy_mapping = {
+            pharmacy.name: pharmacy
+            for pharmacy in Pharmacy.objects.only('uuid', 'name')
+        }
+        self.inventory_mapping = {
+            (
+                inventory.pharmacy_id,
+                inventory.name,
+                inventory.color,
+                inventory.count_per_pack,
+            ): inventory
+            for inventory in Inventory.objects.only(
+                'uuid',
+                'pharmacy_id',
+                'name',
+                'color',
+                'count_per_pack',
+                'price',
+            ).iterator(chunk_size=self.batch_size)
+        }
+        # p.s. purchases of the same inventory and content share one snapshot,
+        # stored ones included so a rerun reuses them
+        self.snapshot_mapping = {
+            snapshot.key: snapshot
+            for snapshot in InventorySnapshot.objects.only(
+                'uuid',
+                'inventory_id',
+                'pharmacy_id',
+                *SNAPSHOT_CONTENT_FIELDS,
+            ).iterator(chunk_size=self.batch_size)
+        }
 
-    def create_purchase_history(
+    def get_snapshot(self: Self, item: dict) -> InventorySnapshot:
+        pharmacy = self.pharmacy_mapping[item['pharmacyName']]
+        name, color, count_per_pack = parse_mask_name(item['maskName'])
+
+        key = (pharmacy.uuid, name, color, count_per_pack)
+        inventory = self.inventory_mapping.get(key)
+        if inventory is None:
+            # the mask is no longer sold by the pharmacy, keep it as an out of stock inventory
+            inventory = Inventory(
+                pharmacy=pharmacy,
+                name=name,
+                color=color,
+                count_per_pack=count_per_pack,
+                price=round(item['transactionAmount'] / item['transactionQuantity'], 2),
+                stock_quantity=0,
+            )
+            self.inventory_mapping[key] = inventory
+            self.to_create_inventory.append(inventory)
+
+        snapshot_key = (
+            inventory.uuid,
+            pharmacy.uuid,
+            pharmacy.name,
+            inventory.name,
+            inventory.color,
+            inventory.count_per_pack,
+            inventory.price,
+        )
+        snapshot = self.snapshot_mapping.get(snapshot_key)
+        if snapshot is None:
+            snapshot = inventory.build_snapshot(pharmacy)
+            self.snapshot_mapping[snapshot_key] = snapshot
+            self.to_create_snapshot.append(snapshot)
+
+        return snapshot
+
+    def build_purchase_history(
         self: Self,
         member: Member,
         raw_purchase_history: list,
-    ) -> None:
-        pharmacy_name_mapping = self.prefetch_pharmacies()
-
+    ) -> list[PurchaseHistory]:
         to_create_purchase_history = []
         for item in raw_purchase_history:
-            name, color, count_per_pack = re.findall(
-                r'^(.*?)\s+\((.*?)\)\s+\((\d+)\s+per\s+pack\)$',
-                item['maskName'],
-            )[0]
-
             # convert native datetime to time zone aware
             naive_datetime = datetime.fromisoformat(item['transactionDatetime'])
             aware_datetime = timezone.make_aware(naive_datetime)
 
-            inventory = Inventory.objects.get_or_create(
-                pharmacy=pharmacy_name_mapping[item['pharmacyName']],
-                name=name,
-                color=color,
-                count_per_pack=int(count_per_pack),
-            )[0].create_snapshot()
-
             purchase_history = PurchaseHistory(
                 member=member,
-                inventory=inventory,
+                inventory=self.get_snapshot(item),
                 amount=item['transactionAmount'],
                 quantity=item['transactionQuantity'],
                 purchase_date=aware_datetime,
             )
             to_create_purchase_history.append(purchase_history)
 
-        PurchaseHistory.objects.bulk_create(to_create_purchase_history)
+        return to_create_purchase_history
+
+    @property
+    def pending_rows(self: Self) -> int:
+        return (
+            len(self.to_create_member)
+            + len(self.to_create_inventory)
+            + len(self.to_create_snapshot)
+            + len(self.to_create_purchase_history)
+        )
+
+    def write(self: Self) -> None:
+        # parents first, the uuid is assigned on the client side so the children can refer to it
+        for model, objects in (
+            (Member, self.to_create_member),
+            (Inventory, self.to_create_inventory),
+            (InventorySnapshot, self.to_create_snapshot),
+            (PurchaseHistory, self.to_create_purchase_history),
+        ):
+            if self.use_copy:
+                copy_objects(model, objects)
+            else:
+                model.objects.bulk_create(objects, batch_size=self.batch_size)
+        # the ranking rollup is written in the same transaction as the purchases
+        MemberDailySpend.add_purchases(self.to_create_purchase_history)
+
+        self.reporter.add(self.pending_rows)
+        self.to_create_member = []
+        self.to_create_inventory = []
+        self.to_create_snapshot = []
+        self.to_create_purchase_history = []
 
     def handle(self: Self, *args: tuple, **options: dict) -> None:
-        # load the data from json file
-        members_file_path = BASE_DIR / 'data' / 'users.json'
-        with members_file_path.open('r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        for item in data:
-            # create member
-            member = Member(name=item['name'], cash_balance=item['cashBalance'])
-            member.save()
-
-            # create purchase history
-            self.create_purchase_history(member, item['purchaseHistories'])
+        self.batch_size = options['batch_size']
+        self.use_copy = options['copy']
+        self.reporter = ThroughputReporter(self.stdout)
+        self.to_create_member = []
+        self.to_create_inventory = []
+        self.to_create_snapshot = []
+        self.to_create_purchase_history = []
+
+        with transaction.atomic(), deferred_indexes(PurchaseHistory, MemberDailySpend):
+            self.prefetch()
+
+            for item in iter_json_array(options['file']):
+                member = Member(name=item['name'], cash_balance=item['cashBalance'])
+                self.to_create_member.append(member)
+                self.to_create_purchase_history += self.build_purchase_history(
+                    member,
+                    item['purchaseHistories'],
+                )
+
+                # flush across members once enough rows are pending
+                if self.pending_rows >= self.batch_size:
+                    self.write()
+
+            self.write()
+
+            # index the inventories created while loading purchase histories
+            Inventory.objects.filter(search_vector__isnull=True).update_search_vector()
+            bump_namespace_version(INVENTORY_NAMESPACE)
+
+        self.reporter.finish('members loaded')
@@ -1,51 +1,81 @@
-import json
-import re
+from pathlib import Path
 from typing import Self
 
-from django.core.management.base import BaseCommand
-
-from core.config.env_config import BASE_DIR
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from core.cache import (
+    INVENTORY_NAMESPACE,
+    OPENING_HOUR_NAMESPACE,
+    PHARMACY_NAMESPACE,
+    bump_namespace_version,
+)
+from core.config.env_config import BASE_DIR, settings
+from etl.utils import (
+    OPENING_HOUR_PATTERN,
+    ThroughputReporter,
+    copy_objects,
+    deferred_indexes,
+    iter_json_array,
+    parse_mask_name,
+)
 from pharmacy.models import Inventory, OpeningHour, Pharmacy
 
 
 class Command(BaseCommand):
+    help = 'Load pharmacies, opening hours and inventories from a pharmacies.json file.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--file',
+            type=Path,
+            default=BASE_DIR / 'data' / 'pharmacies.json',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ETL_BATCH_SIZE,
+            help='number of pending rows written at once',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='write the rows with PostgreSQL COPY instead of bulk INSERT',
+        )
 
-    def create_inventory(self: Self, pharmacy: Pharmacy, raw_inventory: list) -> None:
+    def build_inventory(
+        self: Self,
+        pharmacy: Pharmacy,
+        raw_inventory: list,
+    ) -> list[Inventory]:
         to_create_inventory = []
         for item in raw_inventory:
-            name, color, count_per_pack = re.findall(
-                r'^(.*?)\s+\((.*?)\)\s+\((\d+)\s+per\s+pack\)$',
-                item['name'],
-            )[0]
+            name, color, count_per_pack = parse_mask_name(item['name'])
 
             inventory = Inventory(
                 pharmacy=pharmacy,
                 name=name,
                 color=color,
-                count_per_pack=int(count_per_pack),
+                count_per_pack=count_per_pack,
                 price=item['price'],
                 stock_quantity=item['stockQuantity'],
             )
             to_create_inventory.append(inventory)
 
-        Inventory.objects.bulk_create(to_create_inventory)
+        return to_create_inventory
 
-    def create_opening_hours(
+    def build_opening_hours(
         self: Self,
         pharmacy: Pharmacy,
         raw_opening_hours: str,
-    ) -> None:
-        opening_hour_list = re.findall(
-            r'(\w+) (\d{2}:\d{2}) - (\d{2}:\d{2})',
-            raw_opening_hours,
-        )
-
+    ) -> list[OpeningHour]:
         to_create_opening_hours = []
-        for item in opening_hour_list:
+        for item in OPENING_HOUR_PATTERN.findall(raw_opening_hours):
             weekday, start_time, end_time = item
 
             # Convert "24:00" to "00:00" if present
             # p.s. Django DateTimeField 不支援 24:00
+            # an end_time of 00:00 is read as the next day's midnight by OpeningHour.minutes
             if start_time == '24:00':
                 start_time = '00:00'
             if end_time == '24:00':
@@ -59,21 +89,61 @@ class Command(BaseCommand):
             )
             to_create_opening_hours.append(opening_hour)
 
-        OpeningHour.objects.bulk_create(to_create_opening_hours)
-
-    def handle(self: Self, *args: tuple, **options: dict) -> None:
-        # load the data from json file
-        pharmacies_file_path = BASE_DIR / 'data' / 'pharmacies.json'
-        with pharmacies_file_path.open('r', encoding='utf-8') as file:
-            data = json.load(file)
+        return to_create_opening_hours
 
-        for item in data:
-            # create pharmacy
-            pharmacy = Pharmacy(name=item['name'], cash_balance=item['cashBalance'])
-            pharmacy.save()
+    def write(
+        self: Self,
+        pharmacies: list[Pharmacy],
+        opening_hours: list[OpeningHour],
+        inventories: list[Inventory],
+    ) -> None:
+        # pharmacies first, the uuid is assigned on the client side so the children can refer to it
+        if self.use_copy:
+            copy_objects(Pharmacy, pharmacies)
+            copy_objects(OpeningHour, opening_hours)
+            copy_objects(Inventory, inventories)
+        else:
+            Pharmacy.objects.bulk_create(pharmacies, batch_size=self.batch_size)
+            OpeningHour.objects.bulk_create(opening_hours, batch_size=self.batch_size)
+            Inventory.objects.bulk_create(inventories, batch_size=self.batch_size)
+
+        self.reporter.add(len(pharmacies) + len(opening_hours) + len(inventories))
 
-            # create opening hours
-            self.create_opening_hours(pharmacy, item['openingHours'])
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        self.batch_size = options['batch_size']
+        self.use_copy = options['copy']
+        self.reporter = ThroughputReporter(self.stdout)
+
+        with (
+            transaction.atomic(),
+            deferred_indexes(Pharmacy, OpeningHour, Inventory),
+        ):
+            pharmacies, opening_hours, inventories = [], [], []
+            for item in iter_json_array(options['file']):
+                pharmacy = Pharmacy(name=item['name'], cash_balance=item['cashBalance'])
+                pharmacies.append(pharmacy)
+                opening_hours += self.build_opening_hours(
+                    pharmacy,
+                    item['openingHours'],
+                )
+                inventories += self.build_inventory(pharmacy, item['masks'])
+
+                # flush across pharmacies once enough rows are pending
+                if (
+                    len(pharmacies) + len(opening_hours) + len(inventories)
+                    >= self.batch_size
+                ):
+                    self.write(pharmacies, opening_hours, inventories)
+                    pharmacies, opening_hours, inventories = [], [], []
+
+            self.write(pharmacies, opening_hours, inventories)
+
+            # build the search vectors in one statement instead of one expression per row
+            Inventory.objects.filter(search_vector__isnull=True).update_search_vector()
+            bump_namespace_version(
+                PHARMACY_NAMESPACE,
+                OPENING_HOUR_NAMESPACE,
+                INVENTORY_NAMESPACE,
+            )
 
-            # create inventory
-            self.create_inventory(pharmacy, item['masks'])
+        self.reporter.finish('pharmacies loaded')
@@ -0,0 +1,35 @@
+import pytest
+from django.db import connection, transaction
+
+from etl.utils import deferred_indexes
+from pharmacy.models import Inventory, Pharmacy
+
+
+def get_index_names() -> set[str]:
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor,
+            Inventory._meta.db_table,  # noqa: SLF001
+        )
+    return set(constraints)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('populated', [False, True])
+def test_deferred_indexes(*, populated: bool) -> None:
+    index_names = {index.name for index in Inventory._meta.indexes}  # noqa: SLF001
+    if populated:
+        Inventory.objects.create(
+            pharmacy=Pharmacy.objects.create(name='Test Pharmacy'),
+            name='Mask A',
+            color='red',
+            count_per_pack=4,
+            price=10,
+            stock_quantity=100,
+        )
+
+    with transaction.atomic(), deferred_indexes(Inventory):
+        # dropped on the first load only, the readers of a populated table are not locked out
+        assert (index_names <= get_index_names()) is populated
+
+    assert index_names <= get_index_names()
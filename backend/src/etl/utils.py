@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import re
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Self
+
+from django.db import connection
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Iterator
+    from pathlib import Path
+
+    from django.core.management.base import OutputWrapper
+    from django.db.models import Model
+
+# e.g. "True Barrier (green) (3 per pack)"
+MASK_NAME_PATTERN = re.compile(r'^(.*?)\s+\((.*?)\)\s+\((\d+)\s+per\s+pack\)$')
+# e.g. "Mon 08:00 - 18:00, Tue 13:00 - 18:00"
+OPENING_HOUR_PATTERN = re.compile(r'(\w+) (\d{2}:\d{2}) - (\d{2}:\d{2})')
+
+READ_SIZE = 64 * 1024
+
+
+def parse_mask_name(raw_name: str) -> tuple[str, str, int]:
+    name, color, count_per_pack = MASK_NAME_PATTERN.findall(raw_name)[0]
+    return name, color, int(count_per_pack)
+
+
+def iter_json_array(path: Path) -> Iterator[dict]:
+    """
+    yield the objects of a top level json array one by one,
+    so the file is parsed incrementally instead of loading the whole document with json.load
+    """
+    decoder = json.JSONDecoder()
+    with path.open('r', encoding='utf-8') as file:
+        buffer = file.read(READ_SIZE).lstrip()
+        if not buffer.startswith('['):
+            msg = f'{path} is not a json array.'
+            raise ValueError(msg)
+
+        position = 1
+        end_of_file = False
+        while True:
+            # skip the separators between the elements
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+
+                # the element is cut by the read size, read more and decode it again
+                chunk = file.read(READ_SIZE)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield item
+
+
+def copy_objects(
+    model: type[Model],
+    objects: Iterable[Model],
+    exclude: Iterable[str] = (),
+) -> None:
+    """
+    write unsaved model instances with PostgreSQL COPY, the fastest way to load rows in bulk
+    p.s. no signal, no returning, the primary key has to be assigned on the client side already
+    """
+    meta = model._meta  # noqa: SLF001
+    # p.s. generated columns are computed by the database
+    fields = [
+        field
+        for field in meta.concrete_fields
+        if field.name not in exclude and not field.generated
+    ]
+    table = connection.ops.quote_name(meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    with (
+        connection.cursor() as cursor,
+        cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy,
+    ):
+        # resolve the connection proxy once, it is looked up for every value otherwise
+        database = cursor.db
+        for instance in objects:
+            copy.write_row(
+                [
+                    field.get_db_prep_save(
+                        field.pre_save(instance, add=True),
+                        connection=database,
+                    )
+                    for field in fields
+                ],
+            )
+
+
+@contextmanager
+def deferred_indexes(*models: type[Model]) -> Generator[None, None, None]:
+    """
+    drop the Meta.indexes of the models while loading and build them once at the end,
+    which is far cheaper than maintaining them row by row (especially GIN)
+    p.s. use it inside a transaction, the tables are locked until it commits. only done when
+    every table is empty (the first load), the readers of a populated table would wait for the whole load
+    """
+    if any(model.objects.exists() for model in models):
+        yield
+        return
+
+    indexes = [
+        (model, index)
+        for model in models
+        for index in model._meta.indexes  # noqa: SLF001
+    ]
+
+    with connection.schema_editor() as schema_editor:
+        for model, index in indexes:
+            schema_editor.remove_index(model, index)
+
+    yield
+
+    with connection.schema_editor() as schema_editor:
+        # run the deferred foreign key checks now, an index can not be built with pending trigger events
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for model, index in indexes:
+            schema_editor.add_index(model, index)
+
+
+class ThroughputReporter:
+    """
+    report the loaded rows and rows/sec of a management command
+    """
+
+    def __init__(self: Self, stdout: OutputWrapper) -> None:
+        self.stdout = stdout
+        self.rows = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def rows_per_second(self: Self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.rows / elapsed if elapsed else 0.0
+
+    def add(self: Self, rows: int) -> None:
+        self.rows += rows
+        self.stdout.write(
+            f'{self.rows} rows loaded ({self.rows_per_second:.0f} rows/sec)',
+        )
+
+    def finish(self: Self, label: str) -> None:
+        elapsed = time.perf_counter() - self.started_at
+        self.stdout.write(
+            f'{label}: {self.rows} rows in {elapsed:.1f}s ({self.rows_per_second:.0f} rows/sec)',
+        )
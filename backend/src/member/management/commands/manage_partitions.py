@@ -0,0 +1,72 @@
+import time
+from pathlib import Path
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import timezone
+
+from core.config.env_config import settings
+from core.partitions import add_months
+from member.models import PURCHASE_HISTORY_PARTITIONS
+
+
+class Command(BaseCommand):
+    help = 'Create the upcoming monthly partitions of the purchase histories (and the months found in the default partition), detach or archive the old ones. Run it periodically (e.g. cron), or keep it running with --interval.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.PARTITION_MONTHS_AHEAD,
+            help='create the partitions up to this many months after the current one',
+        )
+        parser.add_argument(
+            '--retain-months',
+            type=int,
+            default=settings.PARTITION_RETAIN_MONTHS,
+            help='detach the partitions older than this many months, keep all when not set',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            type=Path,
+            help='dump the detached partitions into gzipped csv files here and drop them',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            help='keep managing the partitions every this many seconds instead of exiting',
+        )
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        while True:
+            self.manage(options)
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def manage(self: Self, options: dict) -> None:
+        current_month = timezone.localdate().replace(day=1)
+
+        created = PURCHASE_HISTORY_PARTITIONS.split_default()
+        created += PURCHASE_HISTORY_PARTITIONS.create_range(
+            current_month,
+            add_months(current_month, options['months_ahead']),
+        )
+        for name in created:
+            self.stdout.write(f'created {name}')
+
+        if options['retain_months'] is None:
+            return
+
+        # p.s. the daily spend rollup keeps the detached months
+        oldest_month = add_months(current_month, -options['retain_months'])
+        for month, name in sorted(PURCHASE_HISTORY_PARTITIONS.get_partitions().items()):
+            if month >= oldest_month:
+                break
+
+            PURCHASE_HISTORY_PARTITIONS.detach(name)
+            if options['archive_dir'] is None:
+                self.stdout.write(f'detached {name}')
+            else:
+                path = PURCHASE_HISTORY_PARTITIONS.archive(name, options['archive_dir'])
+                self.stdout.write(f'archived {name} to {path}')
@@ -0,0 +1,47 @@
+from datetime import date
+from typing import Self
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from member.models import MemberDailySpend
+
+# mismatched rows printed by --verify
+MISMATCH_PREVIEW = 20
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per member daily spend rollup from the purchase histories, or verify it.'
+
+    def add_arguments(self: Self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='only compare the rollup with the purchase histories, exit with an error on any mismatch',
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='only the days from this date (YYYY-MM-DD), e.g. the oldest month still attached',
+        )
+
+    def handle(self: Self, *args: tuple, **options: dict) -> None:
+        if not options['verify']:
+            rows = MemberDailySpend.rebuild(options['since'])
+            self.stdout.write(self.style.SUCCESS(f'{rows} daily spend rows rebuilt'))
+            return
+
+        mismatches = MemberDailySpend.verify(options['since'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('daily spend rollup is up to date'))
+            return
+
+        for member_uuid, purchase_day, expected, actual in mismatches[
+            :MISMATCH_PREVIEW
+        ]:
+            self.stdout.write(
+                f'{member_uuid} {purchase_day}: expected {expected:.2f}, rollup {actual:.2f}',
+            )
+        msg = (
+            f'{len(mismatches)} daily spend rows do not match, run rebuild_daily_spend'
+        )
+        raise CommandError(msg)
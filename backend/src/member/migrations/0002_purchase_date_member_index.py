@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the indexes without blocking writes to the tables
+    atomic = False
+
+    dependencies = [
+        ('member', '0001_initial'),
+        ('pharmacy', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='purchasehistory',
+            index=models.Index(
+                fields=['purchase_date', 'member'],
+                include=('amount',),
+                name='purchase_date_member_idx',
+            ),
+        ),
+    ]
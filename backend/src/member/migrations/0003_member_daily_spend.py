@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+from member.models import DAILY_SPEND_REBUILD_SQL
+
+
+def backfill_daily_spend(apps, schema_editor):
+    # roll up the purchase histories written before the table existed
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            DAILY_SPEND_REBUILD_SQL,
+            {
+                'now': timezone.now(),
+                'time_zone': settings.TIME_ZONE,
+                'since': '-infinity',
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0002_purchase_date_member_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberDailySpend',
+            fields=[
+                (
+                    'uuid',
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('purchase_day', models.DateField()),
+                ('amount', models.FloatField(default=0.0)),
+                (
+                    'member',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to='member.member'
+                    ),
+                ),
+            ],
+            options={
+                'indexes': [
+                    models.Index(
+                        fields=['purchase_day', 'member'],
+                        include=('amount',),
+                        name='daily_spend_day_member_idx',
+                    )
+                ],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('member', 'purchase_day'),
+                        name='member_daily_spend_unique',
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+from django.db import migrations
+from django.utils import timezone
+
+from core.config.env_config import settings
+from core.partitions import MonthlyPartitions, add_months
+
+COLUMNS = 'uuid, created_at, updated_at, amount, quantity, purchase_date, inventory_id, member_id'
+
+# p.s. the primary key of a partitioned table must contain the partition key,
+# the model keeps uuid as its primary key, uuid4 values do not collide across months
+CREATE_TABLE_SQL = """
+CREATE TABLE member_purchasehistory (
+    uuid uuid NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    amount double precision NOT NULL,
+    quantity integer NOT NULL CONSTRAINT member_purchasehistory_quantity_check CHECK (quantity >= 0),
+    purchase_date timestamp with time zone NOT NULL,
+    inventory_id uuid NOT NULL,
+    member_id uuid NOT NULL,
+    CONSTRAINT member_purchasehistory_pkey PRIMARY KEY {primary_key}
+){partition_by};
+ALTER TABLE member_purchasehistory
+    ADD CONSTRAINT member_purchasehisto_inventory_id_99737d0b_fk_pharmacy_
+    FOREIGN KEY (inventory_id) REFERENCES pharmacy_inventorysnapshot (uuid) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE member_purchasehistory
+    ADD CONSTRAINT member_purchasehistory_member_id_eef8f66f_fk_member_member_uuid
+    FOREIGN KEY (member_id) REFERENCES member_member (uuid) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX member_purchasehistory_inventory_id_99737d0b ON member_purchasehistory (inventory_id);
+CREATE INDEX member_purchasehistory_member_id_eef8f66f ON member_purchasehistory (member_id);
+CREATE INDEX purchase_date_member_idx ON member_purchasehistory (purchase_date, member_id) INCLUDE (amount);
+"""
+
+
+def rename_table_sql(suffix):
+    # free the table and index names for the new table
+    return f"""
+    ALTER TABLE member_purchasehistory RENAME TO member_purchasehistory_{suffix};
+    ALTER INDEX member_purchasehistory_pkey RENAME TO member_purchasehistory_{suffix}_pkey;
+    DROP INDEX member_purchasehistory_inventory_id_99737d0b;
+    DROP INDEX member_purchasehistory_member_id_eef8f66f;
+    DROP INDEX purchase_date_member_idx;
+    """
+
+
+def copy_rows_sql(suffix):
+    return f"""
+    SET CONSTRAINTS ALL IMMEDIATE;
+    INSERT INTO member_purchasehistory ({COLUMNS})
+    SELECT {COLUMNS} FROM member_purchasehistory_{suffix};
+    DROP TABLE member_purchasehistory_{suffix};
+    """
+
+
+def create_partitions(apps, schema_editor):
+    # one partition per month from the oldest purchase up to the months ahead
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT min(purchase_date) FROM member_purchasehistory_unpartitioned',
+        )
+        (oldest,) = cursor.fetchone()
+
+    current_month = timezone.localdate().replace(day=1)
+    first_month = timezone.localdate(oldest) if oldest else current_month
+    MonthlyPartitions('member_purchasehistory', 'purchase_date').create_range(
+        first_month,
+        add_months(current_month, settings.PARTITION_MONTHS_AHEAD),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0003_member_daily_spend'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=rename_table_sql('unpartitioned')
+            + CREATE_TABLE_SQL.format(
+                primary_key='(uuid, purchase_date)',
+                partition_by=' PARTITION BY RANGE (purchase_date)',
+            )
+            + """
+            CREATE TABLE member_purchasehistory_default
+            PARTITION OF member_purchasehistory DEFAULT;
+            """,
+            reverse_sql=rename_table_sql('partitioned')
+            + CREATE_TABLE_SQL.format(primary_key='(uuid)', partition_by='')
+            + copy_rows_sql('partitioned'),
+        ),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=copy_rows_sql('unpartitioned'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,18 +1,103 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from collections import defaultdict
+from typing import TYPE_CHECKING, NamedTuple, Self
 
-from django.db import models
+from django.db import connection, models, transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from core.cache import (
+    INVENTORY_NAMESPACE,
+    PHARMACY_NAMESPACE,
+    bump_namespace_version,
+)
 from core.config.env_config import settings
-from core.models import BaseModel
+from core.models import BaseModel, retry_on_conflict
+from core.partitions import MonthlyPartitions, local_midnight
 from pharmacy.models import Inventory, InventorySnapshot, Pharmacy
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import date
+    from uuid import UUID
 
-    from .serializers import PurchaseHistoryCreateSerializer
+    from .serializers import PurchaseCartSerializer, PurchaseHistoryCreateSerializer
+
+# add the amounts to the existing days, a purchase never rewrites the rollup of other days
+DAILY_SPEND_UPSERT_SQL = """
+    INSERT INTO member_memberdailyspend (uuid, created_at, updated_at, member_id, purchase_day, amount)
+    SELECT gen_random_uuid(), %(now)s, %(now)s, spend.member_id, spend.purchase_day, spend.amount
+    FROM unnest(%(members)s::uuid[], %(days)s::date[], %(amounts)s::double precision[])
+        AS spend (member_id, purchase_day, amount)
+    ON CONFLICT (member_id, purchase_day) DO UPDATE
+    SET amount = member_memberdailyspend.amount + excluded.amount, updated_at = excluded.updated_at
+"""
+DAILY_SPEND_REBUILD_SQL = """
+    INSERT INTO member_memberdailyspend (uuid, created_at, updated_at, member_id, purchase_day, amount)
+    SELECT gen_random_uuid(), %(now)s, %(now)s, member_id,
+        (purchase_date AT TIME ZONE %(time_zone)s)::date, sum(amount)
+    FROM member_purchasehistory
+    WHERE purchase_date >= %(since)s
+    GROUP BY 4, 5
+"""
+# the (member, day) rows whose rollup differs from the purchase histories
+DAILY_SPEND_VERIFY_SQL = """
+    SELECT
+        coalesce(expected.member_id, actual.member_id),
+        coalesce(expected.purchase_day, actual.purchase_day),
+        coalesce(expected.amount, 0),
+        coalesce(actual.amount, 0)
+    FROM (
+        SELECT member_id, (purchase_date AT TIME ZONE %(time_zone)s)::date AS purchase_day,
+            sum(amount) AS amount
+        FROM member_purchasehistory
+        WHERE purchase_date >= %(since)s
+        GROUP BY 1, 2
+    ) AS expected
+    FULL OUTER JOIN (
+        SELECT member_id, purchase_day, amount
+        FROM member_memberdailyspend
+        WHERE purchase_day >= %(since_day)s
+    ) AS actual
+        ON actual.member_id = expected.member_id AND actual.purchase_day = expected.purchase_day
+    WHERE abs(coalesce(expected.amount, 0) - coalesce(actual.amount, 0)) > %(tolerance)s
+    ORDER BY 1, 2
+"""
+# write the balances and stocks computed under the locks, one statement per table whatever the number of carts
+MEMBER_BALANCE_UPDATE_SQL = """
+    UPDATE member_member AS member
+    SET cash_balance = balance.cash_balance, updated_at = %(now)s
+    FROM unnest(%(uuids)s::uuid[], %(values)s::double precision[]) AS balance (uuid, cash_balance)
+    WHERE member.uuid = balance.uuid
+"""
+PHARMACY_BALANCE_UPDATE_SQL = """
+    UPDATE pharmacy_pharmacy AS pharmacy
+    SET cash_balance = balance.cash_balance, updated_at = %(now)s
+    FROM unnest(%(uuids)s::uuid[], %(values)s::double precision[]) AS balance (uuid, cash_balance)
+    WHERE pharmacy.uuid = balance.uuid
+"""
+INVENTORY_STOCK_UPDATE_SQL = """
+    UPDATE pharmacy_inventory AS inventory
+    SET stock_quantity = stock.stock_quantity, updated_at = %(now)s
+    FROM unnest(%(uuids)s::uuid[], %(values)s::integer[]) AS stock (uuid, stock_quantity)
+    WHERE inventory.uuid = stock.uuid
+"""
+PURCHASE_HISTORY_PARTITIONS = MonthlyPartitions(
+    'member_purchasehistory',
+    'purchase_date',
+)
+
+# amounts are summed as floats, in a different order by the rollup and the verification
+DAILY_SPEND_TOLERANCE = 0.005
+
+
+class PurchaseCartResult(NamedTuple):
+    member_uuid: UUID
+    success: bool
+    # why the cart was rejected, None when it succeeded
+    detail: str | None
+    purchase_histories: list[PurchaseHistory]
 
 
 class Member(BaseModel):
@@ -28,13 +113,43 @@ class PurchaseHistory(BaseModel):
     quantity = models.PositiveIntegerField()
     purchase_date = models.DateTimeField()
 
+    def save(self: Self, *args: tuple, **kwargs: dict) -> None:
+        """
+        p.s. purchase histories are append only, only the insert is added to the daily rollup
+        """
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                MemberDailySpend.add_purchases([self])
+
+    class Meta:
+        # p.s. the table is range partitioned by month on purchase_date (migration 0004),
+        # manage the partitions with `manage_partitions`. its primary key is (uuid, purchase_date)
+        # in the database, and an index on it can not be built concurrently
+        indexes = (
+            # purchase ranking, a purchase_date range summed per member with an index only scan
+            models.Index(
+                fields=('purchase_date', 'member'),
+                include=('amount',),
+                name='purchase_date_member_idx',
+            ),
+        )
+
     @classmethod
+    @retry_on_conflict
     def bulk_create_for_member(
         cls: PurchaseHistory,
         member: Member,
         serializer: PurchaseHistoryCreateSerializer,
     ) -> list[PurchaseHistory]:
-        created_inventory_list = []
+        """
+        run the whole purchase in a constant number of queries regardless of the cart size,
+        snapshots and histories are built in memory and bulk inserted while the locks are held
+
+        locks are always taken member -> pharmacies -> inventories, each sorted by uuid,
+        so concurrent carts touching the same rows wait for each other instead of deadlocking
+        """
         to_purchase_inventory_uuid_list = [
             str(data['inventory_uuid']) for data in serializer.validated_data
         ]
@@ -50,23 +165,36 @@ class PurchaseHistory(BaseModel):
         )
 
         with (
-            Inventory.lock_query(
-                uuid_list=to_purchase_inventory_uuid_list,
-            ) as locked_inventory_qs,
+            Member.lock_instance(uuid=member.uuid) as locked_member,
             Pharmacy.lock_query(
                 uuid_list=to_purchase_pharmacy_uuid,
             ) as locked_pharmacy_qs,
+            Inventory.lock_query(
+                uuid_list=to_purchase_inventory_uuid_list,
+            ) as locked_inventory_qs,
         ):
+            # p.s. evaluate the pharmacies before the inventories to keep the lock order
+            pharmacy_mapping = {
+                pharmacy.uuid: pharmacy for pharmacy in locked_pharmacy_qs
+            }
             inventory_mapping = {
                 str(inventory.uuid): inventory for inventory in locked_inventory_qs
             }
-            pharmacy_mapping = {
-                str(pharmacy.uuid): pharmacy for pharmacy in locked_pharmacy_qs
-            }
 
+            # p.s. one snapshot per inventory, items of the same inventory share it
+            snapshot_mapping = {}
+            purchase_items = []
+            purchase_date = timezone.now()
             for data in serializer.validated_data:
-                inventory = inventory_mapping[str(data['inventory_uuid'])]
-                pharmacy = pharmacy_mapping[str(inventory.pharmacy.uuid)]
+                inventory = inventory_mapping.get(str(data['inventory_uuid']))
+                if inventory is None:
+                    msg = {
+                        'detail': f'Inventory with uuid {data["inventory_uuid"]} does not exist.',
+                    }
+                    raise ValidationError(msg)
+
+                # take the pharmacy from the locked rows instead of the foreign key lookup
+                pharmacy = pharmacy_mapping[inventory.pharmacy_id]
                 if inventory.stock_quantity < data['quantity']:
                     msg = {
                         'detail': f'Inventory: {inventory.uuid}/{inventory.name} is out of stock.',
@@ -74,39 +202,340 @@ class PurchaseHistory(BaseModel):
                     raise ValidationError(msg)
 
                 # construct purchase history
-                inventory_snapshot = inventory.create_snapshot()
+                inventory_snapshot = snapshot_mapping.get(inventory.uuid)
+                if inventory_snapshot is None:
+                    inventory_snapshot = inventory.build_snapshot(pharmacy)
+                    snapshot_mapping[inventory.uuid] = inventory_snapshot
+
                 amount = data['quantity'] * inventory_snapshot.price
-                if amount > member.cash_balance:
+                if amount > locked_member.cash_balance:
                     msg = {
-                        'detail': f'Member cash balance:{member.cash_balance} is not enough.',
+                        'detail': f'Member cash balance:{locked_member.cash_balance} is not enough.',
                     }
                     raise ValidationError(msg)
 
-                purchase_history = cls.objects.create(
-                    member=member,
-                    inventory=inventory_snapshot,
-                    amount=amount,
-                    quantity=data['quantity'],
-                    purchase_date=timezone.now(),
+                purchase_items.append(
+                    (inventory_snapshot, amount, data['quantity']),
                 )
-                created_inventory_list.append(purchase_history)
 
                 # update stock quantity
                 inventory.stock_quantity -= data['quantity']
-                member.cash_balance -= amount
+                locked_member.cash_balance -= amount
                 pharmacy.cash_balance += amount
 
-            # bulk update for inventory, pharmacy, member
+            # bulk insert snapshot and purchase history, bulk update inventory, pharmacy, member
+            # p.s. no batch_size, a cart is written in a single statement per table
+            # p.s. the purchases are built afterwards, an unchanged inventory reuses the stored snapshot
+            InventorySnapshot.bulk_get_or_create(list(snapshot_mapping.values()))
+            created_purchase_history = cls.objects.bulk_create(
+                [
+                    cls(
+                        member=locked_member,
+                        inventory=inventory_snapshot,
+                        amount=amount,
+                        quantity=quantity,
+                        purchase_date=purchase_date,
+                    )
+                    for inventory_snapshot, amount, quantity in purchase_items
+                ],
+            )
             Inventory.objects.bulk_update(
                 list(inventory_mapping.values()),
                 fields=['stock_quantity'],
-                batch_size=settings.BATCH_SIZE,
             )
             Pharmacy.objects.bulk_update(
                 list(pharmacy_mapping.values()),
                 fields=['cash_balance'],
-                batch_size=settings.BATCH_SIZE,
             )
-            member.save()
+            locked_member.save(update_fields=['cash_balance', 'updated_at'])
+            MemberDailySpend.add_purchases(created_purchase_history)
+            bump_namespace_version(INVENTORY_NAMESPACE, PHARMACY_NAMESPACE)
+
+        return created_purchase_history
+
+    @staticmethod
+    def check_cart(
+        member: Member | None,
+        member_uuid: UUID,
+        items: list[dict],
+        inventory_mapping: dict[UUID, Inventory],
+    ) -> str | None:
+        """
+        the reason the cart can not be purchased with the current balance and stocks, None when it can
+        p.s. the same checks and messages as bulk_create_for_member, items of the same inventory add up
+        """
+        if member is None:
+            return f'Member with uuid {member_uuid} does not exist.'
+
+        cash_balance = member.cash_balance
+        stock_mapping = {}
+        for item in items:
+            inventory = inventory_mapping.get(item['inventory_uuid'])
+            if inventory is None:
+                return f'Inventory with uuid {item["inventory_uuid"]} does not exist.'
+
+            stock_quantity = stock_mapping.get(inventory.uuid, inventory.stock_quantity)
+            if stock_quantity < item['quantity']:
+                return f'Inventory: {inventory.uuid}/{inventory.name} is out of stock.'
+
+            amount = item['quantity'] * inventory.price
+            if amount > cash_balance:
+                return f'Member cash balance:{cash_balance} is not enough.'
+
+            stock_mapping[inventory.uuid] = stock_quantity - item['quantity']
+            cash_balance -= amount
+        return None
+
+    @classmethod
+    @retry_on_conflict
+    def bulk_create_for_carts(
+        cls: PurchaseHistory,
+        serializer: PurchaseCartSerializer,
+    ) -> list[PurchaseCartResult]:
+        """
+        purchase the carts of many members at once, in a constant number of queries whatever the
+        number of carts and items. the carts are checked in order against the balances and stocks
+        left by the previous ones, a rejected cart is reported and changes nothing, the others go on
+
+        locks are taken members -> pharmacies -> inventories, each sorted by uuid,
+        the same order as bulk_create_for_member, so the two never deadlock
+        """
+        carts = serializer.validated_data
+        member_uuid_list = sorted({cart['member_uuid'] for cart in carts})
+        inventory_uuid_list = sorted(
+            {item['inventory_uuid'] for cart in carts for item in cart['items']},
+        )
+        pharmacy_uuid_qs = (
+            Inventory.objects.filter(uuid__in=inventory_uuid_list)
+            .values_list('pharmacy', flat=True)
+            .distinct()
+        )
 
-        return created_inventory_list
+        with (
+            Member.lock_query(uuid_list=member_uuid_list) as locked_member_qs,
+            Pharmacy.lock_query(uuid_list=pharmacy_uuid_qs) as locked_pharmacy_qs,
+            Inventory.lock_query(uuid_list=inventory_uuid_list) as locked_inventory_qs,
+        ):
+            # p.s. evaluate each model before locking the next one to keep the lock order
+            member_mapping = {member.uuid: member for member in locked_member_qs}
+            pharmacy_mapping = {
+                pharmacy.uuid: pharmacy for pharmacy in locked_pharmacy_qs
+            }
+            inventory_mapping = {
+                inventory.uuid: inventory for inventory in locked_inventory_qs
+            }
+
+            # p.s. one snapshot per inventory, the purchases of every cart share it
+            snapshot_mapping = {}
+            cart_items = []
+            for cart in carts:
+                member = member_mapping.get(cart['member_uuid'])
+                detail = cls.check_cart(
+                    member,
+                    cart['member_uuid'],
+                    cart['items'],
+                    inventory_mapping,
+                )
+                if detail is not None:
+                    cart_items.append((cart['member_uuid'], detail, []))
+                    continue
+
+                purchase_items = []
+                for item in cart['items']:
+                    inventory = inventory_mapping[item['inventory_uuid']]
+                    pharmacy = pharmacy_mapping[inventory.pharmacy_id]
+                    inventory_snapshot = snapshot_mapping.get(inventory.uuid)
+                    if inventory_snapshot is None:
+                        inventory_snapshot = inventory.build_snapshot(pharmacy)
+                        snapshot_mapping[inventory.uuid] = inventory_snapshot
+
+                    amount = item['quantity'] * inventory_snapshot.price
+                    purchase_items.append(
+                        (member, inventory_snapshot, amount, item['quantity']),
+                    )
+                    inventory.stock_quantity -= item['quantity']
+                    member.cash_balance -= amount
+                    pharmacy.cash_balance += amount
+                cart_items.append((cart['member_uuid'], None, purchase_items))
+
+            # p.s. the purchases are built afterwards, an unchanged inventory reuses the stored snapshot
+            InventorySnapshot.bulk_get_or_create(list(snapshot_mapping.values()))
+            purchase_date = timezone.now()
+            results = [
+                PurchaseCartResult(
+                    member_uuid,
+                    detail is None,
+                    detail,
+                    [
+                        cls(
+                            member=member,
+                            inventory=inventory_snapshot,
+                            amount=amount,
+                            quantity=quantity,
+                            purchase_date=purchase_date,
+                        )
+                        for member, inventory_snapshot, amount, quantity in purchase_items
+                    ],
+                )
+                for member_uuid, detail, purchase_items in cart_items
+            ]
+            created_purchase_history = cls.objects.bulk_create(
+                [
+                    purchase_history
+                    for result in results
+                    for purchase_history in result.purchase_histories
+                ],
+            )
+            if not created_purchase_history:
+                return results
+
+            # only the rows of the purchased carts are written back, sorted by uuid
+            purchased_inventory_uuid = {
+                purchase_history.inventory.inventory_id
+                for purchase_history in created_purchase_history
+            }
+            purchased_members = [
+                member_mapping[uuid]
+                for uuid in sorted(
+                    {
+                        purchase_history.member_id
+                        for purchase_history in created_purchase_history
+                    },
+                )
+            ]
+            purchased_pharmacies = [
+                pharmacy_mapping[uuid]
+                for uuid in sorted(
+                    {
+                        inventory_mapping[uuid].pharmacy_id
+                        for uuid in purchased_inventory_uuid
+                    },
+                )
+            ]
+            purchased_inventories = [
+                inventory_mapping[uuid] for uuid in sorted(purchased_inventory_uuid)
+            ]
+            now = timezone.now()
+            with connection.cursor() as cursor:
+                for sql, rows, field in (
+                    (MEMBER_BALANCE_UPDATE_SQL, purchased_members, 'cash_balance'),
+                    (PHARMACY_BALANCE_UPDATE_SQL, purchased_pharmacies, 'cash_balance'),
+                    (
+                        INVENTORY_STOCK_UPDATE_SQL,
+                        purchased_inventories,
+                        'stock_quantity',
+                    ),
+                ):
+                    cursor.execute(
+                        sql,
+                        {
+                            'uuids': [row.uuid for row in rows],
+                            'values': [getattr(row, field) for row in rows],
+                            'now': now,
+                        },
+                    )
+            MemberDailySpend.add_purchases(created_purchase_history)
+            bump_namespace_version(INVENTORY_NAMESPACE, PHARMACY_NAMESPACE)
+
+        return results
+
+
+class MemberDailySpend(BaseModel):
+    """
+    the purchase amount of a member per day (in TIME_ZONE), kept up to date in the transaction
+    writing the purchase histories, so the ranking sums one row per member and day
+    """
+
+    member = models.ForeignKey(Member, on_delete=models.CASCADE)
+    purchase_day = models.DateField()
+    amount = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('member', 'purchase_day'),
+                name='member_daily_spend_unique',
+            ),
+        )
+        indexes = (
+            # purchase ranking, a day range summed per member with an index only scan
+            models.Index(
+                fields=('purchase_day', 'member'),
+                include=('amount',),
+                name='daily_spend_day_member_idx',
+            ),
+        )
+
+    @classmethod
+    def add_purchases(
+        cls: MemberDailySpend,
+        purchase_histories: Iterable[PurchaseHistory],
+    ) -> None:
+        """
+        add the purchase amounts to the rollup in one upsert, whatever the number of purchases
+        p.s. the rows are sorted, so overlapping upserts lock them in the same order
+        """
+        spend_mapping = defaultdict(float)
+        for purchase_history in purchase_histories:
+            purchase_day = timezone.localdate(purchase_history.purchase_date)
+            spend_mapping[
+                (purchase_history.member_id, purchase_day)
+            ] += purchase_history.amount
+        if not spend_mapping:
+            return
+
+        keys = sorted(spend_mapping)
+        params = {
+            'members': [member_id for member_id, _ in keys],
+            'days': [purchase_day for _, purchase_day in keys],
+            'amounts': [spend_mapping[key] for key in keys],
+            'now': timezone.now(),
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(DAILY_SPEND_UPSERT_SQL, params)
+
+    @staticmethod
+    def get_since_params(since: date | None) -> dict:
+        # p.s. -infinity keeps every day when no bound is given
+        if since is None:
+            return {'since': '-infinity', 'since_day': '-infinity'}
+        return {'since': local_midnight(since), 'since_day': since}
+
+    @classmethod
+    def rebuild(cls: MemberDailySpend, since: date | None = None) -> int:
+        """
+        recompute the rollup from the purchase histories, from the since day when given
+        p.s. pass the oldest attached month after detaching partitions, or their days are lost
+        """
+        queryset = cls.objects.all()
+        if since is not None:
+            queryset = queryset.filter(purchase_day__gte=since)
+
+        with transaction.atomic():
+            queryset.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    DAILY_SPEND_REBUILD_SQL,
+                    {
+                        'now': timezone.now(),
+                        'time_zone': settings.TIME_ZONE,
+                        **cls.get_since_params(since),
+                    },
+                )
+                return cursor.rowcount
+
+    @classmethod
+    def verify(cls: MemberDailySpend, since: date | None = None) -> list[tuple]:
+        """
+        return the (member uuid, day, expected amount, rollup amount) rows that do not match
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                DAILY_SPEND_VERIFY_SQL,
+                {
+                    'time_zone': settings.TIME_ZONE,
+                    'tolerance': DAILY_SPEND_TOLERANCE,
+                    **cls.get_since_params(since),
+                },
+            )
+            return cursor.fetchall()
@@ -1,5 +1,8 @@
+from typing import Self
+
 from rest_framework import serializers
 
+from core.config.env_config import settings
 from pharmacy.models import InventorySnapshot
 from pharmacy.serializers import PharmacySerializer
 
@@ -9,6 +12,25 @@ class PurchaseHistoryCreateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(help_text='購買數量')
 
 
+class PurchaseCartListSerializer(serializers.ListSerializer):
+    def validate(self: Self, attrs: list[dict]) -> list[dict]:
+        item_count = sum(len(cart['items']) for cart in attrs)
+        if item_count > settings.MAX_BULK_PURCHASE_ITEMS:
+            msg = {
+                'detail': f'{item_count} items exceed the limit of {settings.MAX_BULK_PURCHASE_ITEMS} per request.',
+            }
+            raise serializers.ValidationError(msg)
+        return attrs
+
+
+class PurchaseCartSerializer(serializers.Serializer):
+    member_uuid = serializers.UUIDField(help_text='會員 uuid')
+    items = PurchaseHistoryCreateSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        list_serializer_class = PurchaseCartListSerializer
+
+
 class InventorySnapshotSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventorySnapshot
@@ -23,12 +45,29 @@ class InventorySnapshotSerializer(serializers.ModelSerializer):
 
 class PurchaseHistoryListSerializer(serializers.Serializer):
     uuid = serializers.UUIDField(read_only=True)
-    pharmacy = PharmacySerializer(read_only=True)
+    # p.s. the snapshots hold the locked pharmacy, no lookup per purchase
+    pharmacy = PharmacySerializer(source='inventory.pharmacy', read_only=True)
     inventory = InventorySnapshotSerializer(read_only=True)
     quantity = serializers.IntegerField(help_text='購買數量')
     purchase_date = serializers.DateTimeField(read_only=True)
 
 
+class PurchaseCartResultSerializer(serializers.Serializer):
+    member_uuid = serializers.UUIDField(help_text='會員 uuid')
+    success = serializers.BooleanField(help_text='是否購買成功')
+    detail = serializers.CharField(allow_null=True, help_text='購買失敗原因')
+    purchase_histories = PurchaseHistoryListSerializer(many=True)
+
+
+class PurchaseRankingQuerySerializer(serializers.Serializer):
+    top = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.MAX_RANKING_TOP,
+        required=False,
+        help_text='Get the top N buyers',
+    )
+
+
 class PurchaseRankingSerializer(serializers.Serializer):
     member__uuid = serializers.UUIDField(help_text='會員 uuid')
     member__name = serializers.CharField(help_text='會員姓名')
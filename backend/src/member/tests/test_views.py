@@ -1,10 +1,32 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from random import Random
+from threading import Barrier
+from urllib.parse import parse_qs, urlparse
+
 import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from member.models import Member, PurchaseHistory
-from pharmacy.models import Inventory
+from account.models import User
+from core.config.env_config import settings
+from core.partitions import add_months, local_midnight
+from member.models import (
+    PURCHASE_HISTORY_PARTITIONS,
+    Member,
+    MemberDailySpend,
+    PurchaseHistory,
+)
+from member.views import PurchaseRankingListView
+from pharmacy.models import Inventory, InventorySnapshot, Pharmacy
 
 
 @pytest.mark.django_db
@@ -29,6 +51,13 @@ def test_create_purchase_history_success(
     assert response.status_code == status.HTTP_201_CREATED
     assert member.cash_balance == expected_cash_balance
 
+    # the pharmacy is the one the purchase was paid to
+    inventory.pharmacy.refresh_from_db()
+    assert response.data[0]['pharmacy'] == {
+        'name': inventory.pharmacy.name,
+        'cash_balance': inventory.pharmacy.cash_balance,
+    }
+
 
 @pytest.mark.django_db
 def test_create_purchase_history_insufficient_balance(
@@ -72,6 +101,318 @@ def test_create_purchase_history_out_of_stock(
     assert 'out of stock' in response.data['detail']
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize('cart_size', [1, 50])
+def test_create_purchase_history_constant_queries(
+    authenticated_client: APIClient,
+    django_assert_num_queries: Callable,
+    member: Member,
+    pharmacy: Pharmacy,
+    cart_size: int,
+) -> None:
+    other_pharmacy = Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0)
+    inventories = Inventory.objects.bulk_create(
+        Inventory(
+            pharmacy=pharmacy if index % 2 else other_pharmacy,
+            name=f'Mask {index}',
+            color='red',
+            count_per_pack=4,
+            price=1,
+            stock_quantity=10,
+        )
+        for index in range(cart_size)
+    )
+
+    url = f'/member/{member.uuid!s}/create-purchase-history/'
+    data = [
+        {
+            'inventory_uuid': str(inventory.uuid),
+            'quantity': 1,
+        }
+        for inventory in inventories
+    ]
+
+    # the number of queries must not grow with the cart size
+    with django_assert_num_queries(16):
+        response = authenticated_client.post(url, data, format='json')
+
+    member.refresh_from_db()
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.data) == cart_size
+    assert PurchaseHistory.objects.filter(member=member).count() == cart_size
+    assert member.cash_balance == 1000.0 - cart_size
+
+
+@pytest.mark.django_db
+def test_create_purchase_history_reuses_snapshot(
+    authenticated_client: APIClient,
+    member: Member,
+    inventory: Inventory,
+) -> None:
+    url = f'/member/{member.uuid!s}/create-purchase-history/'
+    data = [{'inventory_uuid': str(inventory.uuid), 'quantity': 1}]
+
+    # the same content shares one snapshot across purchases
+    first_response = authenticated_client.post(url, data, format='json')
+    second_response = authenticated_client.post(url, data, format='json')
+    assert first_response.status_code == status.HTTP_201_CREATED
+    assert second_response.status_code == status.HTTP_201_CREATED
+    assert InventorySnapshot.objects.count() == 1
+    assert inventory.create_snapshot().uuid == InventorySnapshot.objects.get().uuid
+
+    # a changed price is a new snapshot, the earlier purchases keep the old one
+    inventory.price = 12.5
+    inventory.save()
+    response = authenticated_client.post(url, data, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert InventorySnapshot.objects.count() == 2
+    assert list(
+        PurchaseHistory.objects.order_by('created_at').values_list(
+            'inventory__price',
+            flat=True,
+        ),
+    ) == [10, 10, 12.5]
+
+
+@pytest.mark.django_db
+def test_snapshot_not_shared_across_inventories(inventory: Inventory) -> None:
+    # a pharmacy with the same name selling the same mask at the same price
+    other_pharmacy = Pharmacy.objects.create(name=inventory.pharmacy.name)
+    other_inventory = Inventory.objects.create(
+        pharmacy=other_pharmacy,
+        name=inventory.name,
+        color=inventory.color,
+        count_per_pack=inventory.count_per_pack,
+        price=inventory.price,
+        stock_quantity=100,
+    )
+
+    snapshot = inventory.create_snapshot()
+    other_snapshot = other_inventory.create_snapshot()
+    assert snapshot.uuid != other_snapshot.uuid
+    assert InventorySnapshot.objects.get(uuid=other_snapshot.uuid).inventory_id == (
+        other_inventory.uuid
+    )
+    # each inventory still reuses its own
+    assert inventory.create_snapshot().uuid == snapshot.uuid
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_purchase_history_concurrent(
+    monkeypatch: pytest.MonkeyPatch,
+    test_user: User,
+    pharmacy: Pharmacy,
+) -> None:
+    purchasers, member_count, inventory_count = 64, 8, 8
+
+    # no retry, a deadlock would surface as a failed purchase
+    monkeypatch.setattr(settings, 'LOCK_RETRY_ATTEMPTS', 1)
+
+    members = [
+        Member.objects.create(name=f'User{index}', cash_balance=1000.0)
+        for index in range(member_count)
+    ]
+    pharmacies = [
+        pharmacy,
+        Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0),
+    ]
+    inventories = [
+        Inventory.objects.create(
+            pharmacy=pharmacies[index % 2],
+            name=f'Mask {index}',
+            color='red',
+            count_per_pack=4,
+            price=1,
+            stock_quantity=1000,
+        )
+        for index in range(inventory_count)
+    ]
+    barrier = Barrier(purchasers)
+
+    def purchase(index: int) -> int:
+        client = APIClient()
+        client.force_authenticate(user=test_user)
+
+        # every cart touches all the inventories, in a different order
+        cart = [
+            {'inventory_uuid': str(inventory.uuid), 'quantity': 1}
+            for inventory in inventories
+        ]
+        Random(index).shuffle(cart)  # noqa: S311
+
+        try:
+            barrier.wait()
+            response = client.post(
+                f'/member/{members[index % member_count].uuid!s}/create-purchase-history/',
+                cart,
+                format='json',
+            )
+            return response.status_code
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=purchasers) as executor:
+        status_codes = list(executor.map(purchase, range(purchasers)))
+
+    assert status_codes == [status.HTTP_201_CREATED] * purchasers
+
+    # every purchase is applied exactly once
+    purchases_per_member = purchasers // member_count
+    for member in members:
+        member.refresh_from_db()
+        assert member.cash_balance == 1000.0 - purchases_per_member * inventory_count
+    for inventory in inventories:
+        inventory.refresh_from_db()
+        assert inventory.stock_quantity == 1000 - purchasers
+    pharmacy.refresh_from_db()
+    assert pharmacy.cash_balance == 345.6 + purchasers * inventory_count / 2
+    assert PurchaseHistory.objects.count() == purchasers * inventory_count
+    # the concurrent upserts of the daily rollup lose no amount either
+    assert MemberDailySpend.verify() == []
+
+
+@pytest.mark.django_db
+def test_bulk_create_purchase_history(
+    authenticated_client: APIClient,
+    member: Member,
+    pharmacy: Pharmacy,
+    inventory: Inventory,
+) -> None:
+    other_member = Member.objects.create(name='Other User', cash_balance=15.0)
+    missing_uuid = '00000000-0000-0000-0000-000000000000'
+    data = [
+        {
+            'member_uuid': str(member.uuid),
+            'items': [{'inventory_uuid': str(inventory.uuid), 'quantity': 2}],
+        },
+        # rejected, the balance does not cover the second item
+        {
+            'member_uuid': str(other_member.uuid),
+            'items': [
+                {'inventory_uuid': str(inventory.uuid), 'quantity': 1},
+                {'inventory_uuid': str(inventory.uuid), 'quantity': 1},
+            ],
+        },
+        {
+            'member_uuid': missing_uuid,
+            'items': [{'inventory_uuid': str(inventory.uuid), 'quantity': 1}],
+        },
+        # rejected, the first cart left 98 in stock
+        {
+            'member_uuid': str(member.uuid),
+            'items': [{'inventory_uuid': str(inventory.uuid), 'quantity': 99}],
+        },
+        {
+            'member_uuid': str(other_member.uuid),
+            'items': [{'inventory_uuid': str(inventory.uuid), 'quantity': 1}],
+        },
+    ]
+
+    response = authenticated_client.post(
+        '/member/bulk-create-purchase-history/',
+        data,
+        format='json',
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result['success'] for result in response.data] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert 'not enough' in response.data[1]['detail']
+    assert 'does not exist' in response.data[2]['detail']
+    assert 'out of stock' in response.data[3]['detail']
+    assert response.data[1]['purchase_histories'] == []
+    assert response.data[4]['purchase_histories'][0]['quantity'] == 1
+
+    # only the purchased carts are applied
+    member.refresh_from_db()
+    other_member.refresh_from_db()
+    inventory.refresh_from_db()
+    pharmacy.refresh_from_db()
+    assert member.cash_balance == 1000.0 - 20
+    assert other_member.cash_balance == 15.0 - 10
+    assert inventory.stock_quantity == 100 - 3
+    assert pharmacy.cash_balance == pytest.approx(345.6 + 30)
+    assert PurchaseHistory.objects.count() == 2
+    assert InventorySnapshot.objects.count() == 1
+    assert MemberDailySpend.verify() == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cart_count', [1, 50])
+def test_bulk_create_purchase_history_constant_queries(
+    authenticated_client: APIClient,
+    django_assert_num_queries: Callable,
+    pharmacy: Pharmacy,
+    cart_count: int,
+) -> None:
+    other_pharmacy = Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0)
+    members = Member.objects.bulk_create(
+        Member(name=f'User{index}', cash_balance=100.0) for index in range(cart_count)
+    )
+    inventories = Inventory.objects.bulk_create(
+        Inventory(
+            pharmacy=pharmacy if index % 2 else other_pharmacy,
+            name=f'Mask {index}',
+            color='red',
+            count_per_pack=4,
+            price=1,
+            stock_quantity=cart_count,
+        )
+        for index in range(cart_count)
+    )
+    data = [
+        {
+            'member_uuid': str(member.uuid),
+            'items': [
+                {'inventory_uuid': str(inventory.uuid), 'quantity': 1}
+                for inventory in inventories[:3]
+            ],
+        }
+        for member in members
+    ]
+
+    # the same number of queries for one cart and fifty
+    with django_assert_num_queries(15):
+        response = authenticated_client.post(
+            '/member/bulk-create-purchase-history/',
+            data,
+            format='json',
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert all(result['success'] for result in response.data)
+    assert PurchaseHistory.objects.count() == cart_count * min(cart_count, 3)
+
+
+@pytest.mark.django_db
+def test_bulk_create_purchase_history_item_limit(
+    authenticated_client: APIClient,
+    monkeypatch: pytest.MonkeyPatch,
+    member: Member,
+    inventory: Inventory,
+) -> None:
+    monkeypatch.setattr(settings, 'MAX_BULK_PURCHASE_ITEMS', 2)
+    item = {'inventory_uuid': str(inventory.uuid), 'quantity': 1}
+    data = [
+        {'member_uuid': str(member.uuid), 'items': [item, item]},
+        {'member_uuid': str(member.uuid), 'items': [item]},
+    ]
+
+    response = authenticated_client.post(
+        '/member/bulk-create-purchase-history/',
+        data,
+        format='json',
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert PurchaseHistory.objects.count() == 0
+
+
 @pytest.mark.django_db
 def test_purchase_ranking_list(
     authenticated_client: APIClient,
@@ -123,3 +464,256 @@ def test_purchase_ranking_list_top_param(
     assert response.status_code == status.HTTP_200_OK
     assert len(response.data) == 1
     assert response.data[0]['accumulated_amount'] == 300.0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params',
+    [
+        {},
+        {'top': 2},
+        {'top': 2, 'page_size': 1},
+        # whole days, read from the daily rollups
+        {'purchase_date__gte': '2025-01-01T00:00:00', 'page_size': 2},
+    ],
+)
+def test_purchase_ranking_list_async_identical_response(
+    get_view_content: Callable,
+    member: Member,
+    inventory: Inventory,
+    params: dict,
+) -> None:
+    for name, amount in (('User2', 300.0), ('User3', 200.0)):
+        PurchaseHistory.objects.create(
+            member=Member.objects.create(name=name, cash_balance=1000.0),
+            inventory=inventory.create_snapshot(),
+            amount=amount,
+            quantity=1,
+            purchase_date=timezone.now(),
+        )
+    PurchaseHistory.objects.create(
+        member=member,
+        inventory=inventory.create_snapshot(),
+        amount=100.0,
+        quantity=1,
+        purchase_date=timezone.now(),
+    )
+
+    assert get_view_content(
+        PurchaseRankingListView,
+        params,
+        is_async=True,
+    ) == get_view_content(PurchaseRankingListView, params, is_async=False)
+
+
+@pytest.mark.django_db
+def test_purchase_ranking_list_cursor_pagination(
+    authenticated_client: APIClient,
+    member: Member,
+    inventory: Inventory,
+) -> None:
+    # three members with the same accumulated amount
+    members = [
+        member,
+        Member.objects.create(name='User2', cash_balance=1000.0),
+        Member.objects.create(name='User3', cash_balance=1000.0),
+    ]
+    for buyer in members:
+        PurchaseHistory.objects.create(
+            member=buyer,
+            inventory=inventory.create_snapshot(),
+            amount=100.0,
+            quantity=1,
+            purchase_date=timezone.now(),
+        )
+
+    url = '/member/purchase-ranking/'
+    member_uuids = []
+    response = authenticated_client.get(url, {'page_size': 1})
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        member_uuids += [item['member__uuid'] for item in response.data['results']]
+        if response.data['next'] is None:
+            break
+        response = authenticated_client.get(response.data['next'])
+
+    # assert every member is returned exactly once
+    assert sorted(member_uuids) == sorted(str(buyer.uuid) for buyer in members)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('top', ['0', '101', 'abc'])
+def test_purchase_ranking_list_invalid_top(
+    authenticated_client: APIClient,
+    top: str,
+) -> None:
+    response = authenticated_client.get('/member/purchase-ranking/', {'top': top})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'top' in response.data
+
+
+@pytest.mark.django_db
+def test_purchase_ranking_list_top_pagination(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+) -> None:
+    # five members tied on the same amount, ranked by uuid
+    members = [
+        Member.objects.create(name=f'User{index}', cash_balance=1000.0)
+        for index in range(5)
+    ]
+    snapshot = inventory.create_snapshot()
+    for buyer in members:
+        PurchaseHistory.objects.create(
+            member=buyer,
+            inventory=snapshot,
+            amount=100.0,
+            quantity=1,
+            purchase_date=timezone.now(),
+        )
+
+    url = '/member/purchase-ranking/'
+    response = authenticated_client.get(url, {'top': 3})
+    assert response.status_code == status.HTTP_200_OK
+    top_uuids = [item['member__uuid'] for item in response.data]
+    assert top_uuids == sorted(str(buyer.uuid) for buyer in members)[:3]
+    assert response.data[0]['member__name'].startswith('User')
+    assert response.data[0]['cash_balance'] == 1000.0
+
+    # the pages walk through the top 3 only
+    pages = []
+    response = authenticated_client.get(url, {'top': 3, 'page_size': 2})
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        pages.append([item['member__uuid'] for item in response.data['results']])
+        if response.data['next'] is None:
+            break
+        response = authenticated_client.get(response.data['next'])
+
+    assert pages == [top_uuids[:2], top_uuids[2:]]
+
+    # the returned count of a cursor can not be reset to page past the top 3
+    response = authenticated_client.get(url, {'top': 3, 'page_size': 2})
+    next_url = urlparse(response.data['next'])
+    cursor = parse_qs(next_url.query)['cursor'][0]
+    payload, signature = cursor.split(':')
+    data = json.loads(urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    data['returned'] = 0
+    payload = urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    response = authenticated_client.get(
+        url,
+        {'top': 3, 'page_size': 2, 'cursor': f'{payload}:{signature}'},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_purchase_ranking_daily_spend(
+    authenticated_client: APIClient,
+    member: Member,
+    inventory: Inventory,
+) -> None:
+    member2 = Member.objects.create(name='User2', cash_balance=1000.0)
+    snapshot = inventory.create_snapshot()
+    local_timezone = timezone.get_current_timezone()
+    for buyer, purchase_date, amount in (
+        (member, datetime(2025, 1, 1, 10, tzinfo=local_timezone), 100.0),
+        (member, datetime(2025, 1, 1, 20, tzinfo=local_timezone), 50.0),
+        (member, datetime(2025, 1, 2, 9, tzinfo=local_timezone), 30.0),
+        (member2, datetime(2025, 1, 2, 13, tzinfo=local_timezone), 200.0),
+    ):
+        PurchaseHistory.objects.create(
+            member=buyer,
+            inventory=snapshot,
+            amount=amount,
+            quantity=1,
+            purchase_date=purchase_date,
+        )
+
+    # one row per member and day
+    assert MemberDailySpend.objects.filter(member=member).count() == 2
+    assert MemberDailySpend.verify() == []
+
+    url = '/member/purchase-ranking/'
+    # whole days, answered by the rollup
+    response = authenticated_client.get(
+        url,
+        {
+            'purchase_date__gte': '2025-01-01T00:00:00',
+            'purchase_date__lt': '2025-01-02T00:00:00',
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        (item['member__uuid'], item['accumulated_amount']) for item in response.data
+    ] == [(str(member.uuid), 150.0)]
+
+    # part of a day, summed from the purchase histories
+    response = authenticated_client.get(
+        url,
+        {'purchase_date__gte': '2025-01-01T12:00:00'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        (item['member__uuid'], item['accumulated_amount']) for item in response.data
+    ] == [(str(member2.uuid), 200.0), (str(member.uuid), 80.0)]
+
+
+@pytest.mark.django_db
+def test_rebuild_daily_spend(member: Member, inventory: Inventory) -> None:
+    PurchaseHistory.objects.create(
+        member=member,
+        inventory=inventory.create_snapshot(),
+        amount=100.0,
+        quantity=1,
+        purchase_date=timezone.now(),
+    )
+    MemberDailySpend.objects.update(amount=0)
+
+    with pytest.raises(CommandError):
+        call_command('rebuild_daily_spend', verify=True)
+
+    call_command('rebuild_daily_spend')
+    assert MemberDailySpend.verify() == []
+    assert MemberDailySpend.objects.get(member=member).amount == 100.0
+
+
+@pytest.mark.django_db
+def test_manage_partitions(
+    tmp_path: Path,
+    member: Member,
+    inventory: Inventory,
+) -> None:
+    current_month = timezone.localdate().replace(day=1)
+    future_month = add_months(current_month, 12)
+    old_month = add_months(current_month, -24)
+    snapshot = inventory.create_snapshot()
+    # both months have no partition yet, the rows land in the default partition
+    for month in (future_month, old_month):
+        PurchaseHistory.objects.create(
+            member=member,
+            inventory=snapshot,
+            amount=10.0,
+            quantity=1,
+            purchase_date=local_midnight(month),
+        )
+
+    call_command('manage_partitions')
+
+    # the rows are moved out of the default partition into their months
+    partitions = PURCHASE_HISTORY_PARTITIONS.get_partitions()
+    assert future_month in partitions
+    assert old_month in partitions
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM member_purchasehistory_default')
+        assert cursor.fetchone() == (0,)
+
+    call_command('manage_partitions', retain_months=12, archive_dir=tmp_path)
+
+    old_partition = PURCHASE_HISTORY_PARTITIONS.get_partition_name(old_month)
+    assert old_month not in PURCHASE_HISTORY_PARTITIONS.get_partitions()
+    assert (tmp_path / f'{old_partition}.csv.gz').exists()
+    assert PurchaseHistory.objects.count() == 1
+    # the daily spend rollup keeps the archived month
+    assert MemberDailySpend.objects.filter(member=member).count() == 2
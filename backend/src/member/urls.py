@@ -1,8 +1,16 @@
 from django.urls import path
 
-from .views import PurchaseHistoryCreateView, PurchaseRankingListView
+from .views import (
+    PurchaseHistoryBulkCreateView,
+    PurchaseHistoryCreateView,
+    PurchaseRankingListView,
+)
 
 urlpatterns = [
     path('<uuid:uuid>/create-purchase-history/', PurchaseHistoryCreateView.as_view()),
+    path(
+        'bulk-create-purchase-history/',
+        PurchaseHistoryBulkCreateView.as_view(),
+    ),
     path('purchase-ranking/', PurchaseRankingListView.as_view()),
 ]
@@ -1,16 +1,25 @@
+from datetime import time
 from typing import ClassVar, Self
 
-from django.db.models import F, QuerySet, Sum
+from django.db.models import QuerySet, Sum
 from django.http import HttpRequest, HttpResponse
-from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.utils import extend_schema
 from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.response import Response
-from rest_framework.status import HTTP_201_CREATED
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
 
-from .models import Member, PurchaseHistory
+from core.async_views import AsyncListMixin
+from core.pagination import KeysetCursorPagination
+
+from .models import Member, MemberDailySpend, PurchaseHistory
 from .serializers import (
+    PurchaseCartResultSerializer,
+    PurchaseCartSerializer,
     PurchaseHistoryCreateSerializer,
     PurchaseHistoryListSerializer,
+    PurchaseRankingQuerySerializer,
     PurchaseRankingSerializer,
 )
 
@@ -18,6 +27,8 @@ from .serializers import (
 class PurchaseHistoryCreateView(CreateAPIView):
     serializer_class = PurchaseHistoryCreateSerializer
     queryset = Member.objects.all()
+    # p.s. one more query when a stored snapshot is reused
+    query_budget = 17
 
     def create(
         self: Self,
@@ -59,42 +70,182 @@ class PurchaseHistoryCreateView(CreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class PurchaseRankingListView(ListAPIView):
+class PurchaseHistoryBulkCreateView(CreateAPIView):
+    """
+    Purchase the carts of many members in one request, each cart succeeds or fails on its own.
+    """
+
+    serializer_class = PurchaseCartSerializer
+    queryset = Member.objects.all()
+    # p.s. one more query when a stored snapshot is reused
+    query_budget = 16
+
+    def create(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        results = PurchaseHistory.bulk_create_for_carts(serializer)
+        response_serializer = PurchaseCartResultSerializer(results, many=True)
+        # p.s. 200 even when some carts are rejected, the result of each cart tells
+        return Response(response_serializer.data, status=HTTP_200_OK)
+
+    @extend_schema(
+        operation_id='批次新增多位會員購買紀錄',
+        request=PurchaseCartSerializer(many=True),
+        responses={
+            HTTP_200_OK: PurchaseCartResultSerializer(many=True),
+        },
+    )
+    def post(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        return super().post(request, *args, **kwargs)
+
+
+class PurchaseRankingListView(AsyncListMixin, ListAPIView):
     queryset = PurchaseHistory.objects.all()
     serializer_class = PurchaseRankingSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 3
+    cursor_unique_field = 'member__uuid'
     filterset_fields: ClassVar = {
         'purchase_date': ['gte', 'lte', 'gt', 'lt', 'exact'],
     }
 
+    # the purchase_date filters a whole day range can be answered with
+    rollup_lookups: ClassVar = {
+        'purchase_date__gte': 'purchase_day__gte',
+        'purchase_date__lt': 'purchase_day__lt',
+    }
+
+    @staticmethod
+    def rank(queryset: QuerySet) -> QuerySet:
+        """
+        sum the amount per member without joining the members, the returned rows get the
+        member fields from `attach_members`, so the top N is sorted before any join
+        p.s. works for both PurchaseHistory and MemberDailySpend, both have member and amount.
+        ties are broken by the member uuid, so the top N and the pages are deterministic
+        """
+        return (
+            queryset.values('member__uuid')
+            .annotate(accumulated_amount=Sum('amount'))
+            .order_by('-accumulated_amount', 'member__uuid')
+        )
+
+    @staticmethod
+    def get_members(rows: list[dict]) -> QuerySet:
+        return Member.objects.only('name', 'cash_balance').filter(
+            uuid__in=[row['member__uuid'] for row in rows],
+        )
+
+    @staticmethod
+    def attach_members(rows: list[dict], members: list[Member]) -> list[dict]:
+        member_mapping = {member.uuid: member for member in members}
+        for row in rows:
+            member = member_mapping[row['member__uuid']]
+            row['member__name'] = member.name
+            row['cash_balance'] = member.cash_balance
+        return rows
+
+    def get_top(self: Self) -> int | None:
+        serializer = PurchaseRankingQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('top')
+
+    def get_max_results(self: Self) -> int | None:
+        # bound of the keyset pagination, the pages walk through the top N only
+        return self.get_top()
+
     def get_queryset(self: Self) -> QuerySet:
-        top = self.request.query_params.get('top')
-        queryset = (
-            super()
-            .get_queryset()
-            .select_related('member')
-            .values('member__uuid', 'member__name')
-            .annotate(
-                accumulated_amount=Sum('amount'),
-                cash_balance=F('member__cash_balance'),
-            )
-            .order_by('-accumulated_amount')
+        return self.rank(super().get_queryset())
+
+    def get_rollup_filter(self: Self) -> dict | None:
+        """
+        the MemberDailySpend filter equivalent to the purchase_date filters,
+        None when the range does not start and end at midnight (in TIME_ZONE)
+        """
+        filterset = DjangoFilterBackend().get_filterset(
+            self.request,
+            PurchaseHistory.objects.all(),
+            self,
         )
+        # p.s. invalid parameters are reported by the regular filtering
+        if not filterset.is_valid():
+            return None
+
+        rollup_filter = {}
+        for name, value in filterset.form.cleaned_data.items():
+            if value is None:
+                continue
+            if name not in self.rollup_lookups:
+                return None
+
+            local_datetime = timezone.localtime(value)
+            if local_datetime.time() != time.min:
+                return None
+            rollup_filter[self.rollup_lookups[name]] = local_datetime.date()
+
+        return rollup_filter
+
+    def filter_queryset(self: Self, queryset: QuerySet) -> QuerySet:
+        rollup_filter = self.get_rollup_filter()
+        if rollup_filter is None:
+            queryset = super().filter_queryset(queryset)
+        else:
+            # whole days, sum one rollup row per member and day instead of every purchase
+            queryset = self.rank(MemberDailySpend.objects.filter(**rollup_filter))
 
-        if top:
-            return queryset[: int(top)]
+        # slice after filtering, a sliced queryset can not be filtered any further
+        # p.s. the paginator bounds the pages by itself
+        top = self.get_top()
+        if top and not self.paginator.is_requested(self.request):
+            return queryset[:top]
         return queryset
 
+    def list(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        rows = self.attach_members(rows, list(self.get_members(rows)))
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    async def alist(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = await self.apaginate_queryset(queryset)
+        rows = page if page is not None else [row async for row in queryset]
+        members = [member async for member in self.get_members(rows)]
+        rows = self.attach_members(rows, members)
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     @extend_schema(
         operation_id='取得購買排行榜',
-        parameters=[
-            OpenApiParameter(
-                name='top',
-                type=int,
-                location=OpenApiParameter.QUERY,
-                description='Get the top N buyers',
-                required=False,
-            ),
-        ],
+        parameters=[PurchaseRankingQuerySerializer],
     )
     def get(
         self: Self,
@@ -9,3 +9,8 @@ class WeekDay(models.TextChoices):
     FRIDAY = 'Fri', 'Friday'
     SATURDAY = 'Sat', 'Saturday'
     SUNDAY = 'Sun', 'Sunday'
+
+
+class InventoryCountBy(models.TextChoices):
+    STOCK = 'stock', 'Sum of the stock quantity'
+    PRODUCTS = 'products', 'Number of mask products'
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_search_vector(apps, schema_editor):
+    Inventory = apps.get_model('pharmacy', 'Inventory')
+    Pharmacy = apps.get_model('pharmacy', 'Pharmacy')
+
+    pharmacy_name = Subquery(
+        Pharmacy.objects.filter(uuid=OuterRef('pharmacy_id')).values('name')[:1],
+    )
+    Inventory.objects.update(search_vector=SearchVector('name', pharmacy_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='inventory_search_vector_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the indexes without blocking writes to the tables
+    atomic = False
+
+    dependencies = [
+        ('pharmacy', '0002_inventory_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(
+                fields=['pharmacy', 'price'], name='inventory_pharmacy_price_idx'
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(
+                fields=['price'],
+                include=('pharmacy', 'stock_quantity'),
+                name='inventory_price_covering_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='openinghour',
+            index=models.Index(
+                fields=['weekday', 'start_time', 'end_time'],
+                name='opening_hour_weekday_time_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:15
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# keep the earliest snapshot of each inventory and content, repoint the purchases of the others and delete them
+# p.s. the snapshots of a deleted inventory (null foreign keys) are left alone, like the unique constraint does
+# p.s. the foreign key checks run now, the constraint can not be added with pending trigger events
+COMPACT_SNAPSHOTS_SQL = """
+SET CONSTRAINTS ALL IMMEDIATE;
+CREATE TEMPORARY TABLE duplicate_snapshot ON COMMIT DROP AS
+SELECT uuid, keeper_uuid
+FROM (
+    SELECT
+        uuid,
+        first_value(uuid) OVER (
+            PARTITION BY inventory_id, pharmacy_id, content_hash ORDER BY created_at, uuid
+        ) AS keeper_uuid
+    FROM pharmacy_inventorysnapshot
+    WHERE inventory_id IS NOT NULL AND pharmacy_id IS NOT NULL
+) AS snapshot
+WHERE uuid <> keeper_uuid;
+UPDATE member_purchasehistory AS purchase
+SET inventory_id = duplicate.keeper_uuid
+FROM duplicate_snapshot AS duplicate
+WHERE purchase.inventory_id = duplicate.uuid;
+DELETE FROM pharmacy_inventorysnapshot AS snapshot
+USING duplicate_snapshot AS duplicate
+WHERE snapshot.uuid = duplicate.uuid;
+DROP TABLE duplicate_snapshot;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0003_filter_indexes'),
+        # the purchases are repointed to the kept snapshots
+        ('member', '0004_partition_purchase_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorysnapshot',
+            name='content_hash',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.MD5(
+                    django.db.models.functions.text.Concat(
+                        django.db.models.functions.comparison.Cast(
+                            models.F('pharmacy_name'), models.TextField()
+                        ),
+                        models.Value('\x1f'),
+                        django.db.models.functions.comparison.Cast(
+                            models.F('inventory_name'), models.TextField()
+                        ),
+                        models.Value('\x1f'),
+                        django.db.models.functions.comparison.Cast(
+                            models.F('color'), models.TextField()
+                        ),
+                        models.Value('\x1f'),
+                        django.db.models.functions.comparison.Cast(
+                            django.db.models.functions.comparison.Cast(
+                                models.F('count_per_pack'), models.IntegerField()
+                            ),
+                            models.TextField(),
+                        ),
+                        models.Value('\x1f'),
+                        django.db.models.functions.comparison.Cast(
+                            django.db.models.functions.comparison.Cast(
+                                models.F('price'), models.FloatField()
+                            ),
+                            models.TextField(),
+                        ),
+                        output_field=models.TextField(),
+                    )
+                ),
+                output_field=models.CharField(max_length=32),
+            ),
+        ),
+        migrations.RunSQL(COMPACT_SNAPSHOTS_SQL, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='inventorysnapshot',
+            constraint=models.UniqueConstraint(
+                fields=('inventory', 'pharmacy', 'content_hash'),
+                name='inventory_snapshot_content_hash_unique',
+            ),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:51
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_inventory_snapshot_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='openinghour',
+            name='minutes',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Func(
+                    django.db.models.functions.comparison.Cast(
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                models.Case(
+                                    models.When(then=models.Value(0), weekday='Mon'),
+                                    models.When(then=models.Value(1440), weekday='Tue'),
+                                    models.When(then=models.Value(2880), weekday='Wed'),
+                                    models.When(
+                                        then=models.Value(4320), weekday='Thur'
+                                    ),
+                                    models.When(then=models.Value(5760), weekday='Fri'),
+                                    models.When(then=models.Value(7200), weekday='Sat'),
+                                    models.When(then=models.Value(8640), weekday='Sun'),
+                                    output_field=models.IntegerField(),
+                                ),
+                                '+',
+                                django.db.models.expressions.CombinedExpression(
+                                    django.db.models.functions.datetime.ExtractHour(
+                                        'start_time'
+                                    ),
+                                    '*',
+                                    models.Value(60),
+                                ),
+                            ),
+                            '+',
+                            django.db.models.functions.datetime.ExtractMinute(
+                                'start_time'
+                            ),
+                        ),
+                        models.IntegerField(),
+                    ),
+                    django.db.models.functions.comparison.Cast(
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                django.db.models.expressions.CombinedExpression(
+                                    models.Case(
+                                        models.When(
+                                            then=models.Value(0), weekday='Mon'
+                                        ),
+                                        models.When(
+                                            then=models.Value(1440), weekday='Tue'
+                                        ),
+                                        models.When(
+                                            then=models.Value(2880), weekday='Wed'
+                                        ),
+                                        models.When(
+                                            then=models.Value(4320), weekday='Thur'
+                                        ),
+                                        models.When(
+                                            then=models.Value(5760), weekday='Fri'
+                                        ),
+                                        models.When(
+                                            then=models.Value(7200), weekday='Sat'
+                                        ),
+                                        models.When(
+                                            then=models.Value(8640), weekday='Sun'
+                                        ),
+                                        output_field=models.IntegerField(),
+                                    ),
+                                    '+',
+                                    django.db.models.expressions.CombinedExpression(
+                                        django.db.models.functions.datetime.ExtractHour(
+                                            'end_time'
+                                        ),
+                                        '*',
+                                        models.Value(60),
+                                    ),
+                                ),
+                                '+',
+                                django.db.models.functions.datetime.ExtractMinute(
+                                    'end_time'
+                                ),
+                            ),
+                            '+',
+                            models.Case(
+                                models.When(
+                                    end_time__lte=models.F('start_time'),
+                                    then=models.Value(1440),
+                                ),
+                                default=models.Value(0),
+                            ),
+                        ),
+                        models.IntegerField(),
+                    ),
+                    function='int4range',
+                    output_field=django.contrib.postgres.fields.ranges.IntegerRangeField(),
+                ),
+                output_field=django.contrib.postgres.fields.ranges.IntegerRangeField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='openinghour',
+            index=django.contrib.postgres.indexes.GistIndex(
+                fields=['minutes'], name='opening_hour_minutes_gist_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:20
+
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_search_vector(apps, schema_editor):
+    """
+    the inventories saved one by one before Inventory.save built the search vector
+    """
+    Pharmacy = apps.get_model('pharmacy', 'Pharmacy')
+    Inventory = apps.get_model('pharmacy', 'Inventory')
+    pharmacy_name = Subquery(
+        Pharmacy.objects.filter(uuid=OuterRef('pharmacy_id')).values('name')[:1],
+    )
+    Inventory.objects.filter(search_vector__isnull=True).update(
+        search_vector=SearchVector('name', pharmacy_name),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_opening_hour_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -1,27 +1,230 @@
 from __future__ import annotations
 
+from collections import defaultdict
 from typing import TYPE_CHECKING, Self
 
-from django.db import IntegrityError, models
-from rest_framework.exceptions import ValidationError
+from django.contrib.postgres.fields import IntegerRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import IntegrityError, connection, models, transaction
+from django.db.backends.postgresql.psycopg_any import NumericRange
+from django.db.models import (
+    Case,
+    F,
+    Func,
+    OuterRef,
+    Q,
+    Subquery,
+    UniqueConstraint,
+    Value,
+    When,
+)
+from django.db.models.functions import MD5, Cast, Concat, ExtractHour, ExtractMinute
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
 
+from core.cache import (
+    INVENTORY_NAMESPACE,
+    OPENING_HOUR_NAMESPACE,
+    PHARMACY_NAMESPACE,
+    bump_namespace_version,
+)
 from core.config.env_config import settings
 from core.models import BaseModel
 from pharmacy.enums import WeekDay
 
 if TYPE_CHECKING:
+    from uuid import UUID
+
     from django.db.models.query import QuerySet
 
     from pharmacy.serializers import (
         InventoryBulkCreateSerializer,
+        InventoryBulkQuantityUpdateSerializer,
         InventoryBulkUpdateSerializer,
     )
 
+# apply the delta in the statement itself, so concurrent writers never lose an update
+# p.s. the stock_quantity guard leaves the row untouched instead of violating the check constraint
+# the upper bound of the stock quantity column (integer), also the largest delta
+MAX_STOCK_QUANTITY = 2147483647
+# p.s. the new quantity is checked as a bigint, an integer sum past the bound would raise
+STOCK_DELTA_SQL = """
+    UPDATE pharmacy_inventory
+    SET stock_quantity = stock_quantity + %(delta)s, updated_at = %(updated_at)s
+    WHERE uuid = %(uuid)s
+        AND stock_quantity::bigint + %(delta)s BETWEEN 0 AND %(max_stock_quantity)s
+    RETURNING uuid, name, stock_quantity
+"""
+BULK_STOCK_DELTA_SQL = """
+    UPDATE pharmacy_inventory AS inventory
+    SET stock_quantity = inventory.stock_quantity + delta.delta, updated_at = %(updated_at)s
+    FROM unnest(%(uuids)s::uuid[], %(deltas)s::integer[]) AS delta (uuid, delta)
+    WHERE inventory.uuid = delta.uuid
+        AND inventory.stock_quantity::bigint + delta.delta
+            BETWEEN 0 AND %(max_stock_quantity)s
+    RETURNING inventory.uuid, inventory.name, inventory.stock_quantity
+"""
+# insert the snapshots whose content is not stored yet, the others are looked up afterwards
+SNAPSHOT_INSERT_SQL = """
+    INSERT INTO pharmacy_inventorysnapshot (
+        uuid, created_at, updated_at, pharmacy_id, inventory_id,
+        pharmacy_name, inventory_name, color, count_per_pack, price
+    )
+    SELECT
+        snapshot.uuid, %(now)s, %(now)s, snapshot.pharmacy_id, snapshot.inventory_id,
+        snapshot.pharmacy_name, snapshot.inventory_name, snapshot.color,
+        snapshot.count_per_pack, snapshot.price
+    FROM unnest(
+        %(uuid)s::uuid[], %(pharmacy_id)s::uuid[], %(inventory_id)s::uuid[],
+        %(pharmacy_name)s::varchar[], %(inventory_name)s::varchar[], %(color)s::varchar[],
+        %(count_per_pack)s::integer[], %(price)s::double precision[]
+    ) AS snapshot (
+        uuid, pharmacy_id, inventory_id,
+        pharmacy_name, inventory_name, color, count_per_pack, price
+    )
+    ON CONFLICT (inventory_id, pharmacy_id, content_hash) DO NOTHING
+    RETURNING uuid
+"""
+# the stored snapshots of the given inventories and contents, hashed the same as the content_hash column
+# p.s. one hash per unnested row, joined along the unique constraint
+SNAPSHOT_LOOKUP_SQL = """
+    SELECT
+        snapshot.inventory_id, snapshot.pharmacy_id,
+        snapshot.pharmacy_name, snapshot.inventory_name, snapshot.color,
+        snapshot.count_per_pack, snapshot.price, snapshot.uuid
+    FROM unnest(
+        %(inventory_id)s::uuid[], %(pharmacy_id)s::uuid[],
+        %(pharmacy_name)s::varchar[], %(inventory_name)s::varchar[], %(color)s::varchar[],
+        %(count_per_pack)s::integer[], %(price)s::double precision[]
+    ) AS content (
+        inventory_id, pharmacy_id, pharmacy_name, inventory_name, color, count_per_pack, price
+    )
+    JOIN pharmacy_inventorysnapshot AS snapshot
+        ON snapshot.inventory_id = content.inventory_id
+        AND snapshot.pharmacy_id = content.pharmacy_id
+        AND snapshot.content_hash = md5(concat_ws(
+            %(separator)s, content.pharmacy_name, content.inventory_name, content.color,
+            content.count_per_pack::text, content.price::text
+        ))
+"""
+
+# the fields identifying the content of a snapshot, with the type they are hashed as
+SNAPSHOT_CONTENT_FIELDS = {
+    'pharmacy_name': models.TextField(),
+    'inventory_name': models.TextField(),
+    'color': models.TextField(),
+    'count_per_pack': models.IntegerField(),
+    'price': models.FloatField(),
+}
+# p.s. a control character, it never shows up in a name
+CONTENT_HASH_SEPARATOR = '\x1f'
+
+# opening hours are ranges of minutes from Monday 00:00
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def build_content_hash(**values: str | float) -> MD5:
+    """
+    md5 of the snapshot content, the fields not given are read from the row
+    p.s. a value is cast to the column type before the text, so a python value hashes like the stored one
+    """
+    parts = []
+    for name, output_field in SNAPSHOT_CONTENT_FIELDS.items():
+        value = Cast(Value(values[name]) if name in values else F(name), output_field)
+        if not isinstance(output_field, models.TextField):
+            value = Cast(value, models.TextField())
+        if parts:
+            parts.append(Value(CONTENT_HASH_SEPARATOR))
+        parts.append(value)
+    return MD5(Concat(*parts, output_field=models.TextField()))
+
+
+def build_minutes_of_week() -> Func:
+    """
+    the [start, end) minutes of week of an opening hour, an end not after the start is on the next day
+    (overnight, or 24:00 stored as 00:00), so a range ends before 2 * MINUTES_PER_WEEK
+    """
+    day = Case(
+        *(
+            When(weekday=weekday, then=Value(index * MINUTES_PER_DAY))
+            for index, weekday in enumerate(WeekDay.values)
+        ),
+        output_field=models.IntegerField(),
+    )
+    start = day + ExtractHour('start_time') * 60 + ExtractMinute('start_time')
+    end = (
+        day
+        + ExtractHour('end_time') * 60
+        + ExtractMinute('end_time')
+        + Case(
+            When(end_time__lte=F('start_time'), then=Value(MINUTES_PER_DAY)),
+            default=Value(0),
+        )
+    )
+    # p.s. EXTRACT returns a numeric, int4range only takes integers
+    return Func(
+        Cast(start, models.IntegerField()),
+        Cast(end, models.IntegerField()),
+        function='int4range',
+        output_field=IntegerRangeField(),
+    )
+
+
+def build_open_filter(start: int, end: int) -> Q:
+    """
+    the opening hours overlapping the [start, end) minutes of week,
+    shifted by a week both ways for the ranges and periods running past Sunday midnight
+    """
+    return (
+        Q(
+            minutes__overlap=NumericRange(
+                start - MINUTES_PER_WEEK,
+                end - MINUTES_PER_WEEK,
+            ),
+        )
+        | Q(minutes__overlap=NumericRange(start, end))
+        | Q(
+            minutes__overlap=NumericRange(
+                start + MINUTES_PER_WEEK,
+                end + MINUTES_PER_WEEK,
+            ),
+        )
+    )
+
 
 class Pharmacy(BaseModel):
     name = models.CharField(max_length=50)
     cash_balance = models.FloatField(default=0.0)
 
+    def save(self: Self, *args: tuple, **kwargs: dict) -> None:
+        """
+        p.s. the search vectors of the inventories contain the name, they are rebuilt when it is saved
+        and the cached inventory responses are invalidated as well
+        """
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (
+            update_fields is not None and 'name' not in update_fields
+        ):
+            super().save(*args, **kwargs)
+            bump_namespace_version(PHARMACY_NAMESPACE)
+            return
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.inventory_set.update_search_vector()
+        bump_namespace_version(PHARMACY_NAMESPACE, INVENTORY_NAMESPACE)
+
+    def delete(self: Self, *args: tuple, **kwargs: dict) -> tuple[int, dict]:
+        # p.s. its opening hours and inventories are deleted along
+        bump_namespace_version(
+            PHARMACY_NAMESPACE,
+            OPENING_HOUR_NAMESPACE,
+            INVENTORY_NAMESPACE,
+        )
+        return super().delete(*args, **kwargs)
+
 
 class OpeningHour(BaseModel):
     pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE)
@@ -30,6 +233,56 @@ class OpeningHour(BaseModel):
 
     end_time = models.TimeField()
 
+    # the opening hour in minutes of week, so "open at" is a range containment
+    minutes = models.GeneratedField(
+        expression=build_minutes_of_week(),
+        output_field=IntegerRangeField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = (
+            # pharmacy list, filtered by weekday then start_time / end_time ranges
+            models.Index(
+                fields=('weekday', 'start_time', 'end_time'),
+                name='opening_hour_weekday_time_idx',
+            ),
+            # pharmacy list, open at a moment or during a period
+            GistIndex(fields=('minutes',), name='opening_hour_minutes_gist_idx'),
+        )
+
+    def save(self: Self, *args: tuple, **kwargs: dict) -> None:
+        super().save(*args, **kwargs)
+        bump_namespace_version(OPENING_HOUR_NAMESPACE)
+
+    def delete(self: Self, *args: tuple, **kwargs: dict) -> tuple[int, dict]:
+        bump_namespace_version(OPENING_HOUR_NAMESPACE)
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def get_open_pharmacy_slots(cls: OpeningHour, start: int, end: int) -> QuerySet:
+        """
+        one opening hour per pharmacy open during the [start, end) minutes of week,
+        its earliest slot overlapping the period
+        """
+        return (
+            cls.objects.filter(build_open_filter(start, end))
+            .order_by('pharmacy', 'minutes')
+            .distinct('pharmacy')
+            .values('uuid')
+        )
+
+
+class InventoryQuerySet(models.QuerySet):
+    def update_search_vector(self: Self) -> int:
+        """
+        rebuild the stored search vector from the database, used after pharmacy names change
+        """
+        pharmacy_name = Subquery(
+            Pharmacy.objects.filter(uuid=OuterRef('pharmacy_id')).values('name')[:1],
+        )
+        return self.update(search_vector=SearchVector('name', pharmacy_name))
+
 
 class Inventory(BaseModel):
     pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE)
@@ -40,6 +293,46 @@ class Inventory(BaseModel):
     price = models.FloatField()
     stock_quantity = models.PositiveIntegerField()
 
+    # precomputed tsvector of inventory name and pharmacy name for full text search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = InventoryQuerySet.as_manager()
+
+    @staticmethod
+    def build_search_vector(name: str, pharmacy_name: str) -> SearchVector:
+        """
+        p.s. only contains values, so it can be assigned before bulk_create / bulk_update
+        """
+        return SearchVector(Value(name), Value(pharmacy_name))
+
+    def save(self: Self, *args: tuple, **kwargs: dict) -> None:
+        """
+        p.s. the search vector is built by the INSERT / UPDATE itself, the pharmacy name from a
+        subquery instead of loading the pharmacy, the bulk paths build it themselves
+        """
+        update_fields = kwargs.get('update_fields')
+        rebuild = update_fields is None or bool(
+            {'name', 'pharmacy'} & set(update_fields),
+        )
+        if rebuild:
+            pharmacy_name = Subquery(
+                Pharmacy.objects.filter(uuid=self.pharmacy_id).values('name')[:1],
+            )
+            self.search_vector = SearchVector(Value(self.name), pharmacy_name)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_vector'}
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            # the expression is not read back, the stored vector is loaded when accessed
+            if rebuild:
+                self.__dict__.pop('search_vector', None)
+        bump_namespace_version(INVENTORY_NAMESPACE)
+
+    def delete(self: Self, *args: tuple, **kwargs: dict) -> tuple[int, dict]:
+        bump_namespace_version(INVENTORY_NAMESPACE)
+        return super().delete(*args, **kwargs)
+
     @classmethod
     def bulk_create_for_pharmacy(
         cls: Inventory,
@@ -64,6 +357,10 @@ class Inventory(BaseModel):
                         count_per_pack=item['count_per_pack'],
                         price=item['price'],
                         stock_quantity=item['stock_quantity'],
+                        search_vector=cls.build_search_vector(
+                            item['name'],
+                            locked_pharmacy.name,
+                        ),
                     ),
                 )
 
@@ -72,13 +369,15 @@ class Inventory(BaseModel):
                     to_create_inventory,
                     batch_size=settings.BATCH_SIZE,
                 )
-                locked_pharmacy.save()
+                locked_pharmacy.save(update_fields=['cash_balance', 'updated_at'])
             except IntegrityError as e:
                 msg = {
                     'detail': 'Duplicate inventory entries detected. item must be unique by name, color, and count_per_pack for a pharmacy.',
                 }
                 raise ValidationError(msg) from e
 
+            # p.s. the pharmacy namespace is bumped by its save
+            bump_namespace_version(INVENTORY_NAMESPACE)
             return created_inventories
 
     @classmethod
@@ -115,6 +414,10 @@ class Inventory(BaseModel):
                     )
 
                 inventory.__dict__.update(item)
+                inventory.search_vector = cls.build_search_vector(
+                    inventory.name,
+                    pharmacy.name,
+                )
                 to_update_inventory.append(inventory)
 
             try:
@@ -126,6 +429,7 @@ class Inventory(BaseModel):
                         'price',
                         'count_per_pack',
                         'stock_quantity',
+                        'search_vector',
                     ],
                     batch_size=settings.BATCH_SIZE,
                 )
@@ -135,21 +439,145 @@ class Inventory(BaseModel):
                 }
                 raise ValidationError(msg) from e
 
+            bump_namespace_version(INVENTORY_NAMESPACE)
             return to_update_inventory
 
-    def create_snapshot(self: Self) -> InventorySnapshot:
-        return InventorySnapshot.objects.create(
-            pharmacy=self.pharmacy,
+    @classmethod
+    def apply_stock_delta(cls: Inventory, uuid: UUID, delta: int) -> Inventory:
+        """
+        add the delta to the stock quantity in a single UPDATE ... RETURNING,
+        the returned instance only loads uuid, name and stock_quantity
+        """
+        params = {
+            'uuid': uuid,
+            'delta': delta,
+            'updated_at': timezone.now(),
+            'max_stock_quantity': MAX_STOCK_QUANTITY,
+        }
+        inventory = next(iter(cls.objects.raw(STOCK_DELTA_SQL, params)), None)
+        if inventory is not None:
+            bump_namespace_version(INVENTORY_NAMESPACE)
+            return inventory
+
+        # p.s. only the failed update pays for the second query
+        stock_quantity = (
+            cls.objects.filter(uuid=uuid)
+            .values_list('stock_quantity', flat=True)
+            .first()
+        )
+        if stock_quantity is None:
+            msg = f'Inventory with uuid {uuid} does not exist.'
+            raise NotFound(msg)
+
+        if stock_quantity + delta > MAX_STOCK_QUANTITY:
+            msg = {
+                'detail': f'Inventory: {uuid} stock would exceed {MAX_STOCK_QUANTITY} with delta {delta}.',
+            }
+            raise ValidationError(msg)
+
+        msg = {
+            'detail': f'Inventory: {uuid} does not have enough stock for delta {delta}.',
+        }
+        raise ValidationError(msg)
+
+    @classmethod
+    def bulk_apply_stock_delta(
+        cls: Inventory,
+        serializer: InventoryBulkQuantityUpdateSerializer,
+    ) -> list[Inventory]:
+        """
+        apply many (uuid, delta) pairs at once, all or nothing
+        p.s. the rows are locked in uuid order before the UPDATE, so overlapping batches never deadlock
+        """
+        # merge the deltas of the same inventory, a row is updated at most once per statement
+        delta_mapping = defaultdict(int)
+        for item in serializer.validated_data:
+            delta_mapping[item['uuid']] += item['delta']
+        for uuid, delta in delta_mapping.items():
+            if abs(delta) > MAX_STOCK_QUANTITY:
+                msg = {
+                    'detail': f'Inventory: {uuid} merged delta {delta} exceeds {MAX_STOCK_QUANTITY}.',
+                }
+                raise ValidationError(msg)
+
+        with cls.lock_query(uuid_list=list(delta_mapping)) as locked_inventory_qs:
+            locked_inventory_uuid = set(
+                locked_inventory_qs.values_list('uuid', flat=True),
+            )
+            for uuid in delta_mapping:
+                if uuid not in locked_inventory_uuid:
+                    msg = {
+                        'detail': f'Inventory with uuid {uuid} does not exist.',
+                    }
+                    raise ValidationError(msg)
+
+            params = {
+                'uuids': list(delta_mapping),
+                'deltas': list(delta_mapping.values()),
+                'updated_at': timezone.now(),
+                'max_stock_quantity': MAX_STOCK_QUANTITY,
+            }
+            updated_inventories = list(cls.objects.raw(BULK_STOCK_DELTA_SQL, params))
+
+            # roll back the whole batch when any inventory would go below zero
+            if len(updated_inventories) != len(delta_mapping):
+                updated_inventory_uuid = {item.uuid for item in updated_inventories}
+                failed_uuid = [
+                    str(uuid)
+                    for uuid in delta_mapping
+                    if uuid not in updated_inventory_uuid
+                ]
+                msg = {
+                    'detail': f'Inventory: {", ".join(failed_uuid)} does not have enough stock, or would exceed {MAX_STOCK_QUANTITY}.',
+                }
+                raise ValidationError(msg)
+
+            bump_namespace_version(INVENTORY_NAMESPACE)
+            return updated_inventories
+
+    def build_snapshot(
+        self: Self,
+        pharmacy: Pharmacy | None = None,
+    ) -> InventorySnapshot:
+        """
+        build an unsaved snapshot, so callers can bulk_create them
+        p.s. pass the pharmacy when it is already loaded to skip the foreign key lookup
+        """
+        pharmacy = pharmacy or self.pharmacy
+        return InventorySnapshot(
+            pharmacy=pharmacy,
             inventory=self,
-            pharmacy_name=self.pharmacy.name,
+            pharmacy_name=pharmacy.name,
             inventory_name=self.name,
             color=self.color,
             count_per_pack=self.count_per_pack,
             price=self.price,
         )
 
+    def create_snapshot(self: Self) -> InventorySnapshot:
+        """
+        p.s. returns the stored snapshot when one with the same content exists
+        """
+        snapshot = self.build_snapshot()
+        InventorySnapshot.bulk_get_or_create([snapshot])
+        return snapshot
+
     class Meta:
         unique_together = ('pharmacy', 'name', 'color', 'count_per_pack')
+        indexes = (
+            GinIndex(fields=('search_vector',), name='inventory_search_vector_idx'),
+            # masks of a pharmacy, filtered or sorted by price
+            models.Index(
+                fields=('pharmacy', 'price'),
+                name='inventory_pharmacy_price_idx',
+            ),
+            # inventory count, a price range summed per pharmacy with an index only scan
+            models.Index(
+                fields=('price',),
+                include=('pharmacy', 'stock_quantity'),
+                name='inventory_price_covering_idx',
+            ),
+        )
 
 
 class InventorySnapshot(BaseModel):
@@ -162,3 +590,78 @@ class InventorySnapshot(BaseModel):
 
     count_per_pack = models.PositiveIntegerField()
     price = models.FloatField()
+
+    # purchases of an unchanged inventory share one snapshot, found by the inventory and the hash of its content
+    # p.s. the foreign keys are set to null when the pharmacy or inventory is deleted,
+    # the snapshots of a deleted inventory are never shared again
+    content_hash = models.GeneratedField(
+        expression=build_content_hash(),
+        output_field=models.CharField(max_length=32),
+        db_persist=True,
+    )
+
+    @property
+    def key(self: Self) -> tuple:
+        """
+        the inventory, its pharmacy and the content, a snapshot is shared by the purchases with the same key
+        """
+        return (
+            self.inventory_id,
+            self.pharmacy_id,
+            *(getattr(self, name) for name in SNAPSHOT_CONTENT_FIELDS),
+        )
+
+    @classmethod
+    def bulk_get_or_create(
+        cls: InventorySnapshot,
+        snapshots: list[InventorySnapshot],
+    ) -> list[InventorySnapshot]:
+        """
+        insert the snapshots whose key is not stored yet, the others take the uuid of the stored one
+        p.s. a snapshot without inventory (or pharmacy) is always inserted, null never conflicts
+        p.s. the lookup runs after the insert, so a snapshot inserted concurrently is found once committed
+        """
+        if not snapshots:
+            return snapshots
+
+        # one array per column, named after the field
+        params = {
+            name: [getattr(snapshot, name) for snapshot in snapshots]
+            for name in (
+                'uuid',
+                'pharmacy_id',
+                'inventory_id',
+                *SNAPSHOT_CONTENT_FIELDS,
+            )
+        }
+        params['now'] = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(SNAPSHOT_INSERT_SQL, params)
+            inserted_uuid = {uuid for (uuid,) in cursor.fetchall()}
+
+        existing_snapshots = [
+            snapshot for snapshot in snapshots if snapshot.uuid not in inserted_uuid
+        ]
+        if existing_snapshots:
+            params = {
+                name: [getattr(snapshot, name) for snapshot in existing_snapshots]
+                for name in ('inventory_id', 'pharmacy_id', *SNAPSHOT_CONTENT_FIELDS)
+            }
+            params['separator'] = CONTENT_HASH_SEPARATOR
+            with connection.cursor() as cursor:
+                cursor.execute(SNAPSHOT_LOOKUP_SQL, params)
+                stored_mapping = {row[:-1]: row[-1] for row in cursor.fetchall()}
+            for snapshot in existing_snapshots:
+                snapshot.uuid = stored_mapping[snapshot.key]
+
+        for snapshot in snapshots:
+            snapshot._state.adding = False  # noqa: SLF001
+        return snapshots
+
+    class Meta:
+        constraints = (
+            UniqueConstraint(
+                fields=('inventory', 'pharmacy', 'content_hash'),
+                name='inventory_snapshot_content_hash_unique',
+            ),
+        )
@@ -1,6 +1,21 @@
+from datetime import time
+from typing import Self
+
 from rest_framework import serializers
 
-from pharmacy.models import Inventory, OpeningHour, Pharmacy
+from core.serializers import CompiledListSerializer
+from pharmacy.enums import InventoryCountBy, WeekDay
+from pharmacy.models import (
+    MAX_STOCK_QUANTITY,
+    MINUTES_PER_DAY,
+    Inventory,
+    OpeningHour,
+    Pharmacy,
+)
+
+WEEKDAY_PATTERN = '|'.join(WeekDay.values)
+OPEN_AT_PATTERN = rf'^({WEEKDAY_PATTERN}) (\d{{2}}:\d{{2}})$'
+OPEN_BETWEEN_PATTERN = rf'^({WEEKDAY_PATTERN}) (\d{{2}}:\d{{2}}) - (\d{{2}}:\d{{2}})$'
 
 
 class PharmacySerializer(serializers.ModelSerializer):
@@ -24,6 +39,59 @@ class OpeningHourListSerializer(serializers.ModelSerializer):
             'start_time',
             'end_time',
         )
+        list_serializer_class = CompiledListSerializer
+
+
+class OpeningHourQuerySerializer(serializers.Serializer):
+    open_at = serializers.RegexField(
+        OPEN_AT_PATTERN,
+        required=False,
+        help_text='Pharmacies open at a moment of the week, e.g. `Tue 23:30`',
+    )
+    open_between = serializers.RegexField(
+        OPEN_BETWEEN_PATTERN,
+        required=False,
+        help_text=(
+            'Pharmacies open during a period of the week, e.g. `Fri 22:00 - 02:00`, '
+            'an end not after the start is on the next day'
+        ),
+    )
+
+    def get_minute_of_week(self: Self, field: str, weekday: str, value: str) -> int:
+        # p.s. 24:00 is accepted like the opening hours of the raw data, it is the next day
+        if value == '24:00':
+            minutes = MINUTES_PER_DAY
+        else:
+            try:
+                at = time.fromisoformat(value)
+            except ValueError as exc:
+                raise serializers.ValidationError(
+                    {field: f'Invalid time {value}.'},
+                ) from exc
+            minutes = at.hour * 60 + at.minute
+        return WeekDay.values.index(weekday) * MINUTES_PER_DAY + minutes
+
+    def validate(self: Self, attrs: dict) -> dict:
+        """
+        the open_at / open_between parameter as [start, end) minutes of week, in open_period
+        """
+        if 'open_at' in attrs and 'open_between' in attrs:
+            raise serializers.ValidationError(
+                {'detail': 'open_at and open_between can not be used together.'},
+            )
+
+        if 'open_at' in attrs:
+            weekday, at = attrs['open_at'].split(' ')
+            start = self.get_minute_of_week('open_at', weekday, at)
+            attrs['open_period'] = (start, start + 1)
+        elif 'open_between' in attrs:
+            weekday, start_time, _, end_time = attrs['open_between'].split(' ')
+            start = self.get_minute_of_week('open_between', weekday, start_time)
+            end = self.get_minute_of_week('open_between', weekday, end_time)
+            if end <= start:
+                end += MINUTES_PER_DAY
+            attrs['open_period'] = (start, end)
+        return attrs
 
 
 class InventoryPerPharmacyListSerializer(serializers.ModelSerializer):
@@ -31,6 +99,7 @@ class InventoryPerPharmacyListSerializer(serializers.ModelSerializer):
         model = Inventory
         fields = ('uuid', 'name', 'color', 'count_per_pack', 'price', 'stock_quantity')
         read_only_fields = ('uuid',)
+        list_serializer_class = CompiledListSerializer
 
 
 class InventoryCountSerializer(serializers.ModelSerializer):
@@ -43,10 +112,42 @@ class InventoryCountSerializer(serializers.ModelSerializer):
         fields = ('uuid', 'pharmacy_name', 'inventory_count')
 
 
+class InventoryCountQuerySerializer(serializers.Serializer):
+    count_by = serializers.ChoiceField(
+        choices=InventoryCountBy.choices,
+        default=InventoryCountBy.STOCK,
+        help_text='Count the stock quantity or the mask products in the price range',
+    )
+    count_gt = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text='Pharmacies with a count above it',
+    )
+    count_lt = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text='Pharmacies with a count below it',
+    )
+    count_between = serializers.RegexField(
+        r'^\d+,\d+$',
+        required=False,
+        help_text='Pharmacies with a count between both, included, e.g. `10,20`',
+    )
+
+    def validate_count_between(self: Self, value: str) -> tuple[int, int]:
+        low, high = (int(bound) for bound in value.split(','))
+        if low > high:
+            msg = 'The lower bound is above the upper bound.'
+            raise serializers.ValidationError(msg)
+        return low, high
+
+
 class InventoryUpdateSerializer(serializers.Serializer):
     delta = serializers.IntegerField(
         required=True,
         write_only=True,
+        min_value=-MAX_STOCK_QUANTITY,
+        max_value=MAX_STOCK_QUANTITY,
         help_text='The change in stock quantity (can be negative)',
     )
     uuid = serializers.CharField(read_only=True)
@@ -54,6 +155,19 @@ class InventoryUpdateSerializer(serializers.Serializer):
     stock_quantity = serializers.IntegerField(read_only=True)
 
 
+class InventoryBulkQuantityUpdateSerializer(serializers.Serializer):
+    uuid = serializers.UUIDField()
+    delta = serializers.IntegerField(
+        required=True,
+        write_only=True,
+        min_value=-MAX_STOCK_QUANTITY,
+        max_value=MAX_STOCK_QUANTITY,
+        help_text='The change in stock quantity (can be negative)',
+    )
+    name = serializers.CharField(read_only=True)
+    stock_quantity = serializers.IntegerField(read_only=True)
+
+
 class InventoryBulkUpdateSerializer(serializers.ModelSerializer):
     uuid = serializers.CharField()
 
@@ -87,3 +201,4 @@ class InventoryListSerializer(serializers.ModelSerializer):
             'price',
             'stock_quantity',
         )
+        list_serializer_class = CompiledListSerializer
@@ -1,8 +1,21 @@
+import json
+from collections.abc import Callable
+
 import pytest
+from asgiref.sync import async_to_sync
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 
-from pharmacy.models import Inventory, Pharmacy
+from account.models import User
+from core.config.env_config import settings
+from pharmacy.models import MAX_STOCK_QUANTITY, Inventory, OpeningHour, Pharmacy
+from pharmacy.views import (
+    InventoryCountView,
+    InventoryListView,
+    InventoryPerPharmacyListView,
+    PharmacyListView,
+)
 
 
 @pytest.mark.django_db
@@ -26,6 +39,132 @@ def test_inventory_per_pharmacy_list(
     assert response.json()[0]['name'] == inventory.name
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('path', 'params'),
+    [
+        ('/pharmacy/', {'weekday': 'Mon'}),
+        ('/pharmacy/', {'page_size': 1}),
+        ('/pharmacy/{uuid}/inventory/', {'ordering': '-price'}),
+        ('/pharmacy/{uuid}/inventory/', {'ordering': 'name', 'page_size': 1}),
+        ('/pharmacy/inventory/', {'search': 'Mask'}),
+        ('/pharmacy/inventory/', {'search': 'Pharmacy', 'page_size': 1}),
+        ('/pharmacy/inventory/', {'stream': 'ndjson'}),
+    ],
+)
+def test_fast_serializers_identical_response(
+    authenticated_client: APIClient,
+    monkeypatch: pytest.MonkeyPatch,
+    listed_pharmacy: Pharmacy,
+    path: str,
+    params: dict,
+) -> None:
+    pharmacy = listed_pharmacy
+    url = path.format(uuid=pharmacy.uuid)
+
+    def get_content() -> bytes:
+        response = authenticated_client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        # p.s. the next cursor of a page is followed once, it carries the position of the row
+        content = response.content
+        next_url = response.json().get('next') if params.get('page_size') else None
+        if next_url:
+            content += authenticated_client.get(next_url).content
+        return content
+
+    fast_content = get_content()
+    monkeypatch.setattr(settings, 'FAST_SERIALIZERS', False)
+
+    # the .values() rows render the same bytes as the model serializer
+    assert fast_content == get_content()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('view_class', 'params'),
+    [
+        (PharmacyListView, {}),
+        (PharmacyListView, {'page_size': 1}),
+        (PharmacyListView, {'open_at': 'Tue 14:00'}),
+        (PharmacyListView, {'stream': '1'}),
+        (InventoryPerPharmacyListView, {'ordering': 'price', 'page_size': 1}),
+        (InventoryPerPharmacyListView, {'stream': 'ndjson'}),
+        (InventoryCountView, {'count_by': 'products', 'count_gt': 1}),
+        (InventoryListView, {'search': 'Mask'}),
+        # the errors are handled the same way
+        (InventoryCountView, {'count_between': '2,1'}),
+        (InventoryListView, {'stream': 'xml'}),
+    ],
+)
+def test_async_views_identical_response(
+    get_view_content: Callable,
+    listed_pharmacy: Pharmacy,
+    view_class: type,
+    params: dict,
+) -> None:
+    pharmacy = listed_pharmacy
+    assert get_view_content(
+        view_class,
+        params,
+        is_async=True,
+        uuid=pharmacy.uuid,
+    ) == get_view_content(view_class, params, is_async=False, uuid=pharmacy.uuid)
+
+
+@pytest.mark.django_db
+def test_async_views_cached(
+    monkeypatch: pytest.MonkeyPatch,
+    django_assert_num_queries: Callable,
+    test_user: User,
+    inventory: Inventory,
+) -> None:
+    monkeypatch.setattr(settings, 'ASYNC_VIEWS', True)
+    view = PharmacyListView.as_view()
+
+    def get_response() -> Response:
+        request = APIRequestFactory().get('/', {'weekday': 'Mon'})
+        force_authenticate(request, user=test_user)
+        return async_to_sync(view)(request).render()
+
+    content = get_response().content
+    # the async view reads the response it cached, no query at all
+    with django_assert_num_queries(0):
+        assert get_response().content == content
+
+
+@pytest.mark.django_db
+def test_inventory_per_pharmacy_list_cursor_pagination(
+    authenticated_client: APIClient,
+    pharmacy: Pharmacy,
+    inventory: Inventory,
+) -> None:
+    # same price as the fixture, so the pages have to be split by uuid
+    for name in ('Mask B', 'Mask C'):
+        Inventory.objects.create(
+            pharmacy=pharmacy,
+            name=name,
+            color='red',
+            count_per_pack=4,
+            price=10,
+            stock_quantity=10,
+        )
+
+    url = f'/pharmacy/{pharmacy.uuid}/inventory/'
+    response = authenticated_client.get(url, {'ordering': '-price', 'page_size': 2})
+    first_page = response.json()
+
+    response = authenticated_client.get(first_page['next'])
+    second_page = response.json()
+
+    # assert every inventory is returned exactly once and the last page has no next cursor
+    names = [item['name'] for item in first_page['results'] + second_page['results']]
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(names) == ['Mask A', 'Mask B', 'Mask C']
+    assert second_page['next'] is None
+
+
 @pytest.mark.django_db
 def test_inventory_list(authenticated_client: APIClient, inventory: Inventory) -> None:
     url = '/pharmacy/inventory/'
@@ -36,6 +175,89 @@ def test_inventory_list(authenticated_client: APIClient, inventory: Inventory) -
     assert response.json()[0]['inventoryName'] == inventory.name
 
 
+@pytest.mark.django_db
+def test_inventory_list_stream(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+) -> None:
+    url = '/pharmacy/inventory/'
+    expected = authenticated_client.get(url).json()
+
+    response = authenticated_client.get(url, {'stream': '1'})
+    content = b''.join(response.streaming_content)
+
+    # assert the streamed array is identical to the regular response
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(content) == expected
+
+    response = authenticated_client.get(url, {'stream': 'ndjson'})
+    lines = b''.join(response.streaming_content).splitlines()
+
+    # assert one camel case json object per line
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in lines] == expected
+
+
+@pytest.mark.django_db
+def test_inventory_list_search(
+    authenticated_client: APIClient,
+    pharmacy: Pharmacy,
+    inventory: Inventory,
+) -> None:
+    Inventory.objects.create(
+        pharmacy=pharmacy,
+        name='Cotton Kiss',
+        color='blue',
+        count_per_pack=6,
+        price=20,
+        stock_quantity=10,
+    )
+    url = '/pharmacy/inventory/'
+    response = authenticated_client.get(url, {'search': 'Mask'})
+
+    # assert only the matching inventory is returned
+    assert response.status_code == status.HTTP_200_OK
+    assert [item['inventoryName'] for item in response.json()] == [inventory.name]
+
+
+@pytest.mark.django_db
+def test_inventory_list_search_pharmacy_renamed(
+    authenticated_client: APIClient,
+    pharmacy: Pharmacy,
+    inventory: Inventory,
+) -> None:
+    url = '/pharmacy/inventory/'
+    pharmacy.name = 'Renamed Drugstore'
+    pharmacy.save()
+
+    # the search vectors of its inventories follow the pharmacy name
+    response = authenticated_client.get(url, {'search': 'Drugstore'})
+    assert [item['inventoryName'] for item in response.json()] == [inventory.name]
+    response = authenticated_client.get(url, {'search': 'Test'})
+    assert response.json() == []
+
+
+@pytest.mark.django_db
+def test_inventory_save_search_vector(
+    authenticated_client: APIClient,
+    django_assert_num_queries: Callable,
+    inventory: Inventory,
+) -> None:
+    # the vector is built in the UPDATE, the pharmacy is not loaded for its name
+    inventory = Inventory.objects.get(uuid=inventory.uuid)
+    inventory.name = 'Respirator'
+    with django_assert_num_queries(1):
+        inventory.save()
+
+    response = authenticated_client.get(
+        '/pharmacy/inventory/',
+        {'search': 'Respirator'},
+    )
+    assert [item['inventoryName'] for item in response.json()] == ['Respirator']
+    response = authenticated_client.get('/pharmacy/inventory/', {'search': 'Test'})
+    assert [item['inventoryName'] for item in response.json()] == ['Respirator']
+
+
 @pytest.mark.django_db
 def test_inventory_count(authenticated_client: APIClient, inventory: Inventory) -> None:
     url = '/pharmacy/inventory/count/'
@@ -46,6 +268,124 @@ def test_inventory_count(authenticated_client: APIClient, inventory: Inventory)
     assert response.json()[0]['inventoryCount'] == 100
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('params', 'expected'),
+    [
+        ({}, {'Test Pharmacy': 100, 'Other Pharmacy': 3}),
+        ({'count_gt': 3}, {'Test Pharmacy': 100}),
+        ({'count_lt': 100}, {'Other Pharmacy': 3}),
+        ({'count_between': '3,100'}, {'Test Pharmacy': 100, 'Other Pharmacy': 3}),
+        ({'count_between': '4,99'}, {}),
+        ({'count_by': 'products'}, {'Test Pharmacy': 1, 'Other Pharmacy': 2}),
+        ({'count_by': 'products', 'count_gt': 1}, {'Other Pharmacy': 2}),
+        # the thresholds apply to the count within the price range
+        (
+            {'count_by': 'products', 'count_gt': 1, 'price__gte': 11},
+            {},
+        ),
+    ],
+)
+def test_inventory_count_thresholds(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+    params: dict,
+    expected: dict,
+) -> None:
+    pharmacy = Pharmacy.objects.create(name='Other Pharmacy')
+    for name, price, stock_quantity in (('Mask A', 10, 1), ('Mask B', 20, 2)):
+        Inventory.objects.create(
+            pharmacy=pharmacy,
+            name=name,
+            color='blue',
+            count_per_pack=10,
+            price=price,
+            stock_quantity=stock_quantity,
+        )
+
+    response = authenticated_client.get('/pharmacy/inventory/count/', params)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {
+        row['pharmacyName']: row['inventoryCount'] for row in response.json()
+    } == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'count_gt': -1},
+        {'count_between': '10'},
+        {'count_between': '20,10'},
+        {'count_by': 'price'},
+    ],
+)
+def test_inventory_count_thresholds_invalid(
+    authenticated_client: APIClient,
+    params: dict,
+) -> None:
+    response = authenticated_client.get('/pharmacy/inventory/count/', params)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_inventory_count_cache(
+    authenticated_client: APIClient,
+    django_capture_on_commit_callbacks: Callable,
+    inventory: Inventory,
+) -> None:
+    url = '/pharmacy/inventory/count/'
+    response = authenticated_client.get(url)
+    assert response.data[0]['inventory_count'] == 100
+
+    # a write bypassing the write paths is not seen until the cache expires
+    Inventory.objects.filter(uuid=inventory.uuid).update(stock_quantity=50)
+    response = authenticated_client.get(url)
+    assert response.data[0]['inventory_count'] == 100
+
+    # the write paths invalidate the cached responses once committed
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.put(
+            f'/pharmacy/inventory/{inventory.uuid}/update-quantity/',
+            {'delta': 10},
+            format='json',
+        )
+    response = authenticated_client.get(url)
+    assert response.data[0]['inventory_count'] == 60
+
+
+@pytest.mark.django_db
+def test_pharmacy_cache_renamed(
+    authenticated_client: APIClient,
+    django_capture_on_commit_callbacks: Callable,
+    inventory: Inventory,
+) -> None:
+    pharmacy = inventory.pharmacy
+    OpeningHour.objects.create(
+        pharmacy=pharmacy,
+        weekday='Mon',
+        start_time='08:00',
+        end_time='18:00',
+    )
+    urls = ('/pharmacy/', '/pharmacy/inventory/count/')
+    for url in urls:
+        assert authenticated_client.get(url).data[0]['pharmacy_name'] == pharmacy.name
+
+    # a rename invalidates the cached pharmacy and inventory responses once committed
+    with django_capture_on_commit_callbacks(execute=True):
+        pharmacy.name = 'Renamed Pharmacy'
+        pharmacy.save()
+    for url in urls:
+        response = authenticated_client.get(url)
+        assert response.data[0]['pharmacy_name'] == 'Renamed Pharmacy'
+
+    # so does a change of the opening hours
+    with django_capture_on_commit_callbacks(execute=True):
+        OpeningHour.objects.filter(pharmacy=pharmacy).get().delete()
+    assert authenticated_client.get('/pharmacy/').data == []
+
+
 @pytest.mark.django_db
 def test_inventory_quantity_update(
     authenticated_client: APIClient,
@@ -62,6 +402,94 @@ def test_inventory_quantity_update(
     # refresh from db to check
     inventory.refresh_from_db()
     assert inventory.stock_quantity == 110
+    assert response.data['stock_quantity'] == 110
+
+
+@pytest.mark.django_db
+def test_inventory_quantity_update_out_of_stock(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+) -> None:
+    url = f'/pharmacy/inventory/{inventory.uuid}/update-quantity/'
+    response = authenticated_client.put(url, {'delta': -101}, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    inventory.refresh_from_db()
+    assert inventory.stock_quantity == 100
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('path', 'data'),
+    [
+        # past the integer column
+        ('{uuid}/update-quantity/', {'delta': MAX_STOCK_QUANTITY + 1}),
+        ('{uuid}/update-quantity/', {'delta': -MAX_STOCK_QUANTITY - 1}),
+        ('update-quantity/', [{'uuid': '{uuid}', 'delta': MAX_STOCK_QUANTITY + 1}]),
+        # in range, but the stock or the merged delta would not be
+        ('{uuid}/update-quantity/', {'delta': MAX_STOCK_QUANTITY}),
+        ('update-quantity/', [{'uuid': '{uuid}', 'delta': MAX_STOCK_QUANTITY}]),
+        (
+            'update-quantity/',
+            [{'uuid': '{uuid}', 'delta': MAX_STOCK_QUANTITY}] * 2,
+        ),
+    ],
+)
+def test_inventory_quantity_update_out_of_range(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+    path: str,
+    data: dict | list,
+) -> None:
+    data = json.loads(json.dumps(data).replace('{uuid}', str(inventory.uuid)))
+    url = f'/pharmacy/inventory/{path.format(uuid=inventory.uuid)}'
+    response = authenticated_client.put(url, data, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    inventory.refresh_from_db()
+    assert inventory.stock_quantity == 100
+
+
+@pytest.mark.django_db
+def test_inventory_bulk_quantity_update(
+    authenticated_client: APIClient,
+    pharmacy: Pharmacy,
+    inventory: Inventory,
+) -> None:
+    other_inventory = Inventory.objects.create(
+        pharmacy=pharmacy,
+        name='Mask B',
+        color='blue',
+        count_per_pack=4,
+        price=10,
+        stock_quantity=5,
+    )
+    url = '/pharmacy/inventory/update-quantity/'
+
+    # deltas of the same inventory are merged
+    data = [
+        {'uuid': str(inventory.uuid), 'delta': 10},
+        {'uuid': str(inventory.uuid), 'delta': -30},
+        {'uuid': str(other_inventory.uuid), 'delta': -5},
+    ]
+    response = authenticated_client.put(url, data, format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {item['uuid']: item['stock_quantity'] for item in response.data} == {
+        str(inventory.uuid): 80,
+        str(other_inventory.uuid): 0,
+    }
+
+    # the whole batch is rolled back when any stock would go below zero
+    data = [
+        {'uuid': str(inventory.uuid), 'delta': -10},
+        {'uuid': str(other_inventory.uuid), 'delta': -1},
+    ]
+    response = authenticated_client.put(url, data, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    inventory.refresh_from_db()
+    assert inventory.stock_quantity == 80
 
 
 @pytest.mark.django_db
@@ -125,3 +553,90 @@ def test_inventory_bulk_update(
     assert inventory.name == 'Mask A Updated'
     assert inventory.price == 15
     assert inventory.stock_quantity == 120
+
+
+@pytest.mark.django_db
+def test_query_parameters_underscoreized(
+    authenticated_client: APIClient,
+    inventory: Inventory,
+) -> None:
+    Inventory.objects.create(
+        pharmacy=inventory.pharmacy,
+        name='Mask B',
+        color='blue',
+        count_per_pack=10,
+        price=12,
+        stock_quantity=0,
+    )
+    response = authenticated_client.get(
+        f'/pharmacy/{inventory.pharmacy.uuid}/inventory/',
+        {'ordering': '-price', 'pageSize': 1},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    # pageSize is read as page_size
+    assert [row['countPerPack'] for row in response.json()['results']] == [10]
+    assert response.json()['next'] is not None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('params', 'expected'),
+    [
+        ({'open_at': 'Sat 02:00'}, ['Overnight']),
+        ({'open_at': 'Fri 17:00'}, ['Overnight']),
+        ({'open_at': 'Sat 05:00'}, []),
+        # the Sunday slot runs past the end of the week
+        ({'open_at': 'Mon 01:00'}, ['Sunday']),
+        # 24:00 is stored as 00:00
+        ({'open_at': 'Wed 23:59'}, ['Wednesday']),
+        ({'open_at': 'Thur 11:00'}, ['Thursday']),
+        ({'open_between': 'Sun 23:00 - 01:00'}, ['Sunday']),
+        ({'open_between': 'Tue 22:00 - 09:00'}, ['Wednesday']),
+        ({'open_between': 'Mon 03:00 - 08:00'}, []),
+    ],
+)
+def test_pharmacy_list_open_at(
+    authenticated_client: APIClient,
+    params: dict,
+    expected: list,
+) -> None:
+    for name, slots in (
+        ('Overnight', [('Fri', '17:00', '05:00')]),
+        ('Sunday', [('Sun', '20:00', '02:00')]),
+        ('Wednesday', [('Wed', '08:00', '00:00')]),
+        ('Thursday', [('Thur', '08:00', '12:00'), ('Thur', '10:00', '14:00')]),
+    ):
+        pharmacy = Pharmacy.objects.create(name=name)
+        for weekday, start_time, end_time in slots:
+            OpeningHour.objects.create(
+                pharmacy=pharmacy,
+                weekday=weekday,
+                start_time=start_time,
+                end_time=end_time,
+            )
+
+    response = authenticated_client.get('/pharmacy/', params)
+
+    assert response.status_code == status.HTTP_200_OK
+    # one row per open pharmacy, even with overlapping slots
+    assert [row['pharmacyName'] for row in response.json()] == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'open_at': 'Tue'},
+        {'open_at': 'Xyz 10:00'},
+        {'open_at': 'Tue 25:00'},
+        {'open_between': 'Tue 10:00'},
+        {'open_at': 'Tue 10:00', 'open_between': 'Tue 10:00 - 12:00'},
+    ],
+)
+def test_pharmacy_list_open_at_invalid(
+    authenticated_client: APIClient,
+    params: dict,
+) -> None:
+    response = authenticated_client.get('/pharmacy/', params)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
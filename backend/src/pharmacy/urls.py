@@ -2,6 +2,7 @@ from django.urls import path
 
 from .views import (
     InventoryBulkCreateView,
+    InventoryBulkQuantityUpdateView,
     InventoryBulkUpdateView,
     InventoryCountView,
     InventoryListView,
@@ -20,6 +21,10 @@ urlpatterns = [
     path('<uuid:uuid>/inventory/bulk-update/', InventoryBulkUpdateView.as_view()),
     path('inventory/', InventoryListView.as_view()),
     path('inventory/count/', InventoryCountView.as_view()),
+    path(
+        'inventory/update-quantity/',
+        InventoryBulkQuantityUpdateView.as_view(),
+    ),
     path(
         'inventory/<uuid:uuid>/update-quantity/',
         InventoryQuantityUpdateView.as_view(),
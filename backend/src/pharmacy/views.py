@@ -1,6 +1,6 @@
 from typing import ClassVar, Self
 
-from django.db.models import Sum
+from django.db.models import Count, Sum
 from django.db.models.query import QuerySet
 from django.http import HttpRequest, HttpResponse
 from drf_spectacular.utils import extend_schema
@@ -8,36 +8,77 @@ from rest_framework.generics import CreateAPIView, ListAPIView, UpdateAPIView
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
 
+from core.async_views import AsyncListMixin
+from core.cache import (
+    INVENTORY_NAMESPACE,
+    OPENING_HOUR_NAMESPACE,
+    PHARMACY_NAMESPACE,
+    CachedListMixin,
+)
 from core.filters import FullTextSearchFilter
+from core.pagination import KeysetCursorPagination
+from core.serializers import ValuesListMixin
+from core.streaming import STREAM_PARAMETER, StreamingListMixin
 from pharmacy.apps import PharmacyConfig
+from pharmacy.enums import InventoryCountBy
 from pharmacy.models import Inventory, OpeningHour, Pharmacy
 from pharmacy.serializers import (
     InventoryBulkCreateSerializer,
+    InventoryBulkQuantityUpdateSerializer,
     InventoryBulkUpdateSerializer,
+    InventoryCountQuerySerializer,
     InventoryCountSerializer,
     InventoryListSerializer,
     InventoryPerPharmacyListSerializer,
     InventoryUpdateSerializer,
     OpeningHourListSerializer,
+    OpeningHourQuerySerializer,
 )
 
 
-class PharmacyListView(ListAPIView):
+class PharmacyListView(
+    CachedListMixin,
+    StreamingListMixin,
+    ValuesListMixin,
+    AsyncListMixin,
+    ListAPIView,
+):
     """
-    List pharmacies, optionally filtered by specific time and/or day of the week.
+    List pharmacies, optionally filtered by specific time and/or day of the week,
+    or by open_at / open_between for the pharmacies open at a moment or during a period (overnight included).
     """
 
+    cache_namespaces = (PHARMACY_NAMESPACE, OPENING_HOUR_NAMESPACE)
+
     queryset = OpeningHour.objects.select_related('pharmacy').all()
     serializer_class = OpeningHourListSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 2
     filterset_fields: ClassVar = {
         'weekday': ['exact'],
         'start_time': ['gte', 'exact'],
         'end_time': ['lte', 'exact'],
     }
 
+    def get_open_period(self: Self) -> tuple[int, int] | None:
+        serializer = OpeningHourQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('open_period')
+
+    def filter_queryset(self: Self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        open_period = self.get_open_period()
+        if open_period is None:
+            return queryset
+        # p.s. a subquery on the GiST index, one row per open pharmacy
+        return queryset.filter(
+            uuid__in=OpeningHour.get_open_pharmacy_slots(*open_period),
+        )
+
     @extend_schema(
         operation_id='取得藥局列表',
         tags=(PharmacyConfig.name,),
+        parameters=[STREAM_PARAMETER, OpeningHourQuerySerializer],
     )
     def get(
         self: Self,
@@ -48,13 +89,20 @@ class PharmacyListView(ListAPIView):
         return super().get(request, *args, **kwargs)
 
 
-class InventoryPerPharmacyListView(ListAPIView):
+class InventoryPerPharmacyListView(
+    StreamingListMixin,
+    ValuesListMixin,
+    AsyncListMixin,
+    ListAPIView,
+):
     """
     List all masks sold by a given pharmacy with an option to sort by name or price.
     """
 
     queryset = Inventory.objects.all().select_related('pharmacy')
     serializer_class = InventoryPerPharmacyListSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 2
     filterset_fields: ClassVar = {
         'name': ['in', 'exact'],
         'price': ['gte', 'lte', 'gt', 'lt', 'exact'],
@@ -65,6 +113,7 @@ class InventoryPerPharmacyListView(ListAPIView):
 
     @extend_schema(
         operation_id='取得藥局販售的口罩列表',
+        parameters=[STREAM_PARAMETER],
         responses={
             HTTP_200_OK: InventoryPerPharmacyListSerializer(many=True),
         },
@@ -78,29 +127,56 @@ class InventoryPerPharmacyListView(ListAPIView):
         return super().get(request, *args, **kwargs)
 
 
-class InventoryCountView(ListAPIView):
+class InventoryCountView(CachedListMixin, AsyncListMixin, ListAPIView):
     """
     List all pharmacies that offer a number of mask products within a given price range, where the count is above, below, or between given thresholds.
     """
 
+    cache_namespaces = (INVENTORY_NAMESPACE, PHARMACY_NAMESPACE)
+
     queryset = Inventory.objects.select_related('pharmacy').all()
     serializer_class = InventoryCountSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 2
+    cursor_unique_field = 'pharmacy__uuid'
     filterset_fields: ClassVar = {
         'price': ['gte', 'lte', 'gt', 'lt', 'exact'],
     }
 
+    def get_count_query(self: Self) -> dict:
+        serializer = InventoryCountQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
     def get_queryset(self: Self) -> QuerySet:
+        count_query = self.get_count_query()
+        # p.s. COUNT(*) keeps the index only scan of the price covering index
+        inventory_count = (
+            Count('*')
+            if count_query['count_by'] == InventoryCountBy.PRODUCTS
+            else Sum('stock_quantity')
+        )
+
+        thresholds = {}
+        if 'count_gt' in count_query:
+            thresholds['inventory_count__gt'] = count_query['count_gt']
+        if 'count_lt' in count_query:
+            thresholds['inventory_count__lt'] = count_query['count_lt']
+        if 'count_between' in count_query:
+            thresholds['inventory_count__range'] = count_query['count_between']
+
+        # the thresholds are a HAVING clause of the same GROUP BY, the price filters stay in the WHERE clause
         return (
             super()
             .get_queryset()
             .values('pharmacy__uuid', 'pharmacy__name')
-            .annotate(
-                inventory_count=Sum('stock_quantity'),
-            )
+            .annotate(inventory_count=inventory_count)
+            .filter(**thresholds)
         )
 
     @extend_schema(
         operation_id='取得所有藥局庫存統計',
+        parameters=[InventoryCountQuerySerializer],
         responses={
             HTTP_200_OK: InventoryCountSerializer(many=True),
         },
@@ -122,16 +198,28 @@ class InventoryQuantityUpdateView(UpdateAPIView):
     queryset = Inventory.objects.all()
     serializer_class = InventoryUpdateSerializer
     lookup_field = 'uuid'
+    query_budget = 3
+
+    def update(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        # p.s. no get_object, the delta is applied and returned by a single UPDATE statement
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-    def perform_update(self: Self, serializer: InventoryUpdateSerializer) -> None:
-        inventory = self.get_object()
-        inventory.stock_quantity += serializer.validated_data['delta']
-        inventory.save()
+        inventory = Inventory.apply_stock_delta(
+            self.kwargs['uuid'],
+            serializer.validated_data['delta'],
+        )
+        return Response(self.get_serializer(inventory).data)
 
     @extend_schema(
         operation_id='Delta 更新藥局庫存數量',
         responses={
-            HTTP_200_OK: InventoryCountSerializer(many=True),
+            HTTP_200_OK: InventoryUpdateSerializer,
         },
     )
     def put(
@@ -152,6 +240,53 @@ class InventoryQuantityUpdateView(UpdateAPIView):
         return super().patch(request, *args, **kwargs)
 
 
+class InventoryBulkQuantityUpdateView(UpdateAPIView):
+    """
+    Update the stock quantity of multiple mask products at once by increasing or decreasing it.
+    """
+
+    queryset = Inventory.objects.all()
+    serializer_class = InventoryBulkQuantityUpdateSerializer
+    query_budget = 6
+
+    def update(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        updated_inventories = Inventory.bulk_apply_stock_delta(serializer)
+        response_serializer = self.get_serializer(updated_inventories, many=True)
+        return Response(response_serializer.data)
+
+    @extend_schema(exclude=True)
+    def patch(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        return super().put(request, *args, **kwargs)
+
+    @extend_schema(
+        operation_id='批次 Delta 更新庫存數量',
+        request=InventoryBulkQuantityUpdateSerializer(many=True),
+        responses={
+            HTTP_200_OK: InventoryBulkQuantityUpdateSerializer(many=True),
+        },
+    )
+    def put(
+        self: Self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        return super().put(request, *args, **kwargs)
+
+
 class InventoryBulkUpdateView(UpdateAPIView):
     """
     Update multiple mask products for a pharmacy at once, including name, price, and stock quantity.
@@ -160,6 +295,7 @@ class InventoryBulkUpdateView(UpdateAPIView):
     queryset = Pharmacy.objects.all()
     serializer_class = InventoryBulkUpdateSerializer
     lookup_field = 'uuid'
+    query_budget = 6
 
     def update(
         self: Self,
@@ -214,6 +350,7 @@ class InventoryBulkCreateView(CreateAPIView):
 
     queryset = Pharmacy.objects.all()
     serializer_class = InventoryBulkCreateSerializer
+    query_budget = 7
 
     def create(
         self,
@@ -251,18 +388,27 @@ class InventoryBulkCreateView(CreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class InventoryListView(ListAPIView):
+class InventoryListView(
+    StreamingListMixin,
+    ValuesListMixin,
+    AsyncListMixin,
+    ListAPIView,
+):
     """
     Search for pharmacies or masks by name and rank the results by relevance to the search term.
     """
 
     queryset = Inventory.objects.select_related('pharmacy').all()
     serializer_class = InventoryListSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 2
     search_fields = ('name', 'pharmacy__name')
+    search_vector_field = 'search_vector'
     filter_backends = (FullTextSearchFilter,)
 
     @extend_schema(
         operation_id='取得庫存列表',
+        parameters=[STREAM_PARAMETER],
         responses={
             HTTP_200_OK: InventoryListSerializer(many=True),
         },